@@ -0,0 +1,350 @@
+"""
+Teste de carga do serviço FastAPI, com resultado em JSON.
+
+Executa os cenários contra a API e, para cada cenário e endpoint, reporta
+requisições, erros, vazão (requisições e linhas por segundo) e latências
+p50/p95/p99 em milissegundos, junto com o commit e os parâmetros da execução, para
+comparar rodadas entre commits:
+
+- single-row: apenas `/predict`, com `--rows-per-request` linhas por requisição;
+- large-batch: `/predict-batch` com `--batch-size` linhas por requisição;
+- mixed: `/predict` concorrendo com as requisições de relatório (`--report-path`),
+  evidenciando se a geração de relatórios afeta a latência das predições.
+
+As linhas enviadas vêm de `data/raw/twitch_api_data_*.csv`. Por padrão mede um
+servidor já em execução (`--url`); com `--in-process`, treina um modelo local
+(pré-processador + XGBoost) e sobe a API no próprio processo (uvicorn em uma thread,
+com os eventos de startup) em um diretório temporário, removido ao final. Nesse modo
+o gerador de carga e o servidor disputam o mesmo GIL, e a API importa `config.config`
+e `src.utils` do ambiente do Dockerfile: o `PYTHONPATH` precisa incluí-los, como no
+container.
+
+Uso:
+    uvicorn app:app --app-dir data_master_eng_ml/fastapi --port 5000
+    python benchmarks/load_test.py --url http://localhost:5000 --duration 30
+    python benchmarks/load_test.py --in-process --scenario large-batch --batch-size 512
+    python benchmarks/load_test.py --in-process --output bench.json
+"""
+
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import joblib
+import numpy as np
+import pandas as pd
+import typer
+from loguru import logger
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+
+from data_master_eng_ml.config import PROJ_ROOT, RAW_DATA_DIR
+from data_master_eng_ml.features import NON_FEATURE_COLUMNS
+from data_master_eng_ml.modeling.preprocessor import build_preprocessor
+
+app = typer.Typer()
+
+SCENARIOS = ("single-row", "large-batch", "mixed")
+
+
+def load_rows() -> pd.DataFrame:
+    return pd.concat(
+        [pd.read_csv(path) for path in sorted(RAW_DATA_DIR.glob("twitch_api_data_*.csv"))],
+        ignore_index=True,
+    )
+
+
+def train_local_model(data_frame: pd.DataFrame, model_path: Path) -> None:
+    """Treina o pipeline servido com `--in-process` e o salva sem compressão (mmap)."""
+    X = data_frame.drop(columns=NON_FEATURE_COLUMNS)
+    categorical_cols = list(X.select_dtypes("object").columns)
+    numerical_cols = [col for col in X.columns if col not in categorical_cols]
+    pipeline = Pipeline(
+        steps=[
+            ("preprocessor", build_preprocessor(numerical_cols, categorical_cols)),
+            ("model", XGBClassifier(n_estimators=200, max_depth=6, n_jobs=1)),
+        ]
+    )
+    pipeline.fit(X, data_frame["target"])
+    joblib.dump(pipeline, model_path)
+
+
+def build_payloads(
+    features: pd.DataFrame, rows_per_request: int, batch_size: int, n_payloads: int = 128
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Corpos de `/predict` (DataFrame em JSON) e `/predict-batch` (colunas)."""
+    rng = np.random.default_rng(0)
+    single, batches = [], []
+    for start in rng.integers(0, len(features), n_payloads):
+        rows = features.iloc[start : start + rows_per_request].reset_index(drop=True)
+        single.append({"features": rows.to_json()})
+        rows = features.sample(batch_size, replace=True, random_state=int(start))
+        # NaN não é JSON válido; a API recebe None
+        columns = rows.astype(object).where(rows.notna(), None).to_dict(orient="list")
+        batches.append({"ids": list(range(batch_size)), "columns": columns})
+    return {"/predict": single, "/predict-batch": batches}
+
+
+def summarize(latencies: List[float], errors: int, rows: int, duration: float) -> Dict[str, Any]:
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    milliseconds = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        **({"rows_per_s": round(rows / duration, 1)} if rows else {}),
+        "mean_ms": round(float(milliseconds.mean()), 2),
+        **{f"p{q}_ms": round(float(np.percentile(milliseconds, q)), 2) for q in (50, 95, 99)},
+        "max_ms": round(float(milliseconds.max()), 2),
+    }
+
+
+class EndpointLoad:
+    """Clientes de um endpoint: requisições em sequência até o prazo, medindo cada uma."""
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        concurrency: int,
+        payloads: Optional[List[Dict]] = None,
+        params: Optional[Dict] = None,
+        rows_per_request: int = 1,
+    ) -> None:
+        self.method = method
+        self.path = path
+        self.concurrency = concurrency
+        self.payloads = payloads
+        self.params = params
+        self.rows_per_request = rows_per_request
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    async def worker(self, client: httpx.AsyncClient, offset: int, deadline: float) -> None:
+        index = offset
+        while time.perf_counter() < deadline:
+            payload = self.payloads[index % len(self.payloads)] if self.payloads else None
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    self.method, self.path, json=payload, params=self.params
+                )
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            self.latencies.append(time.perf_counter() - start)
+            self.errors += failed
+            index += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        rows = (len(self.latencies) - self.errors) * self.rows_per_request
+        return summarize(self.latencies, self.errors, rows, duration)
+
+
+async def run_scenario(url: str, loads: List[EndpointLoad], duration: float) -> Dict:
+    limits = httpx.Limits(max_connections=sum(load.concurrency for load in loads))
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(
+                load.worker(client, offset, deadline)
+                for load in loads
+                for offset in range(load.concurrency)
+            )
+        )
+    return {f"{load.method} {load.path}": load.summary(duration) for load in loads}
+
+
+def scenario_loads(
+    scenario: str,
+    payloads: Dict[str, List[Dict]],
+    concurrency: int,
+    rows_per_request: int,
+    batch_size: int,
+    report_paths: List[str],
+    report_concurrency: int,
+    window_size: int,
+) -> List[EndpointLoad]:
+    predict = EndpointLoad(
+        "POST", "/predict", concurrency, payloads["/predict"], rows_per_request=rows_per_request
+    )
+    if scenario == "single-row":
+        return [predict]
+    if scenario == "large-batch":
+        return [
+            EndpointLoad(
+                "POST",
+                "/predict-batch",
+                concurrency,
+                payloads["/predict-batch"],
+                rows_per_request=batch_size,
+            )
+        ]
+    report_params = {"window_size": window_size}
+    return [predict] + [
+        EndpointLoad("GET", path, report_concurrency, params=report_params, rows_per_request=0)
+        for path in report_paths
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_in_process_server(model_path: Path, work_dir: Path):
+    """Sobe a API com uvicorn em uma thread e espera o modelo ficar pronto."""
+    import uvicorn
+
+    os.environ["MODEL_PATH"] = str(model_path)
+    os.environ.pop("MODEL_URI", None)
+    os.environ.setdefault("PREDICTIONS_DIR", str(work_dir / "predictions"))
+    sys.path.insert(0, str(PROJ_ROOT / "data_master_eng_ml" / "fastapi"))
+    from app import app as fastapi_app
+
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(fastapi_app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 120
+    while time.perf_counter() < deadline:
+        try:
+            if server.started and httpx.get(f"{url}/ready").status_code == 200:
+                return server, thread, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.should_exit = True
+    thread.join(timeout=10)
+    raise RuntimeError("A API não ficou pronta em 120s")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJ_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_scenarios(
+    url: str, scenarios: List[str], warmup: float, duration: float, loads_of
+) -> Dict[str, Dict]:
+    """Executa cada cenário (após o aquecimento, com clientes novos) e loga o resultado."""
+    results = {}
+    for name in scenarios:
+        if warmup > 0:
+            asyncio.run(run_scenario(url, loads_of(name), warmup))
+        logger.info(f"Cenário {name} ({duration:g}s)...")
+        results[name] = asyncio.run(run_scenario(url, loads_of(name), duration))
+        logger.info(results[name])
+    return results
+
+
+@app.command()
+def main(
+    url: str = typer.Option("http://localhost:5000", help="Servidor já em execução."),
+    in_process: bool = typer.Option(False, help="Treina um modelo e sobe a API no processo."),
+    scenario: List[str] = typer.Option(list(SCENARIOS), help="Cenários a executar."),
+    duration: float = typer.Option(30, help="Duração de cada cenário, em segundos."),
+    warmup: float = typer.Option(3, help="Aquecimento antes de cada cenário, em segundos."),
+    predict_concurrency: int = typer.Option(16, help="Clientes simultâneos de predição."),
+    rows_per_request: int = typer.Option(1, help="Linhas por requisição de /predict."),
+    batch_size: int = typer.Option(256, help="Linhas por requisição no large-batch."),
+    report_path: List[str] = typer.Option(
+        ["/monitor-model", "/monitor-target"], help="Relatórios do cenário mixed."
+    ),
+    report_concurrency: int = typer.Option(2, help="Clientes por endpoint de relatório."),
+    window_size: int = typer.Option(3000, help="Janela dos relatórios no cenário mixed."),
+    output: Optional[Path] = typer.Option(None, help="Arquivo JSON de saída (padrão: stdout)."),
+):
+    unknown = set(scenario) - set(SCENARIOS)
+    if unknown:
+        raise typer.BadParameter(f"Cenários desconhecidos: {sorted(unknown)}")
+
+    data_frame = load_rows()
+    payloads = build_payloads(data_frame.drop(columns=["target"]), rows_per_request, batch_size)
+
+    def loads_of(name: str) -> List[EndpointLoad]:
+        return scenario_loads(
+            name,
+            payloads,
+            predict_concurrency,
+            rows_per_request,
+            batch_size,
+            report_path,
+            report_concurrency,
+            window_size,
+        )
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "in_process": in_process,
+        "parameters": {
+            "duration": duration,
+            "warmup": warmup,
+            "predict_concurrency": predict_concurrency,
+            "rows_per_request": rows_per_request,
+            "batch_size": batch_size,
+            "report_paths": report_path,
+            "report_concurrency": report_concurrency,
+            "window_size": window_size,
+        },
+        "environment": {
+            name: os.environ[name]
+            for name in (
+                "PREDICT_BATCHING",
+                "PREDICT_MAX_BATCH_SIZE",
+                "PREDICT_WORKERS",
+                "MODEL_COMPILED",
+                "MODEL_FROZEN_PREPROCESSOR",
+            )
+            if name in os.environ
+        },
+    }
+    if in_process:
+        # Modelo e log de predições ficam no diretório temporário, removido ao final
+        with tempfile.TemporaryDirectory(prefix="load_test_") as work_dir:
+            model_path = Path(work_dir) / "model.joblib"
+            logger.info("Treinando o modelo local...")
+            train_local_model(data_frame, model_path)
+            server, thread, url = start_in_process_server(model_path, Path(work_dir))
+            logger.info(f"API no processo em {url}")
+            try:
+                results["scenarios"] = run_scenarios(url, scenario, warmup, duration, loads_of)
+            finally:
+                server.should_exit = True
+                thread.join(timeout=10)
+    else:
+        results["scenarios"] = run_scenarios(url, scenario, warmup, duration, loads_of)
+
+    report = json.dumps(results, indent=2)
+    if output is None:
+        print(report)
+    else:
+        output.write_text(report)
+        logger.success(f"Resultados em {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark das conversões país -> continente e plataforma -> grupo.
+
+Compara a abordagem linha a linha dos notebooks (`pycountry` + `pycountry_convert`
+por empresa e dicionário por elemento da lista de plataformas) com as tabelas de
+consulta NumPy de `utils.lookups`. As entradas são reconstruídas a partir das linhas
+de `data/raw/twitch_api_data_*.csv`: um país do continente de cada jogo e uma
+plataforma de cada grupo marcado nas colunas multi-hot.
+
+Uso:
+    python benchmarks/lookups.py --repeat 20
+"""
+
+import time
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+import pycountry
+import pycountry_convert as pc
+import typer
+from loguru import logger
+
+from data_master_eng_ml.config import RAW_DATA_DIR
+from data_master_eng_ml.features import PLATFORM_COLUMNS, countries_to_continents, platform_codes
+from data_master_eng_ml.utils.lookups import CONTINENT_NAMES, continent_names, load_lookup_tables
+from data_master_eng_ml.utils.mappings import plataform_mapping
+
+app = typer.Typer()
+
+
+def country_to_continent_per_row(country_code) -> str:
+    """Versão dos notebooks, executada uma vez por linha."""
+    try:
+        country = pycountry.countries.get(numeric=str(int(country_code)).zfill(3))
+        continent_code = pc.country_alpha2_to_continent_code(country.alpha_2)
+        return pc.convert_continent_code_to_continent_name(continent_code)
+    except (AttributeError, KeyError, LookupError, ValueError):
+        return "Unknown"
+
+
+def build_inputs(repeat: int) -> pd.DataFrame:
+    """Reconstrói códigos de país e listas de plataformas a partir dos CSVs."""
+    data_frame = pd.concat(
+        [pd.read_csv(path) for path in sorted(RAW_DATA_DIR.glob("twitch_api_data_*.csv"))],
+        ignore_index=True,
+    )
+
+    # Um código de país representativo por continente
+    table = load_lookup_tables()["country_continent"]
+    country_by_continent = {
+        name: int(np.flatnonzero(table == index)[0]) for index, name in enumerate(CONTINENT_NAMES)
+    }
+    country_by_continent["Unknown"] = 1
+    country = data_frame["continent_name"].map(country_by_continent)
+
+    # Uma plataforma representativa por grupo marcado
+    platform_by_group = {}
+    for platform_id, group in plataform_mapping.items():
+        platform_by_group.setdefault(group, platform_id)
+    platform_by_group["unknown_platforms_name"] = max(plataform_mapping) + 1
+    flags = data_frame[PLATFORM_COLUMNS].to_numpy(dtype=bool)
+    ids = np.array([platform_by_group[group] for group in PLATFORM_COLUMNS])
+    platforms = [ids[row].tolist() for row in flags]
+
+    inputs = pd.DataFrame({"country": country, "platforms": platforms})
+    return pd.concat([inputs] * repeat, ignore_index=True)
+
+
+def timeit(function: Callable, runs: int) -> float:
+    """Melhor tempo (em segundos) entre `runs` execuções."""
+    best = float("inf")
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+@app.command()
+def main(repeat: int = 10, runs: int = 3):
+    inputs = build_inputs(repeat)
+    n_rows = len(inputs)
+    load_lookup_tables()
+    logger.info(f"{n_rows} linhas ({repeat}x os CSVs de 2021/2022).")
+
+    results: Dict[str, Dict[str, float]] = {
+        "country_to_continent": {
+            "per_row": timeit(lambda: inputs["country"].apply(country_to_continent_per_row), runs),
+            "vectorized": timeit(lambda: countries_to_continents(inputs["country"]), runs),
+        },
+        "platform_group": {
+            "per_row": timeit(
+                lambda: inputs["platforms"].map(
+                    lambda x: list({plataform_mapping.get(i, "unknown_platforms_name") for i in x})
+                ),
+                runs,
+            ),
+            "vectorized": timeit(lambda: platform_codes(inputs["platforms"]), runs),
+        },
+    }
+
+    # As duas abordagens devem produzir os mesmos continentes
+    per_row = inputs["country"].apply(country_to_continent_per_row).to_numpy()
+    assert (per_row == continent_names(inputs["country"].to_numpy())).all()
+
+    for name, timings in results.items():
+        speedup = timings["per_row"] / timings["vectorized"]
+        logger.info(
+            f"{name}: por linha {n_rows / timings['per_row']:,.0f} linhas/s, "
+            f"vetorizado {n_rows / timings['vectorized']:,.0f} linhas/s ({speedup:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    app()
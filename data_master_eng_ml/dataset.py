@@ -1,28 +1,405 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
 from pathlib import Path
+from typing import Dict, List, Optional
 
+import pandas as pd
 import typer
 from loguru import logger
-from tqdm import tqdm
 
-from data_master_eng_ml.config import PROCESSED_DATA_DIR, RAW_DATA_DIR
+from data_master_eng_ml.config import INTERIM_DATA_DIR, RAW_DATA_DIR
+from data_master_eng_ml.utils.age_ratings import resolve_age_classif
+from data_master_eng_ml.utils.mappings import URL_TWITCH_BASE
+from data_master_eng_ml.utils.response_cache import configure_cache
+from data_master_eng_ml.utils.twitch_api import build_query, fetch_data_with_pagination
 
 app = typer.Typer()
 
+# Quantidade de IDs por consulta `id = (...)`
+ID_CHUNK_SIZE = 500
+
+# Arquivo com o maior `updated_at` já extraído por endpoint e ano
+WATERMARKS_FILE = "_watermarks.json"
+
+# Campos extraídos de cada endpoint da API
+ENDPOINT_FIELDS = {
+    "release_dates": [
+        "category",
+        "created_at",
+        "date",
+        "game",
+        "human",
+        "platform",
+        "region",
+        "status",
+        "updated_at",
+        "y",
+    ],
+    "games": [
+        "name",
+        "game_modes",
+        "genres",
+        "age_ratings",
+        "involved_companies",
+        "player_perspectives",
+        "platforms",
+        "rating",
+        "remasters",
+        "updated_at",
+    ],
+    "involved_companies": ["company", "developer", "game", "publisher", "updated_at"],
+    "companies": [
+        "developed",
+        "slug",
+        "published",
+        "country",
+        "start_date",
+        "start_date_category",
+        "parent",
+        "updated_at",
+    ],
+    "multiplayer_modes": [
+        "campaigncoop",
+        "game",
+        "lancoop",
+        "offlinecoop",
+        "offlinecoopmax",
+        "offlinemax",
+        "onlinecoop",
+        "onlinecoopmax",
+        "onlinemax",
+        "splitscreen",
+        "updated_at",
+    ],
+}
+
+# Colunas do dataset intermediário (um registro por jogo) e seus tipos
+GAME_COLUMNS = {
+    "id": "int64",
+    "name": "string",
+    "genres": "object",
+    "game_modes": "object",
+    "player_perspectives": "object",
+    "platforms": "object",
+    "rating": "float64",
+    "remasters": "object",
+    "age_classif": "string",
+    "region": "Int64",
+    "company": "Int64",
+    "developed": "object",
+    "published": "object",
+    "country": "Int64",
+    "parent": "Int64",
+    "onlinecoop": "boolean",
+    "onlinecoopmax": "Int64",
+    "onlinemax": "Int64",
+    "splitscreen": "boolean",
+}
+
+
+def with_columns(data_frame: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Garante a presença das colunas (a API omite campos ausentes em todos os registros)."""
+    missing = [column for column in columns if column not in data_frame.columns]
+    return data_frame.assign(**{column: pd.NA for column in missing})
+
+
+def id_filter(ids) -> str:
+    """Monta o filtro `= (...)` para uma lista de IDs."""
+    return f"= ({','.join(map(str, sorted(set(ids))))})"
+
+
+def fetch_endpoint(
+    endpoint: str, filters: Optional[Dict[str, str]], concurrency: Optional[int]
+) -> pd.DataFrame:
+    """
+    Busca todos os registros de um endpoint com os campos de `ENDPOINT_FIELDS`.
+
+    Args:
+        endpoint (str): Nome do endpoint da API (ex.: `games`).
+        filters (Optional[Dict[str, str]]): Filtros da consulta.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas; None usa
+            o orçamento do limitador (`twitch_api.default_concurrency`).
+
+    Returns:
+        pd.DataFrame: Registros retornados, com todas as colunas esperadas.
+    """
+    logger.info(f"Extraindo {endpoint}...")
+    data_frame = fetch_data_with_pagination(
+        f"{URL_TWITCH_BASE}/{endpoint}",
+        build_query,
+        ENDPOINT_FIELDS[endpoint],
+        filters,
+        max_filter_options=ID_CHUNK_SIZE,
+        concurrency=concurrency,
+    )
+    data_frame = with_columns(data_frame, ["id", *ENDPOINT_FIELDS[endpoint]])
+    logger.info(f"{endpoint}: {len(data_frame)} registros.")
+    return data_frame
+
+
+def fetch_changes(
+    endpoint: str,
+    key: str,
+    ids,
+    known_ids,
+    watermark: Optional[int],
+    concurrency: Optional[int],
+    filters: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Busca os registros novos ou alterados de um endpoint filtrado por IDs.
+
+    IDs ainda não conhecidos são buscados por completo; para os já conhecidos, apenas
+    os registros com `updated_at` maior que a marca d'água.
+
+    Args:
+        endpoint (str): Nome do endpoint da API.
+        key (str): Campo usado no filtro de IDs (ex.: `id` ou `game`).
+        ids: IDs a serem buscados.
+        known_ids: IDs já extraídos em execuções anteriores.
+        watermark (Optional[int]): Maior `updated_at` já armazenado; None força a
+            extração completa.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas.
+        filters (Optional[Dict[str, str]]): Filtros adicionais da consulta.
+
+    Returns:
+        pd.DataFrame: Registros novos ou alterados.
+    """
+    filters = filters or {}
+    ids = set(ids)
+    new_ids = ids - set(known_ids) if watermark is not None else ids
+    changed_ids = ids - new_ids
+
+    data_frames = []
+    if new_ids:
+        data_frames.append(
+            fetch_endpoint(endpoint, {key: id_filter(new_ids), **filters}, concurrency)
+        )
+    if changed_ids:
+        changed_filters = {key: id_filter(changed_ids), **filters, "updated_at": f"> {watermark}"}
+        data_frames.append(fetch_endpoint(endpoint, changed_filters, concurrency))
+    if not data_frames:
+        return with_columns(pd.DataFrame(), ["id", *ENDPOINT_FIELDS[endpoint]])
+    return pd.concat(data_frames, ignore_index=True)
+
+
+def upsert(stored: Optional[pd.DataFrame], changes: pd.DataFrame) -> pd.DataFrame:
+    """Aplica os registros alterados sobre os armazenados, usando `id` como chave."""
+    if stored is None or stored.empty:
+        return changes.reset_index(drop=True)
+    if changes.empty:
+        return stored
+    return (
+        pd.concat([stored, changes], ignore_index=True)
+        .drop_duplicates(subset="id", keep="last")
+        .reset_index(drop=True)
+    )
+
+
+def extract_year(
+    year: int,
+    concurrency: Optional[int] = None,
+    stored: Optional[Dict[str, pd.DataFrame]] = None,
+    watermarks: Optional[Dict[str, int]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Extrai todos os endpoints necessários para os jogos lançados em um ano.
+
+    Depois que os IDs dos jogos são conhecidos (via `release_dates`), os endpoints
+    independentes são buscados em paralelo; `companies` e as classificações etárias
+    são agendados assim que `involved_companies` e `games` terminam.
+
+    Quando há dados armazenados e marcas d'água de uma execução anterior, apenas os
+    registros novos ou com `updated_at` posterior à marca são buscados e aplicados
+    sobre os armazenados.
+
+    Args:
+        year (int): Ano de lançamento.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas por endpoint;
+            None usa o orçamento do limitador compartilhado.
+        stored (Optional[Dict[str, pd.DataFrame]]): DataFrames brutos já armazenados.
+        watermarks (Optional[Dict[str, int]]): Maior `updated_at` armazenado por endpoint.
+
+    Returns:
+        Dict[str, pd.DataFrame]: DataFrames brutos por endpoint, já atualizados.
+    """
+    stored = stored or {}
+    watermarks = watermarks or {}
+
+    release_dates_filters = {"status": "= 6", "y": f"= {year}", "region": "= 8"}
+    if watermarks.get("release_dates") is not None:
+        release_dates_filters["updated_at"] = f"> {watermarks['release_dates']}"
+    release_dates = upsert(
+        stored.get("release_dates"),
+        fetch_endpoint("release_dates", release_dates_filters, concurrency),
+    )
+    game_ids = release_dates["game"].dropna().astype(int)
+    # Jogos já processados na execução anterior
+    known_game_ids = (
+        stored["release_dates"]["game"].dropna().astype(int) if "release_dates" in stored else []
+    )
+
+    def changes(endpoint, key, ids, known_ids, filters=None):
+        return fetch_changes(
+            endpoint, key, ids, known_ids, watermarks.get(endpoint), concurrency, filters
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        games_future = executor.submit(
+            changes, "games", "id", game_ids, known_game_ids, {"category": "= (0)"}
+        )
+        involved_future = executor.submit(
+            changes, "involved_companies", "game", game_ids, known_game_ids
+        )
+        multiplayer_future = executor.submit(
+            changes, "multiplayer_modes", "game", game_ids, known_game_ids
+        )
+
+        involved_companies = upsert(stored.get("involved_companies"), involved_future.result())
+        company_ids = involved_companies["company"].dropna().astype(int)
+        known_company_ids = stored["companies"]["id"] if "companies" in stored else []
+        companies_future = executor.submit(
+            changes, "companies", "id", company_ids, known_company_ids
+        )
+
+        games = games_future.result()
+        age_classif_future = executor.submit(
+            resolve_age_classif, games["age_ratings"], concurrency
+        )
+
+        games["age_classif"] = age_classif_future.result()
+        return {
+            "release_dates": release_dates,
+            "games": upsert(stored.get("games"), games),
+            "involved_companies": involved_companies,
+            "companies": upsert(stored.get("companies"), companies_future.result()),
+            "multiplayer_modes": upsert(
+                stored.get("multiplayer_modes"), multiplayer_future.result()
+            ),
+        }
+
+
+def build_games_dataset(raw: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Junta os endpoints brutos em um registro por jogo.
+
+    Segue as junções dos notebooks: região do primeiro lançamento, dados da primeira
+    empresa envolvida e do primeiro modo multiplayer de cada jogo.
+
+    Args:
+        raw (Dict[str, pd.DataFrame]): DataFrames brutos retornados por `extract_year`.
+
+    Returns:
+        pd.DataFrame: Dataset intermediário com as colunas de `GAME_COLUMNS`.
+    """
+    region = raw["release_dates"][["game", "region"]].drop_duplicates(subset="game")
+    companies = pd.merge(
+        raw["involved_companies"][["game", "company"]],
+        raw["companies"][["id", "developed", "published", "country", "parent"]],
+        left_on="company",
+        right_on="id",
+        how="inner",
+    ).drop(columns=["id"])
+    multiplayer = raw["multiplayer_modes"][
+        ["game", "onlinecoop", "onlinecoopmax", "onlinemax", "splitscreen"]
+    ]
+
+    games = raw["games"]
+    for data_frame in (region, companies, multiplayer):
+        games = games.merge(
+            data_frame.drop_duplicates(subset="game"),
+            left_on="id",
+            right_on="game",
+            how="left",
+        ).drop(columns=["game"])
+
+    games = games.drop_duplicates(subset="id")[list(GAME_COLUMNS)]
+    return games.astype(GAME_COLUMNS).reset_index(drop=True)
+
+
+def partition_path(root: Path, year: int) -> Path:
+    """Caminho do arquivo Parquet da partição de um ano."""
+    return root / f"year={year}" / "part-0.parquet"
+
+
+def read_partition(root: Path, year: int) -> Optional[pd.DataFrame]:
+    """Lê a partição Parquet de um ano, se existir."""
+    path = partition_path(root, year)
+    return pd.read_parquet(path) if path.exists() else None
+
+
+def write_partition(data_frame: pd.DataFrame, root: Path, year: int) -> Path:
+    """Grava o DataFrame como a partição Parquet de um ano, substituindo a anterior."""
+    path = partition_path(root, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    data_frame.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+    return path
+
+
+def read_watermarks(raw_dir: Path) -> Dict[str, Dict[str, int]]:
+    """Lê as marcas d'água (`updated_at` máximo) por endpoint e ano."""
+    path = raw_dir / WATERMARKS_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_watermarks(raw_dir: Path, watermarks: Dict[str, Dict[str, int]]) -> None:
+    """Grava as marcas d'água por endpoint e ano."""
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    (raw_dir / WATERMARKS_FILE).write_text(json.dumps(watermarks, indent=2, sort_keys=True))
+
 
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    input_path: Path = RAW_DATA_DIR / "dataset.csv",
-    output_path: Path = PROCESSED_DATA_DIR / "dataset.csv",
-    # ----------------------------------------------
+    years: List[int] = typer.Option([2021, 2022], "--year", help="Ano(s) de lançamento."),
+    raw_dir: Path = RAW_DATA_DIR / "igdb",
+    interim_dir: Path = INTERIM_DATA_DIR / "games",
+    concurrency: int = typer.Option(
+        0, help="Requisições simultâneas por endpoint (0 usa o orçamento do limitador)."
+    ),
+    offline: bool = typer.Option(False, help="Usa apenas o cache local de respostas."),
+    full_refresh: bool = typer.Option(
+        False,
+        help="Ignora as marcas d'água e o cache de respostas e extrai todos os registros "
+        "novamente.",
+    ),
 ):
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
-    logger.info("Processing dataset...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Processing dataset complete.")
-    # -----------------------------------------
+    if offline and full_refresh:
+        raise typer.BadParameter("--offline e --full-refresh não podem ser usados juntos.")
+    if offline:
+        configure_cache(offline=True)
+    if full_refresh:
+        # Páginas em cache podem ser anteriores às marcas d'água descartadas; as
+        # respostas novas substituem as antigas no cache
+        configure_cache(refresh=True)
+
+    watermarks = {} if full_refresh else read_watermarks(raw_dir)
+    for year in years:
+        logger.info(f"Extraindo dados de {year}...")
+        stored = {}
+        year_watermarks = {}
+        if not full_refresh:
+            for endpoint in ENDPOINT_FIELDS:
+                data_frame = read_partition(raw_dir / endpoint, year)
+                if data_frame is not None:
+                    stored[endpoint] = data_frame
+                    year_watermarks[endpoint] = watermarks.get(endpoint, {}).get(str(year))
+            if stored:
+                logger.info(f"Extração incremental a partir de {year_watermarks}.")
+
+        raw = extract_year(year, concurrency or None, stored, year_watermarks)
+        for endpoint, data_frame in raw.items():
+            write_partition(data_frame, raw_dir / endpoint, year)
+            updated_at = data_frame["updated_at"].max()
+            if pd.notna(updated_at):
+                watermarks.setdefault(endpoint, {})[str(year)] = int(updated_at)
+        write_watermarks(raw_dir, watermarks)
+
+        games = build_games_dataset(raw)
+        path = write_partition(games, interim_dir, year)
+        logger.info(f"{len(games)} jogos gravados em {path}.")
+    logger.success("Extração completa.")
 
 
 if __name__ == "__main__":
@@ -1,22 +1,41 @@
+import functools
+from io import StringIO
 import logging
-from typing import Callable, Text
+from typing import Any, Callable, Dict, List, Optional, Text
 
 from evidently import ColumnMapping
 from fastapi import FastAPI, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, Response, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from evidently._pydantic_compat import BaseModel
 import pandas as pd
 
 from config.config import DATA_COLUMNS
-from src.utils.data import load_current_data, load_reference_data
-from src.utils.predictions import get_predictions, save_predictions
+from data_master_eng_ml.features import NON_FEATURE_COLUMNS, build_features
+from src.utils.data import load_reference_data
+from src.utils.predictions import get_predictions
 from src.utils.reports import (
     get_column_mapping,
     build_model_performance_report,
     build_target_drift_report,
 )
-from utils import ModelLoader
-
+from batching import (
+    PREDICT_BATCHING,
+    PREDICT_MAX_BATCH_SIZE,
+    PREDICT_MAX_WAIT_MS,
+    MicroBatcher,
+)
+from executors import predict_executor, report_executor, run_in_executor, shutdown_executors
+from drift import DriftMonitor
+from metrics import (
+    PREDICT_BATCH_ROWS,
+    PREDICT_STAGE_SECONDS,
+    REPORT_SECONDS,
+    MetricsMiddleware,
+    registry,
+)
+from monitoring import ReportCache
+from prediction_store import prediction_store, save_predictions
+from utils import ModelLoader, get_feature_names, predict_scores, to_model_input
 
 logging.basicConfig(
     level=logging.INFO, format="FASTAPI_APP - %(asctime)s - %(levelname)s - %(message)s"
@@ -29,72 +48,349 @@ class Features(BaseModel):
     features: Text
 
 
+class Games(BaseModel):
+    """Games in the intermediate dataset format (`dataset.build_games_dataset`), as JSON."""
+
+    games: Text
+
+
+class BatchFeatures(BaseModel):
+    """Column-oriented batch of features: one array per feature, aligned with `ids`."""
+
+    ids: List[int]
+    columns: Dict[Text, List[Any]]
+
+
+class BatchPredictions(BaseModel):
+    """Scores aligned with the request ids."""
+
+    ids: List[int]
+    scores: List[float]
+
+
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 model_loader: ModelLoader = ModelLoader()
 
+# Per-stage latency children, resolved once so the hot path only observes
+READ_JSON_SECONDS = PREDICT_STAGE_SECONDS.labels("read_json")
+MODEL_INPUT_SECONDS = PREDICT_STAGE_SECONDS.labels("model_input")
+MODEL_SECONDS = PREDICT_STAGE_SECONDS.labels("model")
+TO_JSON_SECONDS = PREDICT_STAGE_SECONDS.labels("to_json")
+
+
+def predict_features(features: pd.DataFrame):
+    """Score a features frame with the current model (one vectorized call)."""
+    model = model_loader.get_model()
+    PREDICT_BATCH_ROWS.observe(len(features))
+    with MODEL_SECONDS.time():
+        return get_predictions(features, model)
+
+
+report_cache: ReportCache = ReportCache(
+    prediction_store,
+    load_reference=lambda: load_reference_data(columns=DATA_COLUMNS["columns"]),
+    data_columns=DATA_COLUMNS,
+)
+drift_monitor: DriftMonitor = DriftMonitor(
+    prediction_store, reference=lambda: report_cache.reference()[1]
+)
+batcher: MicroBatcher = MicroBatcher(
+    predict_features,
+    max_batch_size=PREDICT_MAX_BATCH_SIZE,
+    max_wait_ms=PREDICT_MAX_WAIT_MS,
+    executor=predict_executor,
+)
+
+
+@app.on_event("startup")
+def load_model() -> None:
+    # Load and warm the model in the background; `/ready` reports when it is done
+    model_loader.reload_in_background()
+
+
+@app.on_event("startup")
+async def start_batcher() -> None:
+    if PREDICT_BATCHING:
+        logging.info(
+            f"Micro-batching enabled (max_batch_size={batcher.max_batch_size}, "
+            f"max_wait_ms={batcher.max_wait * 1000:g})"
+        )
+        batcher.start()
+
+
+@app.on_event("startup")
+def start_prediction_store() -> None:
+    prediction_store.start()
+
+
+@app.on_event("startup")
+def load_reference() -> None:
+    # Load and profile the reference data before the first `/monitor-*` request
+    report_executor.submit(report_cache.reference)
+
+
+@app.on_event("shutdown")
+async def stop_batcher() -> None:
+    await batcher.stop()
+    shutdown_executors()
+
+
+@app.on_event("shutdown")
+def stop_prediction_store() -> None:
+    # Write the rows still buffered before exiting
+    prediction_store.close()
+
 
 @app.get("/")
 def index() -> HTMLResponse:
     return HTMLResponse("<h1><i>Evidently + FastAPI</i></h1>")
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before."""
+    if not model_loader.ready:
+        return JSONResponse(content={"ready": False}, status_code=503)
+    return JSONResponse(content={"ready": True, **model_loader.info})
+
+
+@app.post("/model/reload", status_code=202)
+def reload_model(version: Optional[Text] = None) -> JSONResponse:
+    """Load a model version in the background and swap it in when it is warm.
+
+    `version` is a registry version number or alias when MODEL_URI is set, otherwise
+    the file name of a model in MODELS_DIR; anything else is rejected with 400.
+    """
+    try:
+        started = model_loader.reload_in_background(version)
+    except ValueError as e:
+        return JSONResponse(content={"error_msg": str(e)}, status_code=400)
+    return JSONResponse(
+        content={
+            "reloading": started,
+            "version": version or model_loader.model_uri or model_loader.model_path,
+        },
+        status_code=202 if started else 409,
+    )
+
+
 @app.post("/predict")
-def predict(
-    response: Response, features_item: Features, background_tasks: BackgroundTasks
-) -> JSONResponse:
+async def predict(features_item: Features, background_tasks: BackgroundTasks) -> JSONResponse:
     try:
         # Receive features item and read features batch
-        features: pd.DataFrame = pd.read_json(features_item.features)
-        # Compute predictions
-        model: Callable = model_loader.get_model()
-        features["predictions"] = get_predictions(features, model)
-        # Save predictions to database (in the background)
+        with READ_JSON_SECONDS.time():
+            features: pd.DataFrame = pd.read_json(StringIO(features_item.features))
+        # Compute predictions, grouped with concurrent requests when batching is enabled
+        if batcher.running:
+            features["predictions"] = await batcher.predict(features)
+        else:
+            features["predictions"] = await run_in_executor(
+                predict_executor, predict_features, features
+            )
+        # Queue predictions for the prediction log (flushed to Parquet in batches)
         background_tasks.add_task(save_predictions, features)
         # Return JSON with predictions dataframe serialized to JSON string
-        return JSONResponse(content={"predictions": features.to_json()})
+        with TO_JSON_SECONDS.time():
+            predictions_json = features.to_json()
+        return JSONResponse(content={"predictions": predictions_json})
     except Exception as e:
-        response.status_code = 500
         logging.error(e, exc_info=True)
-        return JSONResponse(content={"error_msg": str(e)})
+        return JSONResponse(content={"error_msg": str(e)}, status_code=500)
 
 
-@app.get("/monitor-model")
-def monitor_model_performance(window_size: int = 3000) -> FileResponse:
+def games_to_features(games_json: Text) -> pd.DataFrame:
+    """Build the model features of raw games with the same function used in training.
 
-    logging.info("Read current data")
-    current_data: pd.DataFrame = load_current_data(window_size)
+    Raises:
+        KeyError, ValueError: If the games lack columns of the intermediate dataset.
+    """
+    with READ_JSON_SECONDS.time():
+        games = pd.read_json(StringIO(games_json))
+    return build_features(games)
 
-    logging.info("Read reference data")
-    reference_data = load_reference_data(columns=DATA_COLUMNS["columns"])
 
-    logging.info("Build report")
+@app.post("/predict-games")
+async def predict_games(games_item: Games, background_tasks: BackgroundTasks) -> JSONResponse:
+    """Score games from the intermediate dataset: features are built server-side."""
+    try:
+        try:
+            features = await run_in_executor(predict_executor, games_to_features, games_item.games)
+        except (KeyError, ValueError) as e:
+            return JSONResponse(content={"error_msg": str(e)}, status_code=422)
+        model_input = features.drop(columns=NON_FEATURE_COLUMNS)
+        if batcher.running:
+            scores = await batcher.predict(model_input)
+        else:
+            scores = await run_in_executor(predict_executor, predict_features, model_input)
+        features = features.drop(columns=["target"])
+        features["predictions"] = scores
+        background_tasks.add_task(save_predictions, features)
+        with TO_JSON_SECONDS.time():
+            predictions_json = features[["id", "name", "predictions"]].to_json()
+        return JSONResponse(content={"predictions": predictions_json})
+    except Exception as e:
+        logging.error(e, exc_info=True)
+        return JSONResponse(content={"error_msg": str(e)}, status_code=500)
+
+
+def save_batch_predictions(ids: List[int], columns: Dict[Text, List[Any]], scores: List[float]):
+    """Build the predictions frame off the request path and hand it to `save_predictions`."""
+    features = pd.DataFrame(columns)
+    features["id"] = ids
+    features["predictions"] = scores
+    save_predictions(features)
+
+
+def score_batch(batch: BatchFeatures) -> List[float]:
+    """Assemble the model input and score the whole batch in a single call.
+
+    Raises:
+        KeyError, ValueError: If the columns do not match the model features, or the
+            model does not expose its feature names (the column order would be a guess).
+    """
+    model: Callable = model_loader.get_model()
+    with MODEL_INPUT_SECONDS.time():
+        feature_names = get_feature_names(model)
+        if feature_names is None:
+            raise ValueError(
+                "The model does not expose its feature names; /predict-batch cannot order "
+                "the columns, use /predict"
+            )
+        model_input = to_model_input(batch.columns, feature_names, len(batch.ids), model)
+    PREDICT_BATCH_ROWS.observe(len(batch.ids))
+    with MODEL_SECONDS.time():
+        return predict_scores(model, model_input).tolist()
+
+
+@app.post("/predict-batch", response_model=BatchPredictions)
+async def predict_batch(batch: BatchFeatures, background_tasks: BackgroundTasks) -> JSONResponse:
+    try:
+        try:
+            scores = await run_in_executor(predict_executor, score_batch, batch)
+        except (KeyError, ValueError) as e:
+            return JSONResponse(content={"error_msg": str(e)}, status_code=422)
+        background_tasks.add_task(save_batch_predictions, batch.ids, batch.columns, scores)
+        return JSONResponse(content={"ids": batch.ids, "scores": scores})
+    except Exception as e:
+        logging.error(e, exc_info=True)
+        return JSONResponse(content={"error_msg": str(e)}, status_code=500)
+
+
+@app.get("/batching/stats")
+def batching_stats() -> JSONResponse:
+    """Achieved batch sizes of the `/predict` micro-batcher."""
+    return JSONResponse(content={"enabled": batcher.running, **batcher.stats.snapshot()})
+
+
+@app.get("/predictions/stats")
+def predictions_stats() -> JSONResponse:
+    """Rows appended, flushed, buffered and dropped by the prediction log."""
+    return JSONResponse(content=prediction_store.snapshot())
+
+
+REPORT_BUILDERS: Dict[Text, Callable[..., Text]] = {
+    "model": build_model_performance_report,
+    "target": build_target_drift_report,
+}
+
+
+def render_report(kind: Text, reference_data: pd.DataFrame, current_data: pd.DataFrame) -> Text:
+    """Build an Evidently report and return its HTML (runs in the report pool)."""
+
+    logging.info(f"Build {kind} report")
     column_mapping: ColumnMapping = get_column_mapping(**DATA_COLUMNS)
-    report_path: Text = build_model_performance_report(
-        reference_data=reference_data,
-        current_data=current_data,
-        column_mapping=column_mapping,
-    )
+    with REPORT_SECONDS.labels(kind).time():
+        report_path: Text = REPORT_BUILDERS[kind](
+            reference_data=reference_data,
+            current_data=current_data,
+            column_mapping=column_mapping,
+        )
+    with open(report_path) as report_file:
+        return report_file.read()
+
+
+async def get_report(kind: Text, window_size: int) -> HTMLResponse:
+    """Cached report of the window, built in the report pool only when it changed."""
+    html: Optional[Text] = report_cache.cached(kind, window_size)
+    if html is None:
+        html = await run_in_executor(
+            report_executor,
+            report_cache.get_or_build,
+            kind,
+            window_size,
+            functools.partial(render_report, kind),
+        )
 
     logging.info("Return report as html")
-    return FileResponse(report_path)
+    return HTMLResponse(html)
+
+
+@app.get("/monitor-model")
+async def monitor_model_performance(window_size: int = 3000) -> HTMLResponse:
+    return await get_report("model", window_size)
 
 
 @app.get("/monitor-target")
-def monitor_target_drift(window_size: int = 3000) -> FileResponse:
+async def monitor_target_drift(window_size: int = 3000) -> HTMLResponse:
+    return await get_report("target", window_size)
 
-    logging.info("Read current data")
-    current_data: pd.DataFrame = load_current_data(window_size)
 
-    logging.info("Read reference data")
-    reference_data = load_reference_data(columns=DATA_COLUMNS["columns"])
+@app.get("/monitor-stats")
+async def monitor_stats(window_size: int = 3000) -> JSONResponse:
+    """Binned reference and current-window distributions, without rendering a report."""
+    summary = await run_in_executor(report_executor, report_cache.summary, window_size)
+    return JSONResponse(content={**summary, "report_cache": report_cache.stats})
 
-    logging.info("Build report")
-    column_mapping: ColumnMapping = get_column_mapping(**DATA_COLUMNS)
-    report_path: Text = build_target_drift_report(
-        reference_data=reference_data,
-        current_data=current_data,
-        column_mapping=column_mapping,
+
+@app.get("/metrics/drift")
+async def drift_metrics() -> JSONResponse:
+    """PSI, Jensen-Shannon and KS drift scores per feature, for alerting."""
+    if drift_monitor.ready:
+        # Computed from the in-memory sketches: microseconds, no report pool round trip
+        scores = drift_monitor.scores()
+    else:
+        scores = await run_in_executor(report_executor, drift_monitor.scores)
+    return JSONResponse(content=scores)
+
+
+# Values the service already tracks, read only when `/metrics` is scraped
+registry.gauge("model_ready", "1 once the model is loaded and warm.", lambda: model_loader.ready)
+registry.gauge(
+    "model_load_seconds",
+    "Load time of the current model.",
+    lambda: model_loader.info.get("load_seconds"),
+)
+registry.gauge(
+    "model_warmup_seconds",
+    "Warm-up time of the current model.",
+    lambda: model_loader.info.get("warmup_seconds"),
+)
+registry.gauge(
+    "predict_batcher_queue_depth",
+    "Requests waiting in the /predict micro-batcher.",
+    lambda: batcher.queue_depth,
+)
+registry.gauge(
+    "prediction_writer_buffered_rows",
+    "Predictions waiting to be written by the prediction log.",
+    lambda: prediction_store.snapshot()["buffered_rows"],
+)
+for stat in ("appended", "flushed", "dropped"):
+    registry.counter(
+        f"prediction_writer_{stat}_rows_total",
+        f"Rows {stat} by the prediction log.",
+        functools.partial(lambda key: prediction_store.stats[key], f"{stat}_rows"),
+    )
+for stat in ("hits", "misses"):
+    registry.counter(
+        f"report_cache_{stat}_total",
+        f"Report cache {stat}.",
+        functools.partial(lambda key: report_cache.stats[key], stat),
     )
 
-    logging.info("Return report as html")
-    return FileResponse(report_path)
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus scrape endpoint."""
+    return Response(registry.exposition(), media_type="text/plain; version=0.0.4")
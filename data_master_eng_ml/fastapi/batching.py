@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Opt-in: set PREDICT_BATCHING=1 to route `/predict` through the micro-batcher
+PREDICT_BATCHING: bool = os.getenv("PREDICT_BATCHING", "0") == "1"
+PREDICT_MAX_BATCH_SIZE: int = int(os.getenv("PREDICT_MAX_BATCH_SIZE", 64))
+PREDICT_MAX_WAIT_MS: float = float(os.getenv("PREDICT_MAX_WAIT_MS", 5))
+
+
+@dataclass
+class _PendingRequest:
+    features: pd.DataFrame
+    future: asyncio.Future
+
+
+@dataclass
+class BatchStats:
+    """Achieved batch sizes, to tune max-batch-size / max-wait against tail latency."""
+
+    batches: int = 0
+    rows: int = 0
+    requests: int = 0
+    max_batch_size: int = 0
+    # Upper bound of the bucket (powers of two) -> number of batches
+    histogram: Dict[int, int] = field(default_factory=dict)
+
+    def record(self, n_requests: int, n_rows: int) -> None:
+        self.batches += 1
+        self.requests += n_requests
+        self.rows += n_rows
+        self.max_batch_size = max(self.max_batch_size, n_rows)
+        bucket = 1 << max(n_rows - 1, 0).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "histogram": {
+                f"<={bucket}": count for bucket, count in sorted(self.histogram.items())
+            },
+        }
+
+
+class MicroBatcher:
+    """Dynamic batcher for concurrent `/predict` requests.
+
+    Requests are queued and grouped for up to `max_wait_ms` or `max_batch_size` rows,
+    whichever comes first. Requests with the same column set are scored together with a
+    single vectorized call of `predict_fn` (run in an executor so the event loop stays
+    free) and the scores are split back to the awaiting requests in order; a request
+    with other columns goes to its own call instead of being padded with NaN.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[pd.DataFrame], np.ndarray],
+        max_batch_size: int = PREDICT_MAX_BATCH_SIZE,
+        max_wait_ms: float = PREDICT_MAX_WAIT_MS,
+        executor=None,
+    ) -> None:
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.stats = BatchStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Requests taken from the queue and not answered yet (failed if the batcher stops)
+        self._in_flight: List[_PendingRequest] = []
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting to be grouped into a batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the batching loop; must be called from the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching loop and fail the requests that were not answered."""
+        if not self.running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        pending = self._in_flight
+        self._in_flight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        error = RuntimeError("Micro-batcher stopped before scoring the request")
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    async def predict(self, features: pd.DataFrame) -> np.ndarray:
+        """Queue `features` and wait for its scores."""
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(features, future))
+        return await future
+
+    async def _collect(self) -> List[_PendingRequest]:
+        """Wait for the first request, then gather more until the size or time limit."""
+        loop = asyncio.get_running_loop()
+        batch = self._in_flight = [await self._queue.get()]
+        rows = len(batch[0].features)
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                pending = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(pending)
+            rows += len(pending.features)
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            groups: Dict[FrozenSet, List[_PendingRequest]] = {}
+            for pending in batch:
+                groups.setdefault(frozenset(pending.features.columns), []).append(pending)
+            for group in groups.values():
+                await self._score(group)
+            self._in_flight = []
+
+    async def _score(self, batch: List[_PendingRequest]) -> None:
+        """Score requests with the same columns in one call and answer each one."""
+        loop = asyncio.get_running_loop()
+        frames = [pending.features for pending in batch]
+        offsets = np.cumsum([0] + [len(frame) for frame in frames])
+        try:
+            features = pd.concat(frames, ignore_index=True)
+            scores = np.asarray(
+                await loop.run_in_executor(self.executor, self.predict_fn, features)
+            )
+        except Exception as e:
+            # Propagate the failure to every request of the batch
+            logging.error(e, exc_info=True)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        self.stats.record(len(batch), int(offsets[-1]))
+        for pending, start, end in zip(batch, offsets[:-1], offsets[1:]):
+            if not pending.future.done():
+                pending.future.set_result(scores[start:end])
@@ -0,0 +1,179 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Text
+
+import numpy as np
+import pandas as pd
+
+from monitoring import ReferenceProfile
+from prediction_store import PREDICTION_ID, PredictionStore
+
+# Number of most recent predictions compared against the reference
+DRIFT_WINDOW_SIZE: int = int(os.getenv("DRIFT_WINDOW_SIZE", 3000))
+# PSI above which a feature is flagged as drifted (0.1 moderate, 0.2 significant)
+DRIFT_PSI_THRESHOLD: float = float(os.getenv("DRIFT_PSI_THRESHOLD", 0.2))
+# Floor of bin proportions, so empty bins do not make PSI infinite
+EPSILON = 1e-4
+
+
+def _proportions(counts: np.ndarray) -> np.ndarray:
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(len(counts))
+    return counts / total
+
+
+def psi(reference: np.ndarray, current: np.ndarray) -> float:
+    """Population stability index between two histograms over the same bins."""
+    expected = np.clip(_proportions(reference), EPSILON, None)
+    actual = np.clip(_proportions(current), EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def jensen_shannon(reference: np.ndarray, current: np.ndarray) -> float:
+    """Jensen-Shannon divergence (base 2, between 0 and 1) between two histograms."""
+    p, q = _proportions(reference), _proportions(current)
+    m = (p + q) / 2
+
+    def kl(a: np.ndarray) -> float:
+        mask = a > 0
+        return float(np.sum(a[mask] * np.log2(a[mask] / m[mask])))
+
+    return (kl(p) + kl(q)) / 2
+
+
+def ks(reference: np.ndarray, current: np.ndarray) -> float:
+    """Kolmogorov-Smirnov statistic between two histograms over ordered bins."""
+    cdf_reference = np.cumsum(_proportions(reference))
+    cdf_current = np.cumsum(_proportions(current))
+    return float(np.max(np.abs(cdf_reference - cdf_current)))
+
+
+class DriftSketch:
+    """Fixed-bin counts of the last `window_size` rows, per column.
+
+    The bin of each row is kept in a ring buffer: appending a row adds one to its bin
+    and subtracts one from the bin of the row it overwrites, so an update costs O(1)
+    per row and column, regardless of the window size.
+    """
+
+    def __init__(self, profile: ReferenceProfile, window_size: int) -> None:
+        self.profile = profile
+        self.window_size = window_size
+        self.columns = list(profile.columns)
+        # No profiled columns (e.g. empty reference): no counts, scores have no features
+        n_bins = max((c.n_bins for c in profile.columns.values()), default=0)
+        self.counts = np.zeros((len(self.columns), n_bins + 1), dtype=np.int64)
+        # Bin of each row in the window, -1 for empty slots (counted in the spare last bin)
+        self.ring = np.full((window_size, len(self.columns)), -1, dtype=np.int32)
+        self.position = 0
+        self.n_rows = 0
+        self.last_id = -1
+
+    def update(self, frame: pd.DataFrame) -> None:
+        if frame.empty:
+            return
+        # The store delivers frames in id order, so only rows of the fill are seen twice
+        if PREDICTION_ID in frame:
+            ids = frame[PREDICTION_ID].to_numpy()
+            if ids[0] <= self.last_id:
+                frame = frame[ids > self.last_id]
+                if frame.empty:
+                    return
+            self.last_id = int(ids[-1])
+        if len(frame) > self.window_size:
+            frame = frame.tail(self.window_size)
+        present = set(frame.columns)
+        bins = np.empty((len(frame), len(self.columns)), dtype=np.int32)
+        for index, name in enumerate(self.columns):
+            bins[:, index] = self.profile.columns[name].bin(
+                frame[name].to_numpy() if name in present else np.full(len(frame), np.nan)
+            )
+        slots = (self.position + np.arange(len(frame))) % self.window_size
+        column_index = np.broadcast_to(np.arange(len(self.columns)), bins.shape)
+        np.subtract.at(self.counts, (column_index, self.ring[slots]), 1)
+        np.add.at(self.counts, (column_index, bins), 1)
+        self.ring[slots] = bins
+        self.position = (self.position + len(frame)) % self.window_size
+        self.n_rows = min(self.n_rows + len(frame), self.window_size)
+
+    def histogram(self, column: Text) -> np.ndarray:
+        index = self.columns.index(column)
+        return self.counts[index, : self.profile.columns[column].n_bins]
+
+
+class DriftMonitor:
+    """Drift scores of the most recent predictions against the reference data.
+
+    The sketch is created on first use, from the reference profile shared with
+    `ReportCache`, filled from the prediction log and then updated on every append;
+    scores are computed from the counts on demand and never touch an Evidently report.
+    """
+
+    def __init__(
+        self,
+        store: PredictionStore,
+        reference: Callable[[], ReferenceProfile],
+        window_size: int = DRIFT_WINDOW_SIZE,
+        psi_threshold: float = DRIFT_PSI_THRESHOLD,
+    ) -> None:
+        self.store = store
+        self.reference = reference
+        self.window_size = window_size
+        self.psi_threshold = psi_threshold
+        self._lock = threading.Lock()
+        self._sketch: Optional[DriftSketch] = None
+        store.subscribe(self._on_append)
+
+    @property
+    def ready(self) -> bool:
+        return self._sketch is not None
+
+    def sketch(self) -> DriftSketch:
+        if self._sketch is None:
+            profile = self.reference()
+            # Appends wait for the fill; rows it already read are skipped by their id
+            with self._lock:
+                if self._sketch is None:
+                    sketch = DriftSketch(profile, self.window_size)
+                    sketch.update(self.store.last(self.window_size))
+                    self._sketch = sketch
+        return self._sketch
+
+    def _on_append(self, frame: pd.DataFrame) -> None:
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.update(frame)
+
+    def scores(self) -> Dict[Text, Any]:
+        """PSI, Jensen-Shannon and (numerical columns) KS of each column."""
+        sketch = self.sketch()
+        with self._lock:
+            histograms = {name: sketch.histogram(name).copy() for name in sketch.columns}
+            n_rows, last_id = sketch.n_rows, sketch.last_id
+
+        features = {}
+        for name, current in histograms.items():
+            column = sketch.profile.columns[name]
+            reference = column.counts
+            scores = {
+                "kind": column.kind,
+                "psi": round(psi(reference, current), 6),
+                "jensen_shannon": round(jensen_shannon(reference, current), 6),
+            }
+            if column.kind == "numerical":
+                # Ordered bins only; the missing-value bin has no place in the CDF
+                scores["ks"] = round(ks(reference[:-1], current[:-1]), 6)
+            scores["drift"] = bool(n_rows and scores["psi"] > self.psi_threshold)
+            features[name] = scores
+
+        n_drifted = sum(scores["drift"] for scores in features.values())
+        return {
+            "window_size": self.window_size,
+            "rows": n_rows,
+            "last_prediction_id": last_id,
+            "psi_threshold": self.psi_threshold,
+            "drifted_features": n_drifted,
+            "drift_share": round(n_drifted / len(features), 6) if features else 0.0,
+            "features": features,
+        }
@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+
+# Inference pool sized to the cores; reports get a small pool of their own so a slow
+# `/monitor-*` request never occupies the threads `/predict` depends on.
+PREDICT_WORKERS: int = int(os.getenv("PREDICT_WORKERS", os.cpu_count() or 1))
+REPORT_WORKERS: int = int(os.getenv("REPORT_WORKERS", 1))
+# Niceness added to report threads (Linux schedules threads individually)
+REPORT_NICENESS: int = int(os.getenv("REPORT_NICENESS", 10))
+
+
+def _lower_thread_priority() -> None:
+    """Executor initializer: lower the OS scheduling priority of the current thread."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), REPORT_NICENESS)
+    except (AttributeError, OSError) as e:
+        logging.warning(f"Could not lower report thread priority: {e}")
+
+
+predict_executor: Executor = ThreadPoolExecutor(
+    max_workers=PREDICT_WORKERS, thread_name_prefix="predict"
+)
+report_executor: Executor = ThreadPoolExecutor(
+    max_workers=REPORT_WORKERS,
+    thread_name_prefix="report",
+    initializer=_lower_thread_priority,
+)
+
+
+async def run_in_executor(executor: Executor, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Await `func(*args, **kwargs)` running in `executor` without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    predict_executor.shutdown(wait=False, cancel_futures=True)
+    report_executor.shutdown(wait=False, cancel_futures=True)
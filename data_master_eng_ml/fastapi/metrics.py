@@ -0,0 +1,212 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Text, Tuple
+
+# Latency buckets in seconds (100 us to 10 s) and size buckets in rows
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+LabelValues = Tuple[Text, ...]
+
+
+def _format_labels(names: Sequence[Text], values: LabelValues, extra: Text = "") -> Text:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _HistogramChild:
+    """Bucket counts of one label combination; `observe` is a bisect and two additions."""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram:
+    """Prometheus histogram with fixed buckets.
+
+    Children are created once per label combination; hot paths should keep the child
+    returned by `labels` instead of looking it up on every call.
+    """
+
+    def __init__(
+        self,
+        name: Text,
+        documentation: Text,
+        labelnames: Sequence[Text] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Text) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def collect(self) -> List[Text]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.labelnames, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {total:.6g}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from the application when scraped.
+
+    Used for values the application already tracks (buffer sizes, cache counters),
+    so the hot path pays nothing for them.
+    """
+
+    def __init__(
+        self,
+        name: Text,
+        documentation: Text,
+        callback: Callable[[], Optional[float]],
+        metric_type: Text = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def collect(self) -> List[Text]:
+        value = self.callback()
+        if value is None:
+            return []
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {float(value):.6g}",
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: Text, documentation: Text, callback: Callable) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, "gauge"))
+
+    def counter(self, name: Text, documentation: Text, callback: Callable) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, "counter"))
+
+    def exposition(self) -> Text:
+        """Metrics in the Prometheus text format (version 0.0.4)."""
+        lines: List[Text] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency, including body parsing and validation.",
+        ("method", "route", "status"),
+    )
+)
+PREDICT_STAGE_SECONDS = registry.register(
+    Histogram(
+        "predict_stage_duration_seconds",
+        "Latency of each stage of /predict and /predict-batch.",
+        ("stage",),
+    )
+)
+PREDICT_BATCH_ROWS = registry.register(
+    Histogram("predict_batch_rows", "Rows scored per model call.", buckets=SIZE_BUCKETS)
+)
+REPORT_SECONDS = registry.register(
+    Histogram(
+        "report_build_duration_seconds",
+        "Evidently report build time (cache misses only).",
+        ("kind",),
+        buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+    )
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording `http_request_duration_seconds`.
+
+    Plain ASGI rather than `BaseHTTPMiddleware`, which adds a task and a stream copy per
+    request. The route template (e.g. `/monitor-model`) is used as label, not the raw
+    path, to keep the number of series bounded.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status[0]
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,347 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+import pandas as pd
+
+from prediction_store import PREDICTION_ID, PredictionStore
+
+# Quantile bins per numerical column and categories kept per categorical column
+REFERENCE_BINS: int = int(os.getenv("REFERENCE_BINS", 10))
+REFERENCE_MAX_CATEGORIES: int = int(os.getenv("REFERENCE_MAX_CATEGORIES", 50))
+# Number of window sizes tracked incrementally and of rendered reports kept in memory
+MONITOR_MAX_WINDOWS: int = int(os.getenv("MONITOR_MAX_WINDOWS", 4))
+REPORT_CACHE_SIZE: int = int(os.getenv("REPORT_CACHE_SIZE", 16))
+# A cached report younger than this is served even if new predictions arrived (0: exact)
+REPORT_MAX_AGE_S: float = float(os.getenv("REPORT_MAX_AGE_S", 0))
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+OTHER = "__other__"
+
+
+@dataclass
+class ColumnProfile:
+    """Fixed bins of a column, derived from the reference data.
+
+    Numerical columns get quantile bins (open-ended at both sides), categorical columns
+    one bin per frequent category plus an "other" bin; the last bin counts missing values.
+    """
+
+    name: Text
+    kind: Text
+    edges: np.ndarray = field(default_factory=lambda: np.empty(0))
+    categories: List[Any] = field(default_factory=list)
+    counts: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    summary: Dict[Text, Any] = field(default_factory=dict)
+    _codes: Optional[Dict[Any, int]] = field(default=None, repr=False)
+
+    @classmethod
+    def numerical(cls, name: Text, values: pd.Series) -> "ColumnProfile":
+        values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        present = values[~np.isnan(values)]
+        if present.size:
+            edges = np.quantile(present, np.linspace(0, 1, REFERENCE_BINS + 1)[1:-1])
+            summary = {
+                "mean": float(present.mean()),
+                "std": float(present.std()),
+                "min": float(present.min()),
+                "max": float(present.max()),
+                **{f"q{int(q * 100)}": float(np.quantile(present, q)) for q in QUANTILES},
+            }
+        else:
+            edges, summary = np.empty(0), {}
+        profile = cls(name, "numerical", edges=np.unique(edges), summary=summary)
+        profile.counts = profile.histogram(values)
+        return profile
+
+    @classmethod
+    def categorical(cls, name: Text, values: pd.Series) -> "ColumnProfile":
+        frequent = values.value_counts().index[:REFERENCE_MAX_CATEGORIES]
+        profile = cls(name, "categorical", categories=list(frequent))
+        profile.counts = profile.histogram(values)
+        return profile
+
+    @property
+    def n_bins(self) -> int:
+        if self.kind == "numerical":
+            return len(self.edges) + 2
+        return len(self.categories) + 2
+
+    @property
+    def labels(self) -> List[Text]:
+        if self.kind == "numerical":
+            bounds = ["-inf", *(f"{edge:g}" for edge in self.edges), "inf"]
+            bins = [f"({low}, {high}]" for low, high in zip(bounds, bounds[1:])]
+        else:
+            bins = [str(category) for category in self.categories] + [OTHER]
+        return bins + ["missing"]
+
+    def bin(self, values: Any) -> np.ndarray:
+        """Bin index of each value (vectorized)."""
+        missing = self.n_bins - 1
+        if self.kind == "numerical":
+            try:
+                values = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(np.float64)
+            bins = np.searchsorted(self.edges, values, side="left")
+            return np.where(np.isnan(values), missing, bins)
+        if self._codes is None:
+            self._codes = {category: code for code, category in enumerate(self.categories)}
+        # A dict lookup per value is far cheaper than pandas for the few rows of a request
+        return np.fromiter(
+            (
+                missing if pd.isna(value) else self._codes.get(value, missing - 1)
+                for value in np.asarray(values, dtype=object)
+            ),
+            dtype=np.int64,
+            count=len(values),
+        )
+
+    def histogram(self, values: Any) -> np.ndarray:
+        return np.bincount(self.bin(values), minlength=self.n_bins).astype(np.int64)
+
+
+class ReferenceProfile:
+    """Per-column bins, counts and summary statistics of the reference data."""
+
+    def __init__(self, reference_data: pd.DataFrame, data_columns: Dict[Text, Any]) -> None:
+        start = time.perf_counter()
+        self.n_rows = len(reference_data)
+        self.columns: Dict[Text, ColumnProfile] = {}
+        numerical = list(data_columns.get("num_features") or [])
+        prediction_col = data_columns.get("prediction_col")
+        if prediction_col:
+            numerical.append(prediction_col)
+        for name in numerical:
+            if name in reference_data:
+                self.columns[name] = ColumnProfile.numerical(name, reference_data[name])
+        for name in data_columns.get("cat_features") or []:
+            if name in reference_data:
+                self.columns[name] = ColumnProfile.categorical(name, reference_data[name])
+        logging.info(
+            f"Reference profile of {len(self.columns)} columns "
+            f"built in {time.perf_counter() - start:.3f}s"
+        )
+
+    def histograms(self, data: pd.DataFrame) -> Dict[Text, np.ndarray]:
+        """Counts of `data` in the reference bins; absent columns count as missing."""
+        histograms = {}
+        for name, profile in self.columns.items():
+            values = data[name] if name in data else np.full(len(data), np.nan)
+            histograms[name] = profile.histogram(values)
+        return histograms
+
+
+class CurrentWindow:
+    """The last `window_size` predictions and their histograms, updated on every append.
+
+    Appended rows are binned once; rows leaving the window are subtracted, so the
+    histograms are always those of exactly the rows in the window.
+    """
+
+    def __init__(self, window_size: int, profile: ReferenceProfile) -> None:
+        self.window_size = window_size
+        self.profile = profile
+        self.last_id = -1
+        self._lock = threading.Lock()
+        self._frames: Deque[pd.DataFrame] = deque()
+        self._n_rows = 0
+        self.counts: Dict[Text, np.ndarray] = {
+            name: np.zeros(column.n_bins, dtype=np.int64)
+            for name, column in profile.columns.items()
+        }
+
+    def reset(self, data: pd.DataFrame) -> None:
+        """Fill the window from the prediction log, keeping rows appended meanwhile."""
+        with self._lock:
+            pending = list(self._frames)
+            self._frames.clear()
+            self._n_rows = 0
+            self.counts = {name: np.zeros_like(counts) for name, counts in self.counts.items()}
+            self.last_id = -1
+            self._append(data)
+            for frame in pending:
+                self._append(frame)
+
+    def append(self, frame: pd.DataFrame) -> None:
+        with self._lock:
+            self._append(frame)
+
+    def _append(self, frame: pd.DataFrame) -> None:
+        # The store delivers frames in id order, so only rows `reset` already read are old
+        if PREDICTION_ID in frame:
+            frame = frame[frame[PREDICTION_ID] > self.last_id]
+        if frame.empty:
+            return
+        frame = frame.tail(self.window_size)
+        for name, counts in self.profile.histograms(frame).items():
+            self.counts[name] += counts
+        self._frames.append(frame)
+        self._n_rows += len(frame)
+        if PREDICTION_ID in frame:
+            self.last_id = int(frame[PREDICTION_ID].iloc[-1])
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._n_rows > self.window_size:
+            oldest = self._frames[0]
+            excess = self._n_rows - self.window_size
+            leaving = oldest if excess >= len(oldest) else oldest.iloc[:excess]
+            for name, counts in self.profile.histograms(leaving).items():
+                self.counts[name] -= counts
+            if leaving is oldest:
+                self._frames.popleft()
+            else:
+                self._frames[0] = oldest.iloc[excess:]
+            self._n_rows -= len(leaving)
+
+    def data(self) -> Tuple[int, pd.DataFrame]:
+        """Last id and rows of the window, oldest first."""
+        with self._lock:
+            last_id, frames = self.last_id, list(self._frames)
+        if not frames:
+            return last_id, pd.DataFrame()
+        data = pd.concat(frames, ignore_index=True)
+        return last_id, data.drop(columns=PREDICTION_ID, errors="ignore")
+
+    def snapshot(self) -> Tuple[int, int, Dict[Text, np.ndarray]]:
+        """Consistent (last id, number of rows, histograms) of the window."""
+        with self._lock:
+            counts = {name: counts.copy() for name, counts in self.counts.items()}
+            return self.last_id, self._n_rows, counts
+
+
+class ReportCache:
+    """Reference data, current windows and rendered reports shared by `/monitor-*`.
+
+    The reference data is loaded and profiled once. Current windows are created on the
+    first request of a window size, filled from the prediction log and then kept up to
+    date by the log's append hook. Rendered HTML is cached by
+    (report kind, window size, last prediction id), so a dashboard reloading an
+    unchanged window never rebuilds the report.
+    """
+
+    def __init__(
+        self,
+        store: PredictionStore,
+        load_reference: Callable[[], pd.DataFrame],
+        data_columns: Dict[Text, Any],
+    ) -> None:
+        self.store = store
+        self.load_reference = load_reference
+        self.data_columns = data_columns
+        self._lock = threading.Lock()
+        # Serializes the reference load, which must not hold `_lock`
+        self._reference_lock = threading.Lock()
+        self._reference: Optional[pd.DataFrame] = None
+        self._profile: Optional[ReferenceProfile] = None
+        self._windows: "OrderedDict[int, CurrentWindow]" = OrderedDict()
+        self._reports: "OrderedDict[Tuple[Text, int, int], Tuple[float, Text]]" = OrderedDict()
+        self.stats: Dict[Text, int] = {"hits": 0, "misses": 0}
+        store.subscribe(self._on_append)
+
+    def reference(self) -> Tuple[pd.DataFrame, ReferenceProfile]:
+        """Reference data and its profile, loaded once.
+
+        The load (seconds) only holds `_reference_lock`, so `cached`, called on the event
+        loop, and the append hook never wait for it; the result is published under `_lock`.
+        """
+        with self._lock:
+            if self._reference is not None:
+                return self._reference, self._profile
+        with self._reference_lock:
+            with self._lock:
+                if self._reference is not None:
+                    return self._reference, self._profile
+            reference = self.load_reference()
+            profile = ReferenceProfile(reference, self.data_columns)
+            with self._lock:
+                self._reference, self._profile = reference, profile
+                return reference, profile
+
+    def window(self, window_size: int) -> CurrentWindow:
+        _, profile = self.reference()
+        with self._lock:
+            window = self._windows.get(window_size)
+            if window is not None:
+                self._windows.move_to_end(window_size)
+                return window
+            window = CurrentWindow(window_size, profile)
+            # Subscribed before the fill: rows appended during it are merged by `reset`
+            self._windows[window_size] = window
+            while len(self._windows) > MONITOR_MAX_WINDOWS:
+                self._windows.popitem(last=False)
+        window.reset(self.store.last(window_size))
+        return window
+
+    def _on_append(self, frame: pd.DataFrame) -> None:
+        with self._lock:
+            windows = list(self._windows.values())
+        for window in windows:
+            window.append(frame)
+
+    def cached(self, kind: Text, window_size: int) -> Optional[Text]:
+        """Rendered report for the current window, or None (cheap, no I/O)."""
+        with self._lock:
+            window = self._windows.get(window_size)
+            if window is None:
+                return None
+            key = (kind, window_size, window.last_id)
+            entry = self._reports.get(key)
+            if entry is None and REPORT_MAX_AGE_S > 0:
+                entry = self._recent(kind, window_size)
+            if entry is None:
+                return None
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def _recent(self, kind: Text, window_size: int) -> Optional[Tuple[float, Text]]:
+        for (cached_kind, cached_size, _), entry in reversed(self._reports.items()):
+            if (cached_kind, cached_size) == (kind, window_size):
+                return entry if time.time() - entry[0] < REPORT_MAX_AGE_S else None
+        return None
+
+    def get_or_build(self, kind: Text, window_size: int, build: Callable[..., Text]) -> Text:
+        """Rendered report, built with `build(reference_data, current_data)` on a miss."""
+        window = self.window(window_size)
+        html = self.cached(kind, window_size)
+        if html is not None:
+            return html
+
+        reference_data, _ = self.reference()
+        last_id, current_data = window.data()
+        html = build(reference_data, current_data)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._reports[(kind, window_size, last_id)] = (time.time(), html)
+            while len(self._reports) > REPORT_CACHE_SIZE:
+                self._reports.popitem(last=False)
+        return html
+
+    def summary(self, window_size: int) -> Dict[Text, Any]:
+        """Reference and current-window statistics per column, without building a report."""
+        window = self.window(window_size)
+        _, profile = self.reference()
+        last_id, n_rows, counts = window.snapshot()
+        columns = {}
+        for name, column in profile.columns.items():
+            columns[name] = {
+                "kind": column.kind,
+                "bins": column.labels,
+                "reference": (column.counts / max(profile.n_rows, 1)).round(6).tolist(),
+                "current": (counts[name] / max(n_rows, 1)).round(6).tolist(),
+                "reference_summary": column.summary,
+            }
+        return {
+            "window_size": window_size,
+            "rows": n_rows,
+            "last_prediction_id": last_id,
+            "reference_rows": profile.n_rows,
+            "columns": columns,
+        }
@@ -0,0 +1,319 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Text
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Root of the time-partitioned Parquet log: <dir>/date=YYYY-MM-DD/hour=HH/part-<id>.parquet
+PREDICTIONS_DIR: Text = os.getenv("PREDICTIONS_DIR", "data/predictions")
+# A flush happens when this many rows are buffered or the oldest row is this old
+PREDICTIONS_FLUSH_ROWS: int = int(os.getenv("PREDICTIONS_FLUSH_ROWS", 1000))
+PREDICTIONS_FLUSH_INTERVAL_S: float = float(os.getenv("PREDICTIONS_FLUSH_INTERVAL_S", 1.0))
+# Upper bound of rows held in memory while the disk is slow; the oldest are dropped
+PREDICTIONS_MAX_BUFFER_ROWS: int = int(os.getenv("PREDICTIONS_MAX_BUFFER_ROWS", 100_000))
+# A failed write is retried after this delay, doubled on each consecutive failure
+PREDICTIONS_RETRY_BACKOFF_S: float = float(os.getenv("PREDICTIONS_RETRY_BACKOFF_S", 0.5))
+PREDICTIONS_MAX_RETRY_BACKOFF_S: float = float(os.getenv("PREDICTIONS_MAX_RETRY_BACKOFF_S", 30))
+
+PREDICTION_ID = "prediction_id"
+# Each store instance (e.g. each uvicorn worker) claims a writer number under
+# <dir>/_writers/ and numbers its rows from `writer << WRITER_ID_BITS`, so ids and part
+# names never collide across processes sharing the directory
+WRITERS_DIR = "_writers"
+WRITER_ID_BITS = 32
+
+
+@dataclass(frozen=True)
+class _Part:
+    path: Path
+    first_id: int
+    n_rows: int
+
+    @property
+    def last_id(self) -> int:
+        return self.first_id + self.n_rows - 1
+
+
+class PredictionStore:
+    """Append-only prediction log.
+
+    `append` only stamps the rows with a monotonically increasing `prediction_id` and
+    queues them, so it never waits on the disk. A flusher thread writes the queue in
+    batches to hourly Parquet partitions; the file name carries the first id of the
+    part, which makes the in-memory index (first id and row count of each part, read
+    from the Parquet footers at startup) enough to serve "last N rows" by opening only
+    the newest parts.
+
+    Several processes may log to the same directory: each one numbers its rows in the
+    range of the writer number it claims on its first append (`claim_writer`), so ids
+    are unique and contiguous per process and the parts of different processes never
+    overwrite each other. A restarted process claims a new, higher writer number.
+    """
+
+    def __init__(
+        self,
+        root: Text = PREDICTIONS_DIR,
+        flush_rows: int = PREDICTIONS_FLUSH_ROWS,
+        flush_interval: float = PREDICTIONS_FLUSH_INTERVAL_S,
+        max_buffer_rows: int = PREDICTIONS_MAX_BUFFER_ROWS,
+    ) -> None:
+        self.root = Path(root)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffer_rows = max_buffer_rows
+        self.retry_backoff = PREDICTIONS_RETRY_BACKOFF_S
+        self.max_retry_backoff = PREDICTIONS_MAX_RETRY_BACKOFF_S
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._buffer: Deque[pd.DataFrame] = deque()
+        self._buffered_rows = 0
+        self._oldest_at: Optional[float] = None
+        # Frames taken from the buffer and being written; still visible to readers
+        self._flushing: List[pd.DataFrame] = []
+        self._parts: List[_Part] = self._scan()
+        # Claimed on the first append, so importing the module does not touch the disk
+        self.writer: Optional[int] = None
+        self._next_id = self._parts[-1].last_id + 1 if self._parts else 0
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._listeners: List[Callable[[pd.DataFrame], None]] = []
+        # Listeners get the frames in id order: each append waits for the previous ids
+        self._delivery = threading.Condition()
+        self._delivered_id = self.last_id
+        self.stats: Dict[Text, int] = {"appended_rows": 0, "flushed_rows": 0, "dropped_rows": 0}
+
+    def _scan(self) -> List[_Part]:
+        """Index the existing parts from their names and Parquet footers."""
+        parts = []
+        for path in self.root.glob("date=*/hour=*/part-*.parquet"):
+            try:
+                first_id = int(path.stem.split("-", 1)[1])
+                parts.append(_Part(path, first_id, pq.read_metadata(path).num_rows))
+            except Exception as e:
+                logging.warning(f"Skipping unreadable predictions part {path}: {e}")
+        return sorted(parts, key=lambda part: part.first_id)
+
+    def claim_writer(self) -> int:
+        """Reserve a writer number no other process has used for this directory.
+
+        The claim is an exclusively created marker file, so concurrent workers starting
+        together get different numbers; it starts above the writers of the existing parts.
+        """
+        writers_dir = self.root / WRITERS_DIR
+        writers_dir.mkdir(parents=True, exist_ok=True)
+        writer = (self._parts[-1].last_id >> WRITER_ID_BITS) + 1 if self._parts else 0
+        while True:
+            try:
+                os.close(os.open(writers_dir / str(writer), os.O_CREAT | os.O_EXCL))
+                return writer
+            except FileExistsError:
+                writer += 1
+
+    @property
+    def last_id(self) -> int:
+        """Id of the most recently appended row (-1 if the log is empty)."""
+        return self._next_id - 1
+
+    def subscribe(self, listener: Callable[[pd.DataFrame], None]) -> None:
+        """Call `listener` with every appended frame (with its ids); it must not modify it.
+
+        Frames are delivered one at a time and in `prediction_id` order, even when
+        several threads append concurrently, so listeners can skip rows they already
+        have by comparing ids with the last one they saw.
+        """
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closing = False
+        self._thread = threading.Thread(
+            target=self._flush_loop, name="predictions-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the flusher after writing everything still buffered."""
+        with self._lock:
+            self._closing = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            return
+        # Never started: write what was appended synchronously
+        with self._lock:
+            self._flushing = list(self._buffer)
+            self._buffer.clear()
+            self._buffered_rows = 0
+            self._oldest_at = None
+        part = self._write(self._flushing)
+        with self._lock:
+            self._publish(part)
+
+    def append(self, features: pd.DataFrame) -> None:
+        """Queue scored rows for writing; never blocks on I/O."""
+        if features.empty:
+            return
+        frame = features.reset_index(drop=True)
+        with self._lock:
+            if self.writer is None:
+                self.writer = self.claim_writer()
+                self._next_id = self.writer << WRITER_ID_BITS
+                # No id was handed out yet, so no delivery can be in progress
+                self._delivered_id = self._next_id - 1
+            first_id = self._next_id
+            frame.insert(0, PREDICTION_ID, range(self._next_id, self._next_id + len(frame)))
+            self._next_id += len(frame)
+            self._buffer.append(frame)
+            self._buffered_rows += len(frame)
+            self.stats["appended_rows"] += len(frame)
+            if self._oldest_at is None:
+                # Let the idle flusher arm its timer for this batch
+                self._oldest_at = time.monotonic()
+                self._wakeup.notify()
+            self._trim_buffer()
+            if self._buffered_rows >= self.flush_rows:
+                self._wakeup.notify()
+        with self._delivery:
+            self._delivery.wait_for(lambda: self._delivered_id == first_id - 1)
+            try:
+                for listener in self._listeners:
+                    try:
+                        listener(frame)
+                    except Exception as e:
+                        logging.error(f"Prediction listener failed: {e}", exc_info=True)
+            finally:
+                self._delivered_id = first_id + len(frame) - 1
+                self._delivery.notify_all()
+
+    def _trim_buffer(self) -> None:
+        """Drop the oldest frames beyond `max_buffer_rows`; call with the lock held."""
+        while self._buffered_rows > self.max_buffer_rows and len(self._buffer) > 1:
+            dropped = self._buffer.popleft()
+            self._buffered_rows -= len(dropped)
+            self.stats["dropped_rows"] += len(dropped)
+
+    def _flush_loop(self) -> None:
+        delay = 0.0
+        while True:
+            with self._lock:
+                while not self._closing and not self._flush_due():
+                    timeout = None
+                    if self._oldest_at is not None:
+                        timeout = self._oldest_at + self.flush_interval - time.monotonic()
+                    self._wakeup.wait(timeout)
+                if not self._buffer and self._closing:
+                    return
+                self._flushing = list(self._buffer)
+                self._buffer.clear()
+                self._buffered_rows = 0
+                self._oldest_at = None
+            try:
+                part = self._write(self._flushing)
+            except Exception as e:
+                logging.error(f"Failed to write predictions: {e}", exc_info=True)
+                with self._lock:
+                    failed, self._flushing = self._flushing, []
+                    if self._closing:
+                        # Nobody waits for a retry once closing; give up on the rows
+                        lost = failed + list(self._buffer)
+                        self.stats["dropped_rows"] += sum(len(frame) for frame in lost)
+                        self._buffer.clear()
+                        self._buffered_rows = 0
+                        return
+                    # Back to the front of the buffer, in id order, still bounded in size
+                    self._buffer.extendleft(reversed(failed))
+                    self._buffered_rows += sum(len(frame) for frame in failed)
+                    self._trim_buffer()
+                    # Already due: written again as soon as the backoff ends
+                    self._oldest_at = time.monotonic() - self.flush_interval
+                    delay = min(max(2 * delay, self.retry_backoff), self.max_retry_backoff)
+                    self._wakeup.wait_for(lambda: self._closing, delay)
+                continue
+            delay = 0.0
+            with self._lock:
+                self._publish(part)
+
+    def _flush_due(self) -> bool:
+        if self._buffered_rows >= self.flush_rows:
+            return True
+        return (
+            self._oldest_at is not None
+            and time.monotonic() - self._oldest_at >= self.flush_interval
+        )
+
+    def _write(self, frames: List[pd.DataFrame]) -> Optional[_Part]:
+        """Write the frames to a new part; it is published by `_publish`."""
+        if not frames:
+            return None
+        data = pd.concat(frames, ignore_index=True)
+        now = datetime.now(timezone.utc)
+        partition = self.root / f"date={now:%Y-%m-%d}" / f"hour={now:%H}"
+        partition.mkdir(parents=True, exist_ok=True)
+        first_id = int(data[PREDICTION_ID].iloc[0])
+        path = partition / f"part-{first_id:015d}.parquet"
+        tmp_path = partition / f".{path.name}.tmp"
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return _Part(path, first_id, len(data))
+
+    def _publish(self, part: Optional[_Part]) -> None:
+        """Move the written rows from `_flushing` to the index; call with the lock held.
+
+        Both happen in the same critical section, so `last` sees each row exactly once.
+        """
+        if part is not None:
+            self._parts.append(part)
+            self.stats["flushed_rows"] += part.n_rows
+        self._flushing = []
+
+    def last(self, n_rows: int) -> pd.DataFrame:
+        """The `n_rows` most recent predictions, oldest first, including unflushed rows."""
+        with self._lock:
+            in_memory = self._flushing + list(self._buffer)
+            parts = list(self._parts)
+
+        frames: List[pd.DataFrame] = []
+        remaining = n_rows - sum(len(frame) for frame in in_memory)
+        # Walk the index from the newest part and only open what the window needs
+        for part in reversed(parts):
+            if remaining <= 0:
+                break
+            frames.append(pd.read_parquet(part.path))
+            remaining -= part.n_rows
+        frames.reverse()
+        frames.extend(in_memory)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).tail(n_rows).reset_index(drop=True)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "buffered_rows": self._buffered_rows,
+                "parts": len(self._parts),
+                "last_id": self.last_id,
+            }
+
+
+prediction_store: PredictionStore = PredictionStore()
+
+
+def save_predictions(features: pd.DataFrame) -> None:
+    """Append scored features to the prediction log."""
+    prediction_store.append(features)
+
+
+def load_current_data(window_size: int) -> pd.DataFrame:
+    """Last `window_size` logged predictions, without the log's own id column."""
+    current_data = prediction_store.last(window_size)
+    return current_data.drop(columns=PREDICTION_ID, errors="ignore")
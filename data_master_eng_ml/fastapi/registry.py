@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Text, Tuple
+
+import joblib
+import mlflow
+import mlflow.sklearn
+from mlflow import MlflowClient
+
+# Local file-based tracking store shared with the training code (`mlruns/`)
+MLFLOW_TRACKING_URI: Text = os.getenv("MLFLOW_TRACKING_URI", "file:mlruns")
+# Where resolved registry versions are unpacked to plain joblib files
+MODEL_CACHE_DIR: Text = os.getenv("MODEL_CACHE_DIR", "models/registry")
+
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.joblib"
+# Per-model directory of alias/stage -> version pointers, for the offline fallback
+REFS_DIR = "refs"
+
+_MODEL_URI = re.compile(r"^models:/(?P<name>[^/@]+)(?:@(?P<alias>[^/]+)|/(?P<ref>[^/]+))$")
+
+
+def parse_model_uri(model_uri: Text) -> Tuple[Text, Optional[Text], Optional[Text]]:
+    """Split `models:/<name>@<alias>` or `models:/<name>/<stage|version>`.
+
+    Returns:
+        Tuple: model name, alias (or None) and stage/version (or None).
+    """
+    match = _MODEL_URI.match(model_uri)
+    if match is None:
+        raise ValueError(
+            f"Invalid model URI '{model_uri}', expected models:/<name>@<alias> "
+            "or models:/<name>/<stage|version>"
+        )
+    return match["name"], match["alias"], match["ref"]
+
+
+def resolve_model_version(model_uri: Text, client: Optional[MlflowClient] = None) -> Any:
+    """Resolve a registry alias, stage or version number to a `ModelVersion`."""
+    client = client or MlflowClient(tracking_uri=MLFLOW_TRACKING_URI)
+    name, alias, ref = parse_model_uri(model_uri)
+    if alias is not None:
+        return client.get_model_version_by_alias(name, alias)
+    if ref.isdigit():
+        return client.get_model_version(name, ref)
+    versions = client.get_latest_versions(name, stages=[ref])
+    if not versions:
+        raise LookupError(f"No version of '{name}' in stage '{ref}'")
+    return versions[0]
+
+
+def file_sha256(path: Path, chunk_size: int = 1024**2) -> Text:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(version_dir: Path) -> Optional[Dict[Text, Any]]:
+    """Manifest of a cached version, or None if it is missing or fails the checksum."""
+    manifest_path = version_dir / MANIFEST_FILE
+    model_path = version_dir / MODEL_FILE
+    if not manifest_path.exists() or not model_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    if file_sha256(model_path) != manifest.get("sha256"):
+        logging.warning(f"Checksum mismatch for cached model {model_path}, discarding it")
+        return None
+    return manifest
+
+
+def unpack_model_version(model_version: Any, version_dir: Path) -> Dict[Text, Any]:
+    """Load the native model of a registry version and store it as a plain joblib file.
+
+    The pyfunc wrapper is not kept: serving calls the logged estimator directly, i.e.
+    the `Pipeline(preprocessor, model)` of `train_model`, which takes raw features.
+    The file is written uncompressed so it can be memory-mapped by `ModelLoader`.
+    """
+    model_uri = f"models:/{model_version.name}/{model_version.version}"
+    logging.info(f"Downloading {model_uri} from {MLFLOW_TRACKING_URI}")
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    model = mlflow.sklearn.load_model(model_uri)
+
+    version_dir.mkdir(parents=True, exist_ok=True)
+    model_path = version_dir / MODEL_FILE
+    tmp_path = version_dir / f"{MODEL_FILE}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, model_path)
+
+    manifest = {
+        "name": model_version.name,
+        "version": str(model_version.version),
+        "run_id": model_version.run_id,
+        "source": model_version.source,
+        "sha256": file_sha256(model_path),
+        "cached_at": time.time(),
+    }
+    (version_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def ref_pointer_path(model_uri: Text, cache_dir: Path) -> Optional[Path]:
+    """File recording the version an alias or stage last resolved to (None for versions)."""
+    name, alias, ref = parse_model_uri(model_uri)
+    if alias is not None:
+        return cache_dir / name / REFS_DIR / f"alias-{alias}.json"
+    if ref.isdigit():
+        return None
+    return cache_dir / name / REFS_DIR / f"stage-{ref}.json"
+
+
+def write_ref_pointer(model_uri: Text, cache_dir: Path, version: Text) -> None:
+    pointer_path = ref_pointer_path(model_uri, cache_dir)
+    if pointer_path is None:
+        return
+    pointer_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = pointer_path.with_name(f"{pointer_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"version": version, "resolved_at": time.time()}))
+    os.replace(tmp_path, pointer_path)
+
+
+def cached_version(model_uri: Text, cache_dir: Path) -> Optional[Path]:
+    """Valid cached version for a URI, used when the registry is unreachable.
+
+    An alias or stage falls back to the version it last resolved to; an explicit
+    version number only to that same version, never to another one.
+    """
+    name, _, ref = parse_model_uri(model_uri)
+    pointer_path = ref_pointer_path(model_uri, cache_dir)
+    if pointer_path is None:
+        version = ref
+    elif pointer_path.exists():
+        version = json.loads(pointer_path.read_text())["version"]
+    else:
+        return None
+    version_dir = cache_dir / name / version
+    return version_dir if read_manifest(version_dir) is not None else None
+
+
+def fetch_model(model_uri: Text, cache_dir: Text = MODEL_CACHE_DIR) -> Text:
+    """Path of a local, checksum-verified joblib file for a registry model URI.
+
+    The URI is resolved against the registry on every call (a metadata lookup), but
+    the artifact is only downloaded and unpacked when that version is not cached yet,
+    so restarts and reloads of an unchanged alias do not touch the artifact store.
+    """
+    cache_dir = Path(cache_dir)
+    name, _, _ = parse_model_uri(model_uri)
+    try:
+        model_version = resolve_model_version(model_uri)
+    except Exception as e:
+        fallback = cached_version(model_uri, cache_dir)
+        if fallback is None:
+            raise
+        logging.warning(f"Could not resolve {model_uri} ({e}), using cached {fallback}")
+        return str(fallback / MODEL_FILE)
+
+    version_dir = cache_dir / name / str(model_version.version)
+    manifest = read_manifest(version_dir)
+    if manifest is None:
+        manifest = unpack_model_version(model_version, version_dir)
+    write_ref_pointer(model_uri, cache_dir, manifest["version"])
+    logging.info(f"{model_uri} -> version {manifest['version']} (run {manifest['run_id']})")
+    return str(version_dir / MODEL_FILE)
@@ -1,10 +1,49 @@
-from typing import Callable, Optional, Text
+import logging
+import os
+from pathlib import Path
+import re
+import threading
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Sequence, Text
 
 import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from data_master_eng_ml.modeling.compiled_trees import compile_model
+from data_master_eng_ml.modeling.preprocessor import FrozenPreprocessor, check_frozen_preprocessor
+
+# Model artifact and load options, overridable by environment variables
+MODEL_PATH: Text = os.getenv("MODEL_PATH", "models/model.joblib")
+# Registry model to serve instead of MODEL_PATH, e.g. models:/Best_Model@champion
+MODEL_URI: Optional[Text] = os.getenv("MODEL_URI") or None
+# Directory of the model files `/model/reload` may switch to (by file name only)
+MODELS_DIR: Text = os.getenv("MODELS_DIR", os.path.dirname(MODEL_PATH) or ".")
+# Memory-map the arrays of uncompressed joblib files so uvicorn workers share their pages
+MODEL_MMAP_MODE: Optional[Text] = os.getenv("MODEL_MMAP_MODE", "r") or None
+WARMUP_ROWS: int = int(os.getenv("MODEL_WARMUP_ROWS", 8))
+# Serve tree ensembles with the pure-NumPy evaluator of `compiled_trees` (inside the
+# Pipeline, after its preprocessing); only used if the scores match at load time
+MODEL_COMPILED: bool = os.getenv("MODEL_COMPILED", "0") == "1"
+MODEL_COMPILED_ATOL: float = float(os.getenv("MODEL_COMPILED_ATOL", 1e-5))
+# Replace the fitted ColumnTransformer of (preprocessor, model) Pipelines with a
+# `FrozenPreprocessor`, also only if its output and scores match at load time
+MODEL_FROZEN_PREPROCESSOR: bool = os.getenv("MODEL_FROZEN_PREPROCESSOR", "1") == "1"
+
+# Registry versions/aliases and model file names: no path separators or URI syntax
+_VERSION = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
 
 
 class ModelLoader:
-    """Model loader singleton."""
+    """Model loader singleton.
+
+    The model is loaded and warmed up (a dummy batch is predicted) before being
+    published, and a new version can be loaded in the background and swapped in
+    atomically: requests in flight keep the reference they already got. When
+    `MODEL_URI` is set, the model comes from the MLflow registry (see `registry.py`).
+    """
 
     _instance: Optional[object] = None
 
@@ -14,15 +53,278 @@ class ModelLoader:
         return cls._instance
 
     def __init__(self) -> None:
-        self.model_path: Text = 'models/model.joblib'
+        if hasattr(self, "model"):
+            return
+        self.model_path: Text = MODEL_PATH
+        self.model_uri: Optional[Text] = MODEL_URI
         self.model: Optional[Callable] = None
+        self.info: Dict[Text, Any] = {}
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
 
     def get_model(self) -> Callable:
 
         if not self.model:
-            self._load_model()
+            self.load()
 
         return self.model
 
-    def _load_model(self) -> None:
-        self.model = joblib.load(self.model_path)
+    def resolve_model_path(self, source: Optional[Text] = None) -> Text:
+        """Local path of the model to load, resolving registry URIs in the registry.
+
+        Args:
+            source: Output of `version_source`; None loads `model_uri` or `model_path`.
+        """
+        source = source or self.model_uri
+        if source and source.startswith("models:/"):
+            from registry import fetch_model
+
+            return fetch_model(source)
+        return source or self.model_path
+
+    def version_source(self, version: Text) -> Text:
+        """Validate a client-chosen version and map it to a registry URI or a local file.
+
+        With `model_uri` set, `version` is a version number or an alias of that registry
+        model; otherwise it is the name of a file in `MODELS_DIR`. Paths, URIs and
+        unknown files are rejected, so clients cannot make the server unpickle an
+        arbitrary file.
+
+        Raises:
+            ValueError: If `version` is not a plain name or the file does not exist.
+        """
+        if not _VERSION.match(version):
+            raise ValueError(f"Invalid model version '{version}'")
+        if self.model_uri:
+            from registry import parse_model_uri
+
+            name, _, _ = parse_model_uri(self.model_uri)
+            separator = "/" if version.isdigit() else "@"
+            return f"models:/{name}{separator}{version}"
+        path = Path(MODELS_DIR) / version
+        if not path.is_file():
+            raise ValueError(f"No model file '{version}' in {MODELS_DIR}")
+        return str(path)
+
+    def load(self, model_path: Optional[Text] = None) -> Callable:
+        """Load, warm up and publish a model; concurrent loads are serialized."""
+        with self._load_lock:
+            if model_path is None and self.model is not None:
+                return self.model
+            model_path = model_path or self.resolve_model_path()
+            start = time.perf_counter()
+            if str(model_path).endswith(".npz"):
+                # `log_compiled_model` artifacts score preprocessed, one-hot encoded
+                # matrices, not the raw features the API receives
+                raise ValueError(
+                    f"{model_path} is a compiled ensemble without its preprocessing; "
+                    "serve the Pipeline with MODEL_COMPILED=1 instead"
+                )
+            model = joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE)
+            if MODEL_COMPILED:
+                model = compile_for_serving(model)
+            if MODEL_FROZEN_PREPROCESSOR:
+                model = freeze_preprocessor(model)
+            loaded = time.perf_counter()
+            warm_up(model)
+            # Single reference assignment: readers see either the old or the new model
+            self.model, self.model_path = model, model_path
+            self.info = {
+                "model_uri": self.model_uri,
+                "model_path": model_path,
+                "loaded_at": time.time(),
+                "load_seconds": round(loaded - start, 3),
+                "warmup_seconds": round(time.perf_counter() - loaded, 3),
+            }
+            logging.info(f"Model ready: {self.info}")
+            return model
+
+    def reload_in_background(self, version: Optional[Text] = None) -> bool:
+        """Load `version` (default: the configured model, resolved again) in a thread
+        and swap it in.
+
+        Returns:
+            bool: False if a reload is already running.
+
+        Raises:
+            ValueError: If `version` is rejected by `version_source`.
+        """
+        source = self.version_source(version) if version is not None else None
+
+        def reload() -> None:
+            try:
+                self.load(self.resolve_model_path(source))
+            except Exception as e:
+                logging.error(f"Model reload failed, keeping current model: {e}", exc_info=True)
+
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(target=reload, name="model-reload", daemon=True)
+            self._reload_thread.start()
+        return True
+
+
+def compile_for_serving(
+    model: Callable, n_rows: int = 256, atol: float = MODEL_COMPILED_ATOL
+) -> Callable:
+    """Swap the tree ensemble of `model` for its `CompiledEnsemble` if the scores match.
+
+    For Pipelines only the final estimator is compiled and the preprocessing is kept.
+    The check scores a random batch (with zeros and missing values, dense and sparse)
+    with `predict_scores` of both, i.e. against `inplace_predict` for XGBoost boosters;
+    if the ensemble is not supported or differs by more than `atol`, the original
+    model is served.
+    """
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    try:
+        compiled = compile_model(estimator)
+        n_features = getattr(estimator, "n_features_in_", None) or estimator.num_features()
+        rng = np.random.default_rng(0)
+        batch = rng.standard_normal((n_rows, n_features)) * 10.0 ** rng.integers(
+            0, 4, (n_rows, n_features)
+        )
+        batch[rng.random(batch.shape) < 0.2] = 0.0
+        batch[rng.random(batch.shape) < 0.1] = np.nan
+        batch = batch.astype(np.float32)
+        difference = max(
+            float(np.max(np.abs(predict_scores(compiled, X) - predict_scores(estimator, X))))
+            for X in (batch, sparse.csr_matrix(np.nan_to_num(batch)))
+        )
+    except Exception as e:
+        logging.warning(f"Model not compiled, serving it as is: {e}")
+        return model
+    if difference > atol:
+        logging.warning(
+            f"Compiled model differs by {difference:.2e} (> {atol:g}), serving it as is"
+        )
+        return model
+    logging.info(f"Serving compiled model ({compiled.n_trees} trees, max diff {difference:.1e})")
+    if hasattr(model, "steps"):
+        from sklearn.pipeline import Pipeline
+
+        return Pipeline([*model.steps[:-1], (model.steps[-1][0], compiled)])
+    return compiled
+
+
+class FrozenPipeline:
+    """(preprocessor, model) Pipeline whose ColumnTransformer is a `FrozenPreprocessor`.
+
+    Exposes the classifier interface of the Pipeline that the API and the deploy-side
+    `get_predictions` rely on: `steps`, `feature_names_in_`, `classes_`, `predict` and
+    `predict_proba`.
+    """
+
+    def __init__(self, preprocessor: FrozenPreprocessor, name: Text, estimator: Any) -> None:
+        self.preprocessor = preprocessor
+        self.estimator = estimator
+        self.steps = [("preprocessor", preprocessor), (name, estimator)]
+        self.feature_names_in_ = preprocessor.feature_names_in_
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.estimator.classes_
+
+    def predict(self, X: Any) -> np.ndarray:
+        return self.estimator.predict(self.preprocessor.transform(X))
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        return self.estimator.predict_proba(self.preprocessor.transform(X))
+
+
+def freeze_preprocessor(model: Callable, atol: float = 1e-6) -> Callable:
+    """Serve a (preprocessor, model) Pipeline through a `FrozenPreprocessor`.
+
+    The frozen preprocessing must reproduce the ColumnTransformer's matrix on a
+    synthetic sample (`parity_sample`: known and unknown categories, NaN and None) and
+    the scores of both Pipelines must match within `atol`; otherwise, or for any other
+    model, `model` is served as is.
+    """
+    if not hasattr(model, "steps") or len(model.steps) != 2:
+        return model
+    (_, transformer), (name, estimator) = model.steps
+    try:
+        frozen = FrozenPreprocessor(transformer)
+        sample = frozen.parity_sample()
+        check_frozen_preprocessor(transformer, sample, frozen)
+        candidate = FrozenPipeline(frozen, name, estimator)
+        difference = float(
+            np.max(np.abs(predict_scores(candidate, sample) - predict_scores(model, sample)))
+        )
+    except Exception as e:
+        logging.warning(f"Preprocessor not frozen, serving the Pipeline as is: {e}")
+        return model
+    if difference > atol:
+        logging.warning(
+            f"Frozen preprocessor changes the scores by {difference:.2e} (> {atol:g}), "
+            "serving the Pipeline as is"
+        )
+        return model
+    logging.info(f"Serving frozen preprocessor (max diff {difference:.1e})")
+    return candidate
+
+
+def warm_up(model: Callable, n_rows: int = WARMUP_ROWS) -> None:
+    """Predict a dummy batch so lazy initialization happens before the first request."""
+    feature_names = get_feature_names(model)
+    if not feature_names:
+        logging.warning("Model does not expose feature names, skipping warm-up")
+        return
+    columns = {name: [0.0] * n_rows for name in feature_names}
+    try:
+        predict_scores(model, to_model_input(columns, feature_names, n_rows, model))
+    except Exception as e:
+        logging.warning(f"Model warm-up failed: {e}")
+
+
+def get_feature_names(model: Callable) -> Optional[List[Text]]:
+    """Feature names in the order the model expects, if the model exposes them."""
+    for attribute in ("feature_names_in_", "feature_names", "feature_name_"):
+        names = getattr(model, attribute, None)
+        if names is not None:
+            return list(names)
+    return None
+
+
+def to_model_input(
+    columns: Dict[Text, List[Any]], feature_names: Sequence[Text], n_rows: int, model: Callable
+) -> Any:
+    """Build the model input straight from column-oriented arrays.
+
+    Numeric models get a C-contiguous float32 matrix filled column by column in the
+    model's feature order (None becomes NaN). Pipelines that still hold their own
+    preprocessing (e.g. one-hot encoding of string columns) get a DataFrame with the
+    same column order instead.
+    """
+    missing = [name for name in feature_names if name not in columns]
+    if missing:
+        raise KeyError(f"Missing feature columns: {missing}")
+    wrong_length = [name for name in feature_names if len(columns[name]) != n_rows]
+    if wrong_length:
+        raise ValueError(f"Columns with length different from ids ({n_rows}): {wrong_length}")
+
+    if hasattr(model, "steps"):
+        return pd.DataFrame({name: columns[name] for name in feature_names})
+
+    matrix = np.empty((n_rows, len(feature_names)), dtype=np.float32)
+    for index, name in enumerate(feature_names):
+        matrix[:, index] = np.asarray(columns[name], dtype=np.float32)
+    return matrix
+
+
+def predict_scores(model: Callable, model_input: Any) -> np.ndarray:
+    """Positive-class probabilities for a whole batch in a single model call."""
+    if hasattr(model, "inplace_predict"):
+        return np.asarray(model.inplace_predict(model_input))
+    with warnings.catch_warnings():
+        # The float32 matrix is already in `feature_names_in_` order; scikit-learn would
+        # warn on every request that it has no column names
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        if hasattr(model, "predict_proba"):
+            return model.predict_proba(model_input)[:, 1]
+        return np.asarray(model.predict(model_input))
@@ -1,28 +1,276 @@
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 import typer
 from loguru import logger
-from tqdm import tqdm
 
-from data_master_eng_ml.config import PROCESSED_DATA_DIR
+from data_master_eng_ml.config import INTERIM_DATA_DIR, PROCESSED_DATA_DIR
+from data_master_eng_ml.utils import mappings
+from data_master_eng_ml.utils.age_ratings import NO_RATING
+from data_master_eng_ml.utils.lookups import (
+    PLATFORM_GROUPS,
+    UNKNOWN_PLATFORM,
+    continent_names,
+    platform_group_codes,
+)
 
 app = typer.Typer()
 
+# Valores atribuídos a listas ausentes ou IDs sem mapeamento
+UNKNOWN_GENRE = "unknown_genres_name"
+UNKNOWN_GAME_MODE = "unknown_game_mode"
+UNKNOWN_PLAYER_PERSPECTIVE = "unknown_player_perspectives"
+
+# Colunas multi-hot, na mesma ordem dos arquivos `data/raw/twitch_api_data_*.csv`
+PLATFORM_COLUMNS = [
+    "classic_console",
+    "less_common_portable_console",
+    "mobile",
+    "modern_console",
+    "others",
+    "pc",
+    "portable_console",
+    UNKNOWN_PLATFORM,
+    "vr",
+]
+GAME_MODE_COLUMNS = [
+    "battle_royale",
+    "co_operative",
+    "massively_multiplayer_online_mmo",
+    "multiplayer",
+    "single_player",
+    "split_screen",
+    UNKNOWN_GAME_MODE,
+]
+PLAYER_PERSPECTIVE_COLUMNS = [
+    "auditory",
+    "bird_view_slash_isometric",
+    "first_person",
+    "side_view",
+    "text",
+    "third_person",
+    UNKNOWN_PLAYER_PERSPECTIVE,
+    "virtual_reality",
+]
+
+FEATURE_COLUMNS = [
+    "id",
+    "name",
+    "genres_first",
+    "has_remaster",
+    "target",
+    "age_classif",
+    "games_developed",
+    "has_parents",
+    "games_published",
+    "continent_name",
+    "onlinecoop",
+    "onlinecoopmax",
+    "onlinemax",
+    "splitscreen",
+    *PLATFORM_COLUMNS,
+    *GAME_MODE_COLUMNS,
+    *PLAYER_PERSPECTIVE_COLUMNS,
+    "has_global_launch",
+]
+
+# Colunas de `FEATURE_COLUMNS` que não entram no modelo: identificação e o target
+# (derivado de `rating`, desconhecido na predição)
+NON_FEATURE_COLUMNS = ["id", "name", "target"]
+
+
+def country_to_continent(country_code) -> str:
+    """
+    Converte o código numérico ISO 3166 de um país no nome do continente.
+
+    Args:
+        country_code: Código numérico do país (ex.: 76 para o Brasil).
+
+    Returns:
+        str: Nome do continente, ou `Unknown` se o código não for reconhecido.
+    """
+    return continent_names([country_code])[0]
+
+
+def countries_to_continents(country_codes: pd.Series) -> pd.Series:
+    """Converte uma coluna de códigos de países em continentes com uma única consulta."""
+    codes = country_codes.astype("float64").to_numpy()
+    return pd.Series(continent_names(codes), index=country_codes.index)
+
+
+def explode_mapped(lists: pd.Series, mapping: Optional[Dict[int, str]], unknown: str) -> pd.Series:
+    """
+    Explode uma coluna de listas de IDs e converte cada ID em nome.
+
+    Listas ausentes ou vazias e IDs sem mapeamento viram `unknown`. O índice do
+    resultado é a posição (0..n-1) da linha original.
+
+    Args:
+        lists (pd.Series): Coluna de listas de IDs.
+        mapping (Optional[Dict[int, str]]): Mapeamento de ID para nome; None mantém os IDs.
+        unknown (str): Valor para listas ausentes e IDs desconhecidos.
+
+    Returns:
+        pd.Series: Um nome por elemento das listas.
+    """
+    exploded = lists.reset_index(drop=True).explode()
+    if mapping is not None:
+        exploded = exploded.map(mapping)
+    return exploded.fillna(unknown)
+
+
+def list_lengths(lists: pd.Series) -> pd.Series:
+    """
+    Tamanho de cada lista de uma coluna (NaN para listas ausentes).
+
+    Funciona com qualquer dtype: uma coluna sem nenhuma lista (ex.: lida de JSON) vira
+    float64 e não aceita o acessor `.str`.
+    """
+    return lists.map(len, na_action="ignore").astype("float64")
+
+
+def multi_hot(codes: np.ndarray, rows: np.ndarray, columns: List[str], n_rows: int, sparse=False):
+    """
+    Codifica códigos de categoria (um por elemento das listas) em colunas 0/1.
+
+    Os indicadores são preenchidos de uma vez em uma matriz NumPy; códigos negativos
+    (categorias fora de `columns`) são ignorados.
+
+    Args:
+        codes (np.ndarray): Índice em `columns` de cada elemento.
+        rows (np.ndarray): Posição da linha original de cada elemento.
+        columns (List[str]): Colunas de saída, na ordem desejada.
+        n_rows (int): Número de linhas do DataFrame original.
+        sparse (bool): Se True, retorna colunas esparsas.
+
+    Returns:
+        pd.DataFrame: DataFrame com uma coluna 0/1 por categoria.
+    """
+    known = codes >= 0
+    if sparse:
+        from scipy import sparse as sp
+
+        matrix = sp.csr_matrix(
+            (np.ones(known.sum(), dtype=np.int64), (rows[known], codes[known])),
+            shape=(n_rows, len(columns)),
+        )
+        matrix.data[:] = 1  # elementos repetidos na mesma lista contam uma vez
+        return pd.DataFrame.sparse.from_spmatrix(matrix, columns=columns)
+    matrix = np.zeros((n_rows, len(columns)), dtype=np.int64)
+    matrix[rows[known], codes[known]] = 1
+    return pd.DataFrame(matrix, columns=columns)
+
+
+def name_codes(names: pd.Series, columns: List[str]) -> np.ndarray:
+    """Códigos em `columns` de uma coluna explodida de nomes (`-` vira `_`)."""
+    return pd.Categorical(names.str.replace("-", "_"), categories=columns).codes
+
+
+def platform_codes(platforms: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Códigos em `PLATFORM_COLUMNS` de cada plataforma, via tabela de consulta NumPy.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Códigos e posição da linha original de cada elemento.
+    """
+    exploded = platforms.reset_index(drop=True).explode()
+    codes = platform_group_codes(exploded.astype("float64").to_numpy())
+    # Reordena os grupos da tabela para a ordem das colunas
+    codes = pd.Index(PLATFORM_COLUMNS).get_indexer(PLATFORM_GROUPS)[codes]
+    return codes, exploded.index.to_numpy()
+
+
+def build_features(data_frame: pd.DataFrame, sparse: bool = False) -> pd.DataFrame:
+    """
+    Gera as features do modelo a partir do dataset intermediário de jogos.
+
+    É a mesma transformação usada no treino (`features.py`), na predição em lote
+    (`modeling/predict.py`) e na API (`/predict-games`), e produz exatamente as
+    colunas dos arquivos `data/raw/twitch_api_data_*.csv` (`FEATURE_COLUMNS`).
+    Todas as operações são vetorizadas: listas são explodidas uma única vez e
+    codificadas via códigos de categorias, sem `.apply` linha a linha.
+
+    Args:
+        data_frame (pd.DataFrame): Saída de `dataset.build_games_dataset`.
+        sparse (bool): Se True, as colunas multi-hot são esparsas.
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas de `FEATURE_COLUMNS`.
+    """
+    data_frame = data_frame.reset_index(drop=True)
+    n_rows = len(data_frame)
+    has_company = data_frame["company"].notna()
+
+    genres = explode_mapped(data_frame["genres"], mappings.genres_mapping, UNKNOWN_GENRE)
+    features = pd.DataFrame(
+        {
+            "id": data_frame["id"].astype("int64"),
+            "name": data_frame["name"],
+            "genres_first": genres.groupby(level=0).first().reindex(range(n_rows)),
+            "has_remaster": data_frame["remasters"].notna().astype("int64"),
+            "target": data_frame["rating"].notna().astype("int64"),
+            "age_classif": data_frame["age_classif"].fillna(NO_RATING),
+        }
+    )
+
+    # Features da empresa: -1 para listas ausentes, NaN para jogos sem empresa
+    for column, source in (("games_developed", "developed"), ("games_published", "published")):
+        counts = list_lengths(data_frame[source]).fillna(-1)
+        features[column] = counts.where(has_company)
+    features["has_parents"] = data_frame["parent"].notna().astype("float64").where(has_company)
+    features["continent_name"] = countries_to_continents(data_frame["country"]).where(has_company)
+
+    for column in ("onlinecoop", "onlinecoopmax", "onlinemax", "splitscreen"):
+        features[column] = data_frame[column].astype("float64")
+
+    encoded = [
+        multi_hot(*platform_codes(data_frame["platforms"]), PLATFORM_COLUMNS, n_rows, sparse)
+    ]
+    for lists, mapping, unknown, columns in (
+        (
+            data_frame["game_modes"],
+            mappings.game_modes_mapping,
+            UNKNOWN_GAME_MODE,
+            GAME_MODE_COLUMNS,
+        ),
+        (
+            data_frame["player_perspectives"],
+            mappings.player_perspectives_mapping,
+            UNKNOWN_PLAYER_PERSPECTIVE,
+            PLAYER_PERSPECTIVE_COLUMNS,
+        ),
+    ):
+        names = explode_mapped(lists, mapping, unknown)
+        encoded.append(
+            multi_hot(name_codes(names, columns), names.index.to_numpy(), columns, n_rows, sparse)
+        )
+
+    worldwide = next(
+        key for key, value in mappings.region_mapping_inverted.items() if value == "worldwide"
+    )
+    has_global_launch = (data_frame["region"] == worldwide).fillna(False).astype("int64")
+
+    features = pd.concat([features, *encoded], axis=1)
+    features["has_global_launch"] = has_global_launch.to_numpy()
+    return features[FEATURE_COLUMNS]
+
 
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    input_path: Path = PROCESSED_DATA_DIR / "dataset.csv",
-    output_path: Path = PROCESSED_DATA_DIR / "features.csv",
-    # -----------------------------------------
+    input_path: Path = INTERIM_DATA_DIR / "games",
+    output_path: Path = PROCESSED_DATA_DIR / "features.parquet",
 ):
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
     logger.info("Generating features from dataset...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Features generation complete.")
-    # -----------------------------------------
+    data_frame = pd.read_parquet(input_path)
+    features = build_features(data_frame)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.suffix == ".csv":
+        features.to_csv(output_path, index=False)
+    else:
+        features.to_parquet(output_path, index=False)
+    logger.success(f"Features generation complete: {len(features)} linhas em {output_path}.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,426 @@
+"""
+Inferência de ensembles de árvores (XGBoost, LightGBM e Random Forest) em NumPy puro.
+
+`compile_model` achata as árvores treinadas por `train_xgboost`, `train_lightgbm` ou
+`train_random_forest` em vetores NumPy (feature, limiar, filhos, valor das folhas) e
+`CompiledEnsemble` avalia lotes percorrendo todas as árvores ao mesmo tempo, um nível
+por iteração, sem passar pelo framework. Para servir, basta NumPy e este módulo:
+o ensemble é salvo em `.npz` com `save` e lido com `CompiledEnsemble.load`.
+
+`train_model` exporta o ensemble validado como artefato do run (`log_compiled_model`),
+que recebe as matrizes já pré-processadas. A API recebe as features brutas: com
+`MODEL_COMPILED=1` ela compila o estimador final do `Pipeline` registrado e mantém o
+pré-processamento (`compile_for_serving` em `fastapi/utils.py`).
+"""
+
+import json
+
+import numpy as np
+
+# Tratamento de valores ausentes por nó
+MISSING_NAN = 0  # NaN segue `missing_left` (XGBoost, LightGBM `NaN`, scikit-learn)
+MISSING_AS_ZERO = 1  # NaN é tratado como 0 (LightGBM `None`)
+MISSING_ZERO_OR_NAN = 2  # 0 e NaN seguem `missing_left` (LightGBM `Zero`)
+
+# Limite abaixo do qual o LightGBM considera um valor igual a zero
+LIGHTGBM_ZERO_THRESHOLD = 1e-35
+
+ARRAY_FIELDS = ("feature", "threshold", "left", "right", "missing_left", "missing_mode", "value")
+
+
+class CompiledEnsemble:
+    """
+    Ensemble de árvores binárias em vetores NumPy.
+
+    Todas as árvores ficam concatenadas nos mesmos vetores; `roots` indica o nó raiz
+    de cada uma. Folhas apontam para si mesmas, de modo que a avaliação faz apenas
+    `depth` passos vetorizados, sem tratar folhas separadamente.
+
+    Parâmetros:
+    - feature, threshold, left, right, missing_left, missing_mode, value: Vetores por nó.
+    - roots: Nó raiz de cada árvore.
+    - depth: Profundidade máxima das árvores.
+    - strict: Se True, vai para a esquerda quando `x < limiar` (XGBoost); senão `x <= limiar`.
+    - aggregation: `logistic` (soma das folhas + margem base, depois sigmoide) ou
+      `mean` (média das probabilidades das folhas, Random Forest).
+    - base_margin: Margem inicial somada antes da sigmoide.
+    - input_dtype: Tipo para o qual as entradas são convertidas antes da comparação.
+    - feature_names: Nomes das features na ordem das colunas de entrada.
+    - sparse_missing: Se True, elementos ausentes de matrizes esparsas são valores
+      ausentes (NaN), como no XGBoost; senão valem 0 (LightGBM e scikit-learn).
+    """
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        left,
+        right,
+        missing_left,
+        missing_mode,
+        value,
+        roots,
+        depth,
+        strict,
+        aggregation,
+        base_margin=0.0,
+        input_dtype="float32",
+        feature_names=None,
+        sparse_missing=False,
+    ):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.missing_mode = np.asarray(missing_mode, dtype=np.int8)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.depth = int(depth)
+        self.strict = bool(strict)
+        self.aggregation = aggregation
+        self.base_margin = float(base_margin)
+        self.input_dtype = np.dtype(input_dtype)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.sparse_missing = bool(sparse_missing)
+        self._has_special_missing = bool((self.missing_mode != MISSING_NAN).any())
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def to_dense(self, X):
+        """Converte a entrada (array, DataFrame ou matriz esparsa) em array contíguo."""
+        if not hasattr(X, "tocoo"):
+            return np.ascontiguousarray(X, dtype=self.input_dtype)
+        coo = X.tocoo()
+        dense = np.full(coo.shape, np.nan if self.sparse_missing else 0, dtype=self.input_dtype)
+        dense[coo.row, coo.col] = coo.data
+        return dense
+
+    def leaves(self, X):
+        """Índice da folha alcançada por cada linha em cada árvore, shape (n_linhas, n_árvores)."""
+        X = self.to_dense(X)
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            threshold = self.threshold[nodes]
+            missing = np.isnan(x)
+            if self._has_special_missing:
+                mode = self.missing_mode[nodes]
+                zero = np.abs(x) <= LIGHTGBM_ZERO_THRESHOLD
+                x = np.where(missing & (mode == MISSING_AS_ZERO), 0, x)
+                missing = np.where(
+                    mode == MISSING_AS_ZERO,
+                    False,
+                    missing | ((mode == MISSING_ZERO_OR_NAN) & zero),
+                )
+            go_left = x < threshold if self.strict else x <= threshold
+            go_left = np.where(missing, self.missing_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Probabilidades das classes 0 e 1, como `predict_proba` do scikit-learn."""
+        leaf_values = self.value[self.leaves(X)]
+        if self.aggregation == "mean":
+            positive = leaf_values.mean(axis=1)
+        else:
+            positive = 1.0 / (1.0 + np.exp(-(leaf_values.sum(axis=1) + self.base_margin)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X):
+        """Classe prevista (limiar de 0.5)."""
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def save(self, path):
+        """Salva o ensemble em um arquivo `.npz` (apenas NumPy é necessário para ler)."""
+        metadata = {
+            "depth": self.depth,
+            "strict": self.strict,
+            "aggregation": self.aggregation,
+            "base_margin": self.base_margin,
+            "input_dtype": self.input_dtype.name,
+            "feature_names": self.feature_names,
+            "sparse_missing": self.sparse_missing,
+        }
+        np.savez(
+            path,
+            roots=self.roots,
+            metadata=np.array(json.dumps(metadata)),
+            **{field: getattr(self, field) for field in ARRAY_FIELDS},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Lê um ensemble salvo com `save`."""
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            arrays = {field: data[field] for field in (*ARRAY_FIELDS, "roots")}
+        return cls(**arrays, **metadata)
+
+
+class _TreeBuilder:
+    """Acumula os nós das árvores em listas e gera o `CompiledEnsemble`."""
+
+    def __init__(self):
+        self.nodes = {field: [] for field in ARRAY_FIELDS}
+        self.roots = []
+        self.depth = 0
+
+    def add_tree(self, tree_nodes, root, depth):
+        """
+        Adiciona uma árvore.
+
+        Parâmetros:
+        - tree_nodes: Lista de dicionários com os campos de `ARRAY_FIELDS`; `left` e
+          `right` são índices locais da árvore (None em folhas).
+        - root: Índice local da raiz.
+        - depth: Profundidade da árvore.
+        """
+        offset = len(self.nodes["feature"])
+        for index, node in enumerate(tree_nodes):
+            leaf = node["left"] is None
+            self.nodes["feature"].append(0 if leaf else node["feature"])
+            self.nodes["threshold"].append(0.0 if leaf else node["threshold"])
+            self.nodes["left"].append(offset + (index if leaf else node["left"]))
+            self.nodes["right"].append(offset + (index if leaf else node["right"]))
+            self.nodes["missing_left"].append(bool(node.get("missing_left", True)))
+            self.nodes["missing_mode"].append(node.get("missing_mode", MISSING_NAN))
+            self.nodes["value"].append(node.get("value", 0.0) if leaf else 0.0)
+        self.roots.append(offset + root)
+        self.depth = max(self.depth, depth)
+
+    def build(self, **kwargs):
+        return CompiledEnsemble(**self.nodes, roots=self.roots, depth=self.depth, **kwargs)
+
+
+def _logit(probability):
+    return float(np.log(probability / (1 - probability)))
+
+
+def compile_xgboost(booster):
+    """Achata um `xgb.Booster` binário (`binary:logistic`) treinado por `train_xgboost`
+    (ou um `XGBClassifier`)."""
+    booster = booster.get_booster() if hasattr(booster, "get_booster") else booster
+    config = json.loads(booster.save_config())
+    objective = config["learner"]["objective"]["name"]
+    if objective != "binary:logistic":
+        raise ValueError(f"Objetivo {objective} não suportado; use 'binary:logistic'.")
+    # Em versões recentes o valor vem como lista serializada (ex.: "[5E-1]")
+    base_score = float(str(config["learner"]["learner_model_param"]["base_score"]).strip("[]"))
+
+    feature_names = booster.feature_names
+    feature_index = {name: index for index, name in enumerate(feature_names or [])}
+
+    def column(name):
+        return feature_index[name] if feature_names else int(name.lstrip("f"))
+
+    builder = _TreeBuilder()
+    # Todas as árvores, como `booster.predict`, mesmo com early stopping
+    for dump in booster.get_dump(dump_format="json"):
+        tree = json.loads(dump)
+        nodes, depth = {}, 0
+        stack = [(tree, 0)]
+        while stack:
+            node, node_depth = stack.pop()
+            depth = max(depth, node_depth)
+            if "leaf" in node:
+                nodes[node["nodeid"]] = {"left": None, "right": None, "value": node["leaf"]}
+                continue
+            nodes[node["nodeid"]] = {
+                "feature": column(node["split"]),
+                "threshold": np.float32(node["split_condition"]),
+                "left": node["yes"],
+                "right": node["no"],
+                "missing_left": node["missing"] == node["yes"],
+            }
+            stack.extend((child, node_depth + 1) for child in node["children"])
+        # `nodeid` é denso (0..n-1) em cada árvore
+        builder.add_tree([nodes[index] for index in range(len(nodes))], 0, depth)
+    return builder.build(
+        strict=True,
+        aggregation="logistic",
+        base_margin=_logit(base_score),
+        input_dtype="float32",
+        feature_names=feature_names,
+        sparse_missing=True,
+    )
+
+
+def compile_lightgbm(model):
+    """Achata um `lgb.LGBMClassifier` (ou `lgb.Booster`) binário treinado por `train_lightgbm`."""
+    booster = getattr(model, "booster_", model)
+    num_iteration = booster.best_iteration if booster.best_iteration > 0 else None
+    dump = booster.dump_model(num_iteration=num_iteration)
+    objective = dump.get("objective", "")
+    if not objective.startswith("binary"):
+        raise ValueError(f"Objetivo {objective} não suportado; use 'binary'.")
+    if "sigmoid:1" not in objective:
+        raise ValueError(f"Apenas sigmoid:1 é suportado (objetivo: {objective}).")
+    if dump.get("average_output"):
+        raise ValueError("Modelos com average_output (boosting rf) não são suportados.")
+
+    missing_modes = {"None": MISSING_AS_ZERO, "Zero": MISSING_ZERO_OR_NAN, "NaN": MISSING_NAN}
+    builder = _TreeBuilder()
+    for tree_info in dump["tree_info"]:
+        nodes = []
+        depth = 0
+        stack = [(tree_info["tree_structure"], 0, None, None)]
+        while stack:
+            node, node_depth, parent, side = stack.pop()
+            depth = max(depth, node_depth)
+            index = len(nodes)
+            if parent is not None:
+                nodes[parent][side] = index
+            if "leaf_value" in node:
+                nodes.append({"left": None, "right": None, "value": node["leaf_value"]})
+                continue
+            if node["decision_type"] != "<=":
+                raise ValueError("Splits categóricos do LightGBM não são suportados.")
+            nodes.append(
+                {
+                    "feature": node["split_feature"],
+                    "threshold": node["threshold"],
+                    "left": -1,
+                    "right": -1,
+                    "missing_left": node["default_left"],
+                    "missing_mode": missing_modes[node["missing_type"]],
+                }
+            )
+            stack.append((node["right_child"], node_depth + 1, index, "right"))
+            stack.append((node["left_child"], node_depth + 1, index, "left"))
+        builder.add_tree(nodes, 0, depth)
+    return builder.build(
+        strict=False,
+        aggregation="logistic",
+        input_dtype="float64",
+        feature_names=dump.get("feature_names"),
+    )
+
+
+def compile_random_forest(model):
+    """Achata um `RandomForestClassifier` binário treinado por `train_random_forest`."""
+    if len(model.classes_) != 2:
+        raise ValueError("Apenas classificação binária é suportada.")
+    builder = _TreeBuilder()
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        # Fração da classe 1 em cada folha (a mesma usada por `predict_proba`)
+        counts = tree.value[:, 0, :]
+        positive = counts[:, 1] / counts.sum(axis=1)
+        missing_left = getattr(tree, "missing_go_to_left", np.ones(tree.node_count, dtype=bool))
+        nodes = [
+            {
+                "feature": int(tree.feature[index]),
+                "threshold": float(tree.threshold[index]),
+                "left": None if tree.children_left[index] < 0 else int(tree.children_left[index]),
+                "right": int(tree.children_right[index]),
+                "missing_left": bool(missing_left[index]),
+                "value": float(positive[index]),
+            }
+            for index in range(tree.node_count)
+        ]
+        builder.add_tree(nodes, 0, tree.max_depth)
+    feature_names = getattr(model, "feature_names_in_", None)
+    return builder.build(
+        strict=False,
+        aggregation="mean",
+        input_dtype="float32",
+        feature_names=None if feature_names is None else list(feature_names),
+    )
+
+
+def detect_algorithm(model):
+    """Algoritmo ('xgboost', 'lightgbm', 'random_forest') a partir da classe do modelo."""
+    library = type(model).__module__.split(".")[0]
+    if library in ("xgboost", "lightgbm"):
+        return library
+    if type(model).__name__ == "RandomForestClassifier":
+        return "random_forest"
+    raise ValueError(f"Modelo {type(model).__name__} não suportado.")
+
+
+def compile_model(model, algorithm=None):
+    """
+    Achata o modelo retornado por `train_model` em um `CompiledEnsemble`.
+
+    Parâmetros:
+    - model: Modelo treinado.
+    - algorithm: Algoritmo utilizado ('xgboost', 'lightgbm', 'random_forest'); None o
+      identifica pela classe do modelo.
+
+    Retorno:
+    - CompiledEnsemble equivalente ao modelo.
+    """
+    compilers = {
+        "xgboost": compile_xgboost,
+        "lightgbm": compile_lightgbm,
+        "random_forest": compile_random_forest,
+    }
+    algorithm = algorithm or detect_algorithm(model)
+    if algorithm not in compilers:
+        raise ValueError(
+            f"Algoritmo {algorithm} não suportado. "
+            "Escolha entre 'xgboost', 'random_forest' ou 'lightgbm'."
+        )
+    return compilers[algorithm](model)
+
+
+def validate_compiled_model(compiled, model, X, algorithm, atol=1e-5):
+    """
+    Compara as probabilidades do ensemble compilado com as do modelo original.
+
+    No XGBoost a referência é `inplace_predict`, a mesma chamada usada por
+    `predict_model` e pela API.
+
+    Parâmetros:
+    - compiled: Resultado de `compile_model`.
+    - model: Modelo original.
+    - X: Dados de validação (features, densos ou esparsos).
+    - algorithm: Algoritmo utilizado ('xgboost', 'lightgbm', 'random_forest').
+    - atol: Diferença absoluta máxima permitida.
+
+    Retorno:
+    - max_difference: Maior diferença absoluta encontrada.
+    """
+    if algorithm == "xgboost":
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        if hasattr(X, "tocsr"):
+            X = X.tocsr()
+        elif not hasattr(X, "columns"):
+            X = np.ascontiguousarray(X, dtype=np.float32)
+        expected = booster.inplace_predict(X)
+    else:
+        expected = model.predict_proba(X)[:, 1]
+    actual = compiled.predict_proba(X)[:, 1]
+    max_difference = float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+    if max_difference > atol:
+        raise AssertionError(
+            f"Probabilidades do modelo compilado diferem do original em até {max_difference:.2e} "
+            f"(tolerância {atol:.0e})."
+        )
+    return max_difference
+
+
+def export_compiled_model(model, algorithm, path, X_validation=None, atol=1e-5):
+    """
+    Compila o modelo, valida contra o original (se houver dados) e salva em `.npz`.
+
+    Parâmetros:
+    - model: Modelo treinado.
+    - algorithm: Algoritmo utilizado ('xgboost', 'lightgbm', 'random_forest').
+    - path: Caminho do arquivo `.npz`.
+    - X_validation: Dados usados na validação; None pula a validação.
+    - atol: Diferença absoluta máxima permitida.
+
+    Retorno:
+    - compiled: Ensemble compilado.
+    """
+    compiled = compile_model(model, algorithm)
+    if X_validation is not None:
+        validate_compiled_model(compiled, model, X_validation, algorithm, atol)
+    compiled.save(path)
+    return compiled
@@ -0,0 +1,288 @@
+"""
+Validação cruzada estratificada com matrizes de cada fold em cache.
+
+Os índices dos folds são calculados uma única vez e, para cada fold, o
+`build_preprocessor` é ajustado no treino e as matrizes resultantes são guardadas em
+memória e em disco (`CV_CACHE_DIR`, chaveado pelo hash dos dados e da configuração).
+Os `xgb.DMatrix` e `lgb.Dataset` de cada fold também são reaproveitados entre trials
+do mesmo processo, de modo que uma busca de hiperparâmetros não repete o
+pré-processamento nem a construção das matrizes a cada configuração.
+
+Os modelos são treinados pelas mesmas funções de `modeling.model` (mesmos parâmetros
+padrão). O early stopping dos boosters usa uma parte estratificada do treino de cada
+fold (`EARLY_STOPPING_SIZE`), nunca o fold avaliado.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import lightgbm as lgb
+import mlflow
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from imblearn.over_sampling import SMOTE
+from sklearn.metrics import log_loss, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from data_master_eng_ml.config import INTERIM_DATA_DIR
+from modeling.model import (
+    predict_model,
+    train_lightgbm_datasets,
+    train_random_forest,
+    train_xgboost,
+)
+from modeling.preprocessor import build_preprocessor
+
+# Versão do formato do cache; mudar força o recálculo das matrizes
+CV_CACHE_VERSION = 2
+CV_CACHE_DIR = os.getenv("CV_CACHE_DIR", str(INTERIM_DATA_DIR / "cv_cache"))
+# Fração do treino de cada fold reservada ao early stopping do XGBoost e do LightGBM
+EARLY_STOPPING_SIZE = 0.2
+
+
+class FoldCache:
+    """
+    Folds estratificados e suas matrizes pré-processadas.
+
+    Parâmetros:
+    - X: DataFrame de features (antes do pré-processamento).
+    - y: Target.
+    - numerical_cols: Colunas numéricas passadas ao `build_preprocessor`.
+    - categorical_cols: Colunas categóricas passadas ao `build_preprocessor`.
+    - n_splits: Número de folds.
+    - random_state: Semente da divisão (e do SMOTE).
+    - cache_dir: Diretório do cache em disco (None desativa o disco).
+    - sparse: Ver `build_preprocessor`.
+    """
+
+    def __init__(
+        self,
+        X,
+        y,
+        numerical_cols,
+        categorical_cols,
+        n_splits=5,
+        random_state=42,
+        cache_dir=CV_CACHE_DIR,
+        sparse=None,
+    ):
+        self.X = X.reset_index(drop=True)
+        self.y = np.asarray(y).ravel()
+        self.numerical_cols = list(numerical_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.n_splits = n_splits
+        self.random_state = random_state
+        self.cache_dir = cache_dir
+        self.sparse = sparse
+        self.key = self._key()
+        self._folds = None
+        self._matrices = {}
+        self._native = {}
+        self._lock = threading.RLock()
+
+    def _key(self):
+        """Hash dos dados, das colunas e da configuração dos folds."""
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(self.X, index=False).values.tobytes())
+        digest.update(np.ascontiguousarray(self.y).tobytes())
+        digest.update(
+            repr(
+                (
+                    CV_CACHE_VERSION,
+                    self.numerical_cols,
+                    self.categorical_cols,
+                    self.n_splits,
+                    self.random_state,
+                    self.sparse,
+                )
+            ).encode()
+        )
+        return digest.hexdigest()[:16]
+
+    def __getstate__(self):
+        # Objetos nativos e o lock não são serializáveis; cada processo reconstrói os seus
+        state = self.__dict__.copy()
+        state.update(_native={}, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def folds(self):
+        """Índices (treino, validação) de cada fold, calculados uma única vez."""
+        if self._folds is None:
+            splitter = StratifiedKFold(
+                n_splits=self.n_splits, shuffle=True, random_state=self.random_state
+            )
+            self._folds = list(splitter.split(self.X, self.y))
+        return self._folds
+
+    def _path(self, fold, use_smote):
+        suffix = "_smote" if use_smote else ""
+        return os.path.join(self.cache_dir, self.key, f"fold_{fold}{suffix}.joblib")
+
+    def _build(self, fold, use_smote):
+        train_index, val_index = self.folds()[fold]
+        preprocessor = build_preprocessor(self.numerical_cols, self.categorical_cols, self.sparse)
+        X_train = preprocessor.fit_transform(self.X.iloc[train_index])
+        X_val = preprocessor.transform(self.X.iloc[val_index])
+        y_train, y_val = self.y[train_index], self.y[val_index]
+        # `X_fit` treina os boosters e `X_es` decide o early stopping; ambos saem do treino
+        fit_rows, es_rows = train_test_split(
+            np.arange(len(y_train)),
+            test_size=EARLY_STOPPING_SIZE,
+            stratify=y_train,
+            random_state=self.random_state,
+        )
+        X_fit, y_fit = X_train[fit_rows], y_train[fit_rows]
+        X_es, y_es = X_train[es_rows], y_train[es_rows]
+        if use_smote:
+            smote = SMOTE(random_state=self.random_state)
+            X_train, y_train = smote.fit_resample(X_train, y_train)
+            X_fit, y_fit = smote.fit_resample(X_fit, y_fit)
+        return {
+            "X_train": X_train,
+            "y_train": y_train,
+            "X_fit": X_fit,
+            "y_fit": y_fit,
+            "X_es": X_es,
+            "y_es": y_es,
+            "X_val": X_val,
+            "y_val": y_val,
+        }
+
+    def matrices(self, fold, use_smote=False):
+        """Matrizes pré-processadas do fold (memória, depois disco, depois recalcula)."""
+        with self._lock:
+            if (fold, use_smote) in self._matrices:
+                return self._matrices[(fold, use_smote)]
+        path = self._path(fold, use_smote) if self.cache_dir else None
+        if path and os.path.exists(path):
+            matrices = joblib.load(path)
+        else:
+            matrices = self._build(fold, use_smote)
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                joblib.dump(matrices, tmp_path)
+                os.replace(tmp_path, path)
+        with self._lock:
+            return self._matrices.setdefault((fold, use_smote), matrices)
+
+    def prepare(self, use_smote=False):
+        """Calcula (ou lê do disco) as matrizes de todos os folds."""
+        for fold in range(self.n_splits):
+            self.matrices(fold, use_smote)
+        return self
+
+    def _native_object(self, kind, fold, use_smote, build):
+        with self._lock:
+            if (kind, fold, use_smote) not in self._native:
+                self._native[(kind, fold, use_smote)] = build(self.matrices(fold, use_smote))
+            return self._native[(kind, fold, use_smote)]
+
+    def dmatrices(self, fold, use_smote=False):
+        """`xgb.DMatrix` de treino e de early stopping do fold, criados uma vez por processo."""
+        return self._native_object(
+            "xgboost",
+            fold,
+            use_smote,
+            lambda m: (
+                xgb.DMatrix(m["X_fit"], label=m["y_fit"]),
+                xgb.DMatrix(m["X_es"], label=m["y_es"]),
+            ),
+        )
+
+    def lgb_datasets(self, fold, use_smote=False):
+        """`lgb.Dataset` de treino e de early stopping do fold, criados uma vez por processo.
+
+        Os bins são calculados no primeiro treino e reaproveitados pelos seguintes.
+        """
+
+        def build(m):
+            train = lgb.Dataset(m["X_fit"], label=m["y_fit"], free_raw_data=False)
+            return train, lgb.Dataset(m["X_es"], label=m["y_es"], reference=train)
+
+        return self._native_object("lightgbm", fold, use_smote, build)
+
+
+def _fit_fold(fold_cache, fold, algorithm, params, use_smote, n_jobs):
+    """Treina em um fold e retorna as probabilidades da validação."""
+    matrices = fold_cache.matrices(fold, use_smote)
+    if algorithm == "xgboost":
+        dtrain, des = fold_cache.dmatrices(fold, use_smote)
+        model, _ = train_xgboost(dtrain, des, params, n_jobs)
+    elif algorithm == "lightgbm":
+        train_set, es_set = fold_cache.lgb_datasets(fold, use_smote)
+        model, _ = train_lightgbm_datasets(train_set, es_set, params, n_jobs)
+        # `lgb.Booster.predict` já retorna as probabilidades da classe 1
+        return model.predict(matrices["X_val"])
+    elif algorithm == "random_forest":
+        model, _ = train_random_forest(matrices["X_train"], matrices["y_train"], params, n_jobs)
+    else:
+        raise ValueError(
+            f"Algoritmo {algorithm} não suportado. "
+            "Escolha entre 'xgboost', 'random_forest' ou 'lightgbm'."
+        )
+    _, y_pred_proba = predict_model(model, matrices["X_val"], algorithm)
+    return y_pred_proba
+
+
+def cross_validate(fold_cache, algorithm, params=None, use_smote=False, n_jobs=None):
+    """
+    Treina e avalia o modelo em todos os folds, em paralelo.
+
+    Os folds rodam em threads (XGBoost, LightGBM e scikit-learn liberam o GIL durante
+    o treino), compartilhando as matrizes em cache; as threads disponíveis são
+    divididas entre os folds.
+
+    Parâmetros:
+    - fold_cache: `FoldCache` com os folds.
+    - algorithm: Algoritmo ('xgboost', 'random_forest', 'lightgbm').
+    - params: Parâmetros do modelo.
+    - use_smote: Se True, usa as matrizes de treino balanceadas com SMOTE.
+    - n_jobs: Total de threads (None usa todos os núcleos).
+
+    Retorno:
+    - metrics: Média e desvio padrão de AUC e logloss nos folds.
+    """
+    n_folds = fold_cache.n_splits
+    n_jobs = n_jobs or os.cpu_count() or 1
+    fold_workers = min(n_folds, n_jobs)
+    threads_per_fold = max(1, n_jobs // fold_workers)
+    folds = fold_cache.folds()
+
+    with ThreadPoolExecutor(max_workers=fold_workers) as executor:
+        probabilities = list(
+            executor.map(
+                lambda fold: _fit_fold(
+                    fold_cache, fold, algorithm, params, use_smote, threads_per_fold
+                ),
+                range(n_folds),
+            )
+        )
+
+    aucs, loglosses = [], []
+    for (_, val_index), y_pred_proba in zip(folds, probabilities):
+        y_val = fold_cache.y[val_index]
+        aucs.append(roc_auc_score(y_val, y_pred_proba))
+        loglosses.append(log_loss(y_val, y_pred_proba))
+    return {
+        "roc_auc_cv_mean": float(np.mean(aucs)),
+        "roc_auc_cv_std": float(np.std(aucs)),
+        "logloss_cv_mean": float(np.mean(loglosses)),
+        "logloss_cv_std": float(np.std(loglosses)),
+    }
+
+
+def log_cross_validation(fold_cache, algorithm, params=None, use_smote=False, n_jobs=None):
+    """Executa `cross_validate` e loga as métricas no run ativo do MLflow."""
+    metrics = cross_validate(fold_cache, algorithm, params, use_smote, n_jobs)
+    mlflow.log_metrics(metrics)
+    mlflow.log_param("cv_folds", fold_cache.n_splits)
+    return metrics
@@ -1,21 +1,43 @@
+from contextlib import contextmanager
+import json
+
 import mlflow
 import mlflow.sklearn
 import xgboost as xgb
 import lightgbm as lgb
 from imblearn.over_sampling import SMOTE
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import roc_auc_score, accuracy_score
+from sklearn.metrics import roc_auc_score, accuracy_score, log_loss
 from sklearn.base import BaseEstimator
+from sklearn.pipeline import Pipeline
+import numpy as np
 import pandas as pd
 import os
+from scipy import sparse
+import tempfile
 
 from visualization.plot_utils import (
     generate_and_log_plots,
 )
 
 
+def to_data_frame(X):
+    """Converte a matriz de features (densa ou esparsa) em DataFrame."""
+    if sparse.issparse(X):
+        return pd.DataFrame.sparse.from_spmatrix(X)
+    return pd.DataFrame(X)
+
+
 def log_data_and_plots(
-    X_train, y_train, X_test, y_test, model, experiment_name, algorithm
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    model,
+    experiment_name,
+    algorithm,
+    train_predictions=None,
+    test_predictions=None,
 ):
     """
     Loga os dados e os gráficos (Matriz de Confusão, AUC-ROC) no MLflow.
@@ -28,21 +50,26 @@ def log_data_and_plots(
     - model: Modelo treinado.
     - experiment_name: Nome do experimento no MLflow.
     - algorithm: Algoritmo utilizado ('xgboost', 'lightgbm', 'random_forest')
+    - train_predictions: Tupla (classes, probabilidades) já calculada para o treino;
+      se None, as previsões são feitas aqui.
+    - test_predictions: Tupla (classes, probabilidades) já calculada para o teste.
     """
     # Logando os dados
     data_path = f"{experiment_name}_data.csv"
-    df_train = pd.DataFrame(X_train)
+    df_train = to_data_frame(X_train)
     df_train["target"] = y_train
-    df_test = pd.DataFrame(X_test)
+    df_test = to_data_frame(X_test)
     df_test["target"] = y_test
     df_full = pd.concat([df_train, df_test])
     df_full.to_csv(data_path, index=False)
     mlflow.log_artifact(data_path)
     os.remove(data_path)  # Remover o arquivo após o log para evitar acúmulo de arquivos
 
-    # Fazer previsões
-    y_train_pred, y_train_pred_proba = predict_model(model, X_train, algorithm)
-    y_test_pred, y_test_pred_proba = predict_model(model, X_test, algorithm)
+    # Reaproveitar as previsões feitas em `train_model`, se houver
+    y_train_pred, y_train_pred_proba = train_predictions or predict_model(
+        model, X_train, algorithm
+    )
+    y_test_pred, y_test_pred_proba = test_predictions or predict_model(model, X_test, algorithm)
 
     # Gerar e logar os gráficos
     generate_and_log_plots(
@@ -65,6 +92,13 @@ def train_model(
     params=None,
     use_smote=False,
     experiment_name="Model_Training",
+    n_jobs=None,
+    run_tags=None,
+    log_artifacts=True,
+    cv=None,
+    preprocessor=None,
+    X_es=None,
+    y_es=None,
 ):
     """
     Treina um modelo de machine learning usando o algoritmo especificado e registra o processo no MLflow.
@@ -78,6 +112,17 @@ def train_model(
     - params: Parâmetros do modelo.
     - use_smote: Se True, aplica SMOTE para lidar com desbalanceamento.
     - experiment_name: Nome do experimento no MLflow.
+    - n_jobs: Número de threads do treino e das previsões (None usa o padrão do algoritmo).
+    - run_tags: Tags do run no MLflow (ex.: `mlflow.parentRunId` para runs aninhados).
+    - log_artifacts: Se False, não loga os dados nem os gráficos (usado na busca de
+      hiperparâmetros).
+    - cv: `FoldCache` (ver `cross_validation.py`); se informado, também loga a média e
+      o desvio padrão de AUC e logloss na validação cruzada.
+    - preprocessor: `ColumnTransformer` ajustado que gerou `X_train` e `X_test`; se
+      informado, o modelo é logado como `Pipeline(preprocessor, model)`, que recebe as
+      features brutas (como a API envia).
+    - X_es, y_es: Dados do early stopping do XGBoost e do LightGBM; se None, usa o
+      conjunto de teste (que então deixa de ser independente do treino).
 
     Retorno:
     - model: Modelo treinado.
@@ -86,58 +131,48 @@ def train_model(
     experiment_name = f"{algorithm}_model{'_with_smote' if use_smote else ''}"
     mlflow.set_experiment(experiment_name)
 
-    with mlflow.start_run(run_name=experiment_name):
+    with mlflow.start_run(run_name=experiment_name, tags=run_tags):
         if use_smote:
             # Aplicar SMOTE para lidar com o desbalanceamento
             smote = SMOTE(random_state=42)
             X_train, y_train = smote.fit_resample(X_train, y_train)
 
-        if algorithm == "xgboost":
-            # Converter X_train e X_test para DMatrix
-            dtrain = xgb.DMatrix(X_train, label=y_train)
-            dtest = xgb.DMatrix(X_test, label=y_test)
-            model, model_params = train_xgboost(dtrain, dtest, params)
-
-            # Avaliar e logar as métricas no conjunto de treino
-            y_train_pred_proba = model.predict(dtrain)
-            y_train_pred = (y_train_pred_proba > 0.5).astype(int)
-            train_auc = roc_auc_score(y_train, y_train_pred_proba)
-            mlflow.log_metric("roc_auc_train", train_auc)
+        if X_es is None:
+            X_es, y_es = X_test, y_test
 
+        if algorithm == "xgboost":
+            # DMatrix apenas para o treino; as previsões usam `inplace_predict`
+            dtrain = xgb.DMatrix(X_train, label=y_train, nthread=n_jobs)
+            des = xgb.DMatrix(X_es, label=y_es, nthread=n_jobs)
+            model, model_params = train_xgboost(dtrain, des, params, n_jobs)
         elif algorithm == "random_forest":
-            model, model_params = train_random_forest(X_train, y_train, params)
-            y_train_pred_proba = model.predict_proba(X_train)[:, 1]
-            y_train_pred = model.predict(X_train)
-            train_auc = roc_auc_score(y_train, y_train_pred_proba)
-            mlflow.log_metric("roc_auc_train", train_auc)
-
+            model, model_params = train_random_forest(X_train, y_train, params, n_jobs)
         elif algorithm == "lightgbm":
-            model, model_params = train_lightgbm(
-                X_train, y_train, X_test, y_test, params
-            )
-            y_train_pred_proba = model.predict_proba(X_train)[:, 1]
-            y_train_pred = model.predict(X_train)
-            train_auc = roc_auc_score(y_train, y_train_pred_proba)
-            mlflow.log_metric("roc_auc_train", train_auc)
+            model, model_params = train_lightgbm(X_train, y_train, X_es, y_es, params, n_jobs)
         else:
             raise ValueError(
                 f"Algoritmo {algorithm} não suportado. Escolha entre 'xgboost', 'random_forest' ou 'lightgbm'."
             )
-        # Logar a métrica de AUC no conjunto de teste
-        if algorithm == "xgboost":
-            y_test_pred_proba = model.predict(dtest)
-            y_test_pred = (y_test_pred_proba > 0.5).astype(int)
-        else:
-            y_test_pred_proba = (
-                model.predict_proba(X_test)[:, 1]
-                if hasattr(model, "predict_proba")
-                else None
-            )
-            y_test_pred = model.predict(X_test)
 
+        # Prever treino e teste uma única vez; as previsões são reaproveitadas nos gráficos
+        y_train_pred, y_train_pred_proba = predict_model(model, X_train, algorithm, n_jobs)
+        y_test_pred, y_test_pred_proba = predict_model(model, X_test, algorithm, n_jobs)
+
+        # Avaliar e logar as métricas no conjunto de treino
+        train_auc = roc_auc_score(y_train, y_train_pred_proba)
+        mlflow.log_metric("roc_auc_train", train_auc)
+
+        # Logar a métrica de AUC no conjunto de teste
         if y_test_pred_proba is not None:
             test_auc = roc_auc_score(y_test, y_test_pred_proba)
             mlflow.log_metric("roc_auc_test", test_auc)
+            mlflow.log_metric("logloss_test", log_loss(y_test, y_test_pred_proba))
+
+        # Validação cruzada com as matrizes dos folds em cache
+        if cv is not None:
+            from modeling.cross_validation import log_cross_validation
+
+            log_cross_validation(cv, algorithm, params, use_smote, n_jobs)
 
         # Logar a acurácia no conjunto de teste
         test_accuracy = accuracy_score(y_test, y_test_pred)
@@ -145,17 +180,67 @@ def train_model(
 
         # Logar parâmetros e modelo no MLflow
         mlflow.log_params(model_params)
-        mlflow.sklearn.log_model(model, f"{algorithm}_model")
-
-        # Logar os dados e os gráficos
-        log_data_and_plots(
-            X_train, y_train, X_test, y_test, model, experiment_name, algorithm
+        mlflow.sklearn.log_model(
+            to_serving_model(model, algorithm, preprocessor), f"{algorithm}_model"
         )
 
+        # Logar os dados, os gráficos e o ensemble compilado para a API
+        if log_artifacts:
+            log_compiled_model(model, algorithm, X_test)
+            log_data_and_plots(
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                model,
+                experiment_name,
+                algorithm,
+                train_predictions=(y_train_pred, y_train_pred_proba),
+                test_predictions=(y_test_pred, y_test_pred_proba),
+            )
+
         return model
 
 
-def train_xgboost(dtrain, dval, params):
+def to_serving_model(model, algorithm, preprocessor=None):
+    """
+    Modelo logado no MLflow: o pré-processador e o estimador em um único `Pipeline`.
+
+    O `xgb.Booster` de `train_xgboost` vira um `XGBClassifier` com as mesmas árvores,
+    para ter `predict_proba` como os demais estimadores do `Pipeline`. Sem
+    `preprocessor`, o modelo é logado como foi treinado.
+    """
+    if preprocessor is None:
+        return model
+    if algorithm == "xgboost":
+        classifier = xgb.XGBClassifier()
+        classifier.load_model(bytearray(model.save_raw("ubj")))
+        model = classifier
+    return Pipeline([("preprocessor", preprocessor), ("model", model)])
+
+
+def log_compiled_model(model, algorithm, X_validation):
+    """
+    Exporta o modelo compilado em NumPy (`compiled_trees`) como artefato do run.
+
+    O ensemble só é logado se suas probabilidades baterem com as do modelo em
+    `X_validation`; modelos não suportados (ex.: splits categóricos) são ignorados.
+    Assim como o modelo treinado, ele recebe as matrizes já pré-processadas; a API
+    serve o `Pipeline` logado por `train_model` (compilado com `MODEL_COMPILED=1`).
+    """
+    from modeling.compiled_trees import export_compiled_model
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"{algorithm}_compiled.npz")
+        try:
+            export_compiled_model(model, algorithm, path, X_validation)
+        except (ValueError, AssertionError) as e:
+            print(f"Modelo compilado não exportado: {e}")
+            return
+        mlflow.log_artifact(path, "compiled")
+
+
+def train_xgboost(dtrain, dval, params, n_jobs=None):
     default_params = {
         "objective": "binary:logistic",
         "eval_metric": "logloss",
@@ -168,24 +253,30 @@ def train_xgboost(dtrain, dval, params):
         "reg_lambda": 0.45,
         "seed": 42,
     }
-    params = params or default_params
+    params = dict(params or default_params)
+    if n_jobs is not None:
+        params["nthread"] = n_jobs
+    # Número de árvores configurável pelos parâmetros (orçamento da busca)
+    num_boost_round = params.pop("num_boost_round", 200)
 
     evals = [(dtrain, "train"), (dval, "eval")]
     model = xgb.train(
         params,
         dtrain,
-        num_boost_round=200,
+        num_boost_round=num_boost_round,
         early_stopping_rounds=10,
         evals=evals,
         verbose_eval=False,
     )
 
-    return model, params
+    return model, {**params, "num_boost_round": num_boost_round}
 
 
-def train_random_forest(X_train, y_train, params):
+def train_random_forest(X_train, y_train, params, n_jobs=None):
     default_params = {"n_estimators": 100, "max_depth": 10, "random_state": 42}
     params = params or default_params
+    if n_jobs is not None:
+        params = {**params, "n_jobs": n_jobs}
 
     model = RandomForestClassifier(**params)
     model.fit(X_train, y_train)
@@ -193,7 +284,7 @@ def train_random_forest(X_train, y_train, params):
     return model, params
 
 
-def train_lightgbm(X_train, y_train, params):
+def lightgbm_params(params, n_jobs=None):
     default_params = {
         "objective": "binary",
         "metric": "binary_logloss",
@@ -207,35 +298,109 @@ def train_lightgbm(X_train, y_train, params):
         "seed": 42,
     }
     params = params or default_params
+    if n_jobs is not None:
+        params = {**params, "n_jobs": n_jobs}
+    return params
+
+
+def train_lightgbm(X_train, y_train, X_val, y_val, params, n_jobs=None):
+    params = lightgbm_params(params, n_jobs)
 
     model = lgb.LGBMClassifier(**params)
-    model.fit(X_train, y_train)
+    model.fit(X_train, y_train, eval_set=[(X_val, y_val)])
 
     return model, params
 
 
-def predict_model(model: BaseEstimator, X_test, algorithm):
+def train_lightgbm_datasets(train_set, val_set, params, n_jobs=None):
+    """
+    Treina com `lgb.train` sobre `lgb.Dataset` já construídos (ex.: os de cada fold em
+    `FoldCache.lgb_datasets`), com os mesmos parâmetros padrão de `train_lightgbm`.
+
+    Retorno:
+    - model: `lgb.Booster`, cujo `predict` retorna as probabilidades da classe 1.
+    - params: Parâmetros utilizados.
+    """
+    params = lightgbm_params(params, n_jobs)
+    # Sem os logs do LightGBM a cada fold, salvo se `params` definir outro `verbose`
+    model = lgb.train({"verbose": -1, **params}, train_set, valid_sets=[val_set])
+
+    return model, params
+
+
+def to_inplace_input(X):
+    """
+    Converte os dados para a entrada de `inplace_predict` sem cópias desnecessárias.
+
+    Matrizes esparsas viram CSR; o restante vira um array float32 contíguo em memória
+    (o tipo usado internamente pelo XGBoost).
+    """
+    if sparse.issparse(X):
+        return X.tocsr()
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy()
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def get_n_jobs(model, algorithm):
+    """Número de threads configurado no modelo."""
+    if algorithm == "xgboost":
+        return json.loads(model.save_config())["learner"]["generic_param"]["nthread"]
+    return model.get_params(deep=False)["n_jobs"]
+
+
+def set_n_jobs(model, algorithm, n_jobs):
+    """Ajusta o número de threads usado nas previsões do modelo."""
+    if algorithm == "xgboost":
+        model.set_param({"nthread": n_jobs})
+    else:
+        model.set_params(n_jobs=n_jobs)
+
+
+@contextmanager
+def prediction_threads(model, algorithm, n_jobs):
+    """
+    Usa `n_jobs` threads nas previsões dentro do bloco e restaura o valor do modelo ao
+    sair, para não alterar o modelo recebido (ex.: o já logado no MLflow).
+    """
+    if n_jobs is None:
+        yield
+        return
+    previous = get_n_jobs(model, algorithm)
+    set_n_jobs(model, algorithm, n_jobs)
+    try:
+        yield
+    finally:
+        set_n_jobs(model, algorithm, previous)
+
+
+def predict_model(model: BaseEstimator, X_test, algorithm, n_jobs=None):
     """
     Realiza previsões usando o modelo treinado.
 
+    Para o XGBoost usa `inplace_predict` sobre um array contíguo, sem construir
+    um `DMatrix` a cada chamada.
+
     Parâmetros:
     - model: Modelo treinado.
     - X_test: Dados de teste (features).
     - algorithm: Algoritmo utilizado ('xgboost', 'lightgbm', 'random_forest').
+    - n_jobs: Número de threads das previsões (None mantém o do modelo); o modelo
+      volta ao valor original depois das previsões.
     Retorno:
     - y_test_pred: Predições das classes.
     - y_test_pred_proba: Predições das probabilidades (se disponível).
     """
-    if algorithm == "xgboost":
-        dtest = xgb.DMatrix(X_test)
-        y_test_pred_proba = model.predict(dtest)
-        y_test_pred = (y_test_pred_proba > 0.5).astype(int)
-    else:
-        y_test_pred = model.predict(X_test)
-        y_test_pred_proba = (
-            model.predict_proba(X_test)[:, 1]
-            if hasattr(model, "predict_proba")
-            else None
-        )
+    with prediction_threads(model, algorithm, n_jobs):
+        if algorithm == "xgboost":
+            y_test_pred_proba = model.inplace_predict(to_inplace_input(X_test))
+            y_test_pred = (y_test_pred_proba > 0.5).astype(int)
+        elif hasattr(model, "predict_proba"):
+            # Classes derivadas das probabilidades: uma única passada pelo modelo
+            y_test_pred_proba = model.predict_proba(X_test)[:, 1]
+            y_test_pred = model.classes_[(y_test_pred_proba > 0.5).astype(int)]
+        else:
+            y_test_pred = model.predict(X_test)
+            y_test_pred_proba = None
 
     return y_test_pred, y_test_pred_proba
@@ -1,29 +1,50 @@
 from pathlib import Path
 
+import joblib
+import pandas as pd
 import typer
 from loguru import logger
-from tqdm import tqdm
 
-from data_master_eng_ml.config import MODELS_DIR, PROCESSED_DATA_DIR
+from data_master_eng_ml.config import INTERIM_DATA_DIR, MODELS_DIR, PROCESSED_DATA_DIR
+from data_master_eng_ml.features import NON_FEATURE_COLUMNS, build_features
 
 app = typer.Typer()
 
 
+def predict_games(games: pd.DataFrame, model) -> pd.DataFrame:
+    """
+    Gera as features dos jogos com `build_features` e calcula as probabilidades.
+
+    É o mesmo caminho da API (`/predict-games`): as features de treino, da predição em
+    lote e da predição online vêm da mesma função.
+
+    Parâmetros:
+    - games: Dataset intermediário de jogos (saída de `dataset.build_games_dataset`).
+    - model: Pipeline treinado (pré-processador + modelo) com `predict_proba`.
+
+    Retorno:
+    - DataFrame com `id`, `name` e a probabilidade (`predictions`) de cada jogo.
+    """
+    features = build_features(games)
+    scores = model.predict_proba(features.drop(columns=NON_FEATURE_COLUMNS))[:, 1]
+    return pd.DataFrame({"id": features["id"], "name": features["name"], "predictions": scores})
+
+
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    features_path: Path = PROCESSED_DATA_DIR / "test_features.csv",
-    model_path: Path = MODELS_DIR / "model.pkl",
-    predictions_path: Path = PROCESSED_DATA_DIR / "test_predictions.csv",
-    # -----------------------------------------
+    input_path: Path = INTERIM_DATA_DIR / "games",
+    model_path: Path = MODELS_DIR / "model.joblib",
+    predictions_path: Path = PROCESSED_DATA_DIR / "predictions.parquet",
 ):
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
     logger.info("Performing inference for model...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Inference complete.")
-    # -----------------------------------------
+    games = pd.read_parquet(input_path)
+    predictions = predict_games(games, joblib.load(model_path))
+    predictions_path.parent.mkdir(parents=True, exist_ok=True)
+    if predictions_path.suffix == ".csv":
+        predictions.to_csv(predictions_path, index=False)
+    else:
+        predictions.to_parquet(predictions_path, index=False)
+    logger.success(f"Inference complete: {len(predictions)} linhas em {predictions_path}.")
 
 
 if __name__ == "__main__":
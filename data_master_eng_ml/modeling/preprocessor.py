@@ -1,10 +1,36 @@
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
 
+from data_master_eng_ml.config import INTERIM_DATA_DIR
+
+# Versão do formato do cache; mudar força um novo ajuste dos pré-processadores
+PREPROCESSOR_CACHE_VERSION = 1
+PREPROCESSOR_CACHE_DIR = os.getenv(
+    "PREPROCESSOR_CACHE_DIR", str(INTERIM_DATA_DIR / "preprocessor_cache")
+)
+
 
-def build_preprocessor(numerical_cols, categorical_cols):
+def build_preprocessor(numerical_cols, categorical_cols, sparse=None):
+    """
+    Monta o pré-processador (mediana + padronização e moda + one-hot).
+
+    Parâmetros:
+    - numerical_cols: Colunas numéricas.
+    - categorical_cols: Colunas categóricas.
+    - sparse: True para sempre retornar uma matriz esparsa (CSR), que o XGBoost e o
+      LightGBM recebem sem conversão; False para sempre densa; None mantém o padrão
+      do scikit-learn (esparsa apenas se a densidade for menor que 30%).
+    """
     numerical_pipeline = Pipeline(
         steps=[
             ("imputer", SimpleImputer(strategy="median")),
@@ -15,15 +41,250 @@ def build_preprocessor(numerical_cols, categorical_cols):
     categorical_pipeline = Pipeline(
         steps=[
             ("imputer", SimpleImputer(strategy="most_frequent")),
-            ("onehot", OneHotEncoder(handle_unknown="ignore")),
+            ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse is not False)),
         ]
     )
 
+    sparse_threshold = {None: 0.3, True: 1.0, False: 0.0}[sparse]
     preprocessor = ColumnTransformer(
         transformers=[
             ("num", numerical_pipeline, numerical_cols),
             ("cat", categorical_pipeline, categorical_cols),
-        ]
+        ],
+        sparse_threshold=sparse_threshold,
     )
 
     return preprocessor
+
+
+def preprocessor_cache_key(X, numerical_cols, categorical_cols, sparse=None):
+    """Hash de (dados, listas de colunas, parâmetros do pré-processador)."""
+    preprocessor = build_preprocessor(numerical_cols, categorical_cols, sparse)
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(
+        repr(
+            (
+                PREPROCESSOR_CACHE_VERSION,
+                sklearn.__version__,
+                list(X.columns),
+                list(numerical_cols),
+                list(categorical_cols),
+                sorted((key, repr(value)) for key, value in preprocessor.get_params().items()),
+            )
+        ).encode()
+    )
+    return digest.hexdigest()[:16]
+
+
+def fit_preprocessor(
+    X, numerical_cols, categorical_cols, sparse=None, cache_dir=PREPROCESSOR_CACHE_DIR
+):
+    """
+    Ajusta o `build_preprocessor` ou reaproveita um já ajustado com os mesmos dados.
+
+    Parâmetros:
+    - X: DataFrame de treino.
+    - numerical_cols: Colunas numéricas.
+    - categorical_cols: Colunas categóricas.
+    - sparse: Ver `build_preprocessor`.
+    - cache_dir: Diretório do cache (None desativa o cache).
+
+    Retorno:
+    - preprocessor: `ColumnTransformer` ajustado.
+    """
+    if cache_dir is None:
+        return build_preprocessor(numerical_cols, categorical_cols, sparse).fit(X)
+
+    key = preprocessor_cache_key(X, numerical_cols, categorical_cols, sparse)
+    path = os.path.join(cache_dir, f"preprocessor_{key}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    preprocessor = build_preprocessor(numerical_cols, categorical_cols, sparse).fit(X)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(preprocessor, tmp_path)
+    os.replace(tmp_path, path)
+    return preprocessor
+
+
+def _to_float64(values):
+    """Converte uma coluna numérica em float64; None e pd.NA viram NaN."""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except TypeError:
+        # pd.NA em colunas object não converte direto
+        return pd.array(np.asarray(values, dtype=object), dtype="Float64").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+
+
+def _is_missing(value):
+    # Para o SimpleImputer, None não é valor ausente (só NaN): no `ColumnTransformer`
+    # ele vira uma categoria desconhecida, com a linha zerada no one-hot
+    return value is not None and pd.isna(value)
+
+
+class FrozenPreprocessor:
+    """
+    Versão "congelada" de um `build_preprocessor` ajustado, em vetores NumPy.
+
+    Aplica medianas, médias, escalas e códigos das categorias pré-calculados, sem a
+    maquinaria genérica do scikit-learn a cada chamada; produz a mesma matriz que
+    `preprocessor.transform` (esparsa se a do `ColumnTransformer` também for).
+    Indicado para servir uma ou poucas linhas por vez; `check_frozen_preprocessor`
+    confere a equivalência.
+
+    Diferenças deliberadas: pd.NA (que o scikit-learn rejeita em colunas object) é
+    tratado como valor ausente, como NaN.
+
+    Parâmetros:
+    - preprocessor: `ColumnTransformer` retornado por `build_preprocessor` e ajustado.
+    """
+
+    def __init__(self, preprocessor):
+        numerical = preprocessor.named_transformers_["num"]
+        categorical = preprocessor.named_transformers_["cat"]
+        self.input_numerical_cols = list(self._columns(preprocessor, "num"))
+        self.input_categorical_cols = list(self._columns(preprocessor, "cat"))
+        self.feature_names_in_ = getattr(
+            preprocessor,
+            "feature_names_in_",
+            np.asarray(self.input_numerical_cols + self.input_categorical_cols, dtype=object),
+        )
+        self.sparse_output = bool(getattr(preprocessor, "sparse_output_", False))
+
+        # O SimpleImputer descarta colunas sem nenhum valor no treino
+        medians = numerical.named_steps["imputer"].statistics_.astype(np.float64)
+        kept = ~np.isnan(medians)
+        self.numerical_cols = [col for col, keep in zip(self.input_numerical_cols, kept) if keep]
+        self.medians = medians[kept]
+        scaler = numerical.named_steps["scaler"]
+        n_numerical = len(self.numerical_cols)
+        self.means = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_numerical)
+        self.scales = scaler.scale_ if scaler.scale_ is not None else np.ones(n_numerical)
+
+        imputer = categorical.named_steps["imputer"]
+        encoder = categorical.named_steps["onehot"]
+        # Idem para as categóricas (moda NaN): o encoder não tem categorias para elas
+        kept = [not pd.isna(mode) for mode in imputer.statistics_]
+        self.categorical_cols = [
+            col for col, keep in zip(self.input_categorical_cols, kept) if keep
+        ]
+        self.modes = [mode for mode, keep in zip(imputer.statistics_, kept) if keep]
+        # Posição de cada categoria na saída, por coluna
+        self.category_index = []
+        offset = n_numerical
+        for categories in encoder.categories_:
+            self.category_index.append(
+                {category: offset + index for index, category in enumerate(categories)}
+            )
+            offset += len(categories)
+        self.n_features = offset
+
+    @staticmethod
+    def _columns(preprocessor, name):
+        for transformer_name, _, columns in preprocessor.transformers_:
+            if transformer_name == name:
+                return columns
+        return []
+
+    def transform(self, X, dtype=np.float64):
+        """
+        Transforma um DataFrame (ou dicionário de colunas/valores) na matriz do modelo.
+
+        Parâmetros:
+        - X: DataFrame, ou dicionário coluna -> valor (uma linha) ou lista de valores.
+        - dtype: Tipo da matriz de saída.
+
+        Retorno:
+        - Matriz shape (n_linhas, n_features): CSR se o `ColumnTransformer` produz
+          matriz esparsa, senão densa C-contígua.
+        """
+        output = self._dense(X, dtype)
+        return sparse.csr_matrix(output) if self.sparse_output else output
+
+    def _dense(self, X, dtype):
+        if isinstance(X, dict):
+            X = {column: np.atleast_1d(values) for column, values in X.items()}
+            n_rows = len(next(iter(X.values())))
+        else:
+            n_rows = len(X)
+
+        output = np.zeros((n_rows, self.n_features), dtype=dtype)
+        if self.numerical_cols:
+            numerical = np.column_stack([_to_float64(X[column]) for column in self.numerical_cols])
+            numerical = np.where(np.isnan(numerical), self.medians, numerical)
+            output[:, : len(self.numerical_cols)] = (numerical - self.means) / self.scales
+
+        rows = np.arange(n_rows)
+        for column, mode, index in zip(self.categorical_cols, self.modes, self.category_index):
+            values = np.asarray(X[column], dtype=object)
+            positions = np.fromiter(
+                (index.get(mode if _is_missing(value) else value, -1) for value in values),
+                dtype=np.int64,
+                count=n_rows,
+            )
+            # Categorias desconhecidas ficam zeradas (handle_unknown="ignore")
+            known = positions >= 0
+            output[rows[known], positions[known]] = 1
+        return output
+
+    def transform_row(self, row, dtype=np.float64):
+        """Transforma uma única linha (dicionário coluna -> valor) em um vetor denso."""
+        return self._dense({column: [value] for column, value in row.items()}, dtype)[0]
+
+    def parity_sample(self, n_rows=256, random_state=0):
+        """
+        Linhas sintéticas para comparar com o `ColumnTransformer` original.
+
+        Números em torno das médias do treino, categorias conhecidas e desconhecidas e
+        valores ausentes (NaN e None), nas colunas de entrada (inclusive as descartadas).
+        """
+        rng = np.random.default_rng(random_state)
+        means = dict(zip(self.numerical_cols, self.means))
+        scales = dict(zip(self.numerical_cols, self.scales))
+        data = {}
+        for column in self.input_numerical_cols:
+            values = means.get(column, 0.0) + scales.get(column, 1.0) * rng.standard_normal(n_rows)
+            values = values.astype(object)
+            values[rng.random(n_rows) < 0.1] = np.nan
+            values[rng.random(n_rows) < 0.1] = None
+            data[column] = values
+        categories = dict(zip(self.categorical_cols, self.category_index))
+        for column in self.input_categorical_cols:
+            known = list(categories.get(column, {}))
+            unknown = ["__desconhecida__"] if all(isinstance(c, str) for c in known) else []
+            choices = np.asarray(known + unknown + [np.nan, None], dtype=object)
+            data[column] = choices[rng.integers(0, len(choices), n_rows)]
+        return pd.DataFrame(data, columns=list(self.feature_names_in_))
+
+
+def check_frozen_preprocessor(preprocessor, X, frozen=None, atol=1e-9):
+    """
+    Confere se `FrozenPreprocessor` reproduz `preprocessor.transform` em `X`.
+
+    Parâmetros:
+    - preprocessor: `ColumnTransformer` ajustado (de `build_preprocessor`).
+    - X: DataFrame de entrada, p.ex. o treino (com valores ausentes) ou `parity_sample`.
+    - frozen: `FrozenPreprocessor` a conferir (None congela `preprocessor`).
+    - atol: Maior diferença absoluta aceita.
+
+    Retorno:
+    - Maior diferença absoluta entre as duas matrizes.
+
+    Levanta AssertionError se o formato (densa/esparsa, shape) ou os valores diferirem.
+    """
+    frozen = frozen or FrozenPreprocessor(preprocessor)
+    expected, output = preprocessor.transform(X), frozen.transform(X)
+    assert sparse.issparse(expected) == sparse.issparse(output), (
+        f"Formato diferente: esparsa={sparse.issparse(output)}, "
+        f"esperado esparsa={sparse.issparse(expected)}"
+    )
+    if sparse.issparse(expected):
+        expected, output = expected.toarray(), output.toarray()
+    assert expected.shape == output.shape, f"Shape {output.shape}, esperado {expected.shape}"
+    difference = float(np.max(np.abs(expected - output), initial=0.0))
+    assert difference <= atol, f"Diferença de {difference:.2e} (> {atol:g})"
+    return difference
@@ -0,0 +1,463 @@
+"""
+Busca de hiperparâmetros em paralelo sobre `modeling.model.train_model`.
+
+Gera configurações por amostragem aleatória ou grade, distribui os trials em um pool
+de processos (cada trial limitado a `cpu_count // workers` threads, para não disputar
+núcleos) e aplica successive halving: todos os trials começam com um orçamento pequeno
+de árvores e, a cada rodada, apenas a fração `1/eta` com menor logloss segue com o
+orçamento multiplicado por `eta`. Os trials descartados recebem a tag
+`search.pruned`. Cada trial é um run do MLflow aninhado no run da busca.
+
+Sem validação cruzada, os trials são comparados pela logloss no conjunto de teste, e o
+early stopping dos boosters usa uma parte do treino (`X_es`), nunca o teste. Com
+`--cv-folds`, os trials são comparados pela logloss média da validação cruzada
+(`cross_validation.FoldCache`, com as matrizes dos folds em cache compartilhado).
+
+Uso (a partir de `data_master_eng_ml/`, como os demais módulos de `modeling`):
+    python -m modeling.search --algorithm xgboost --n-trials 32 --workers 4
+"""
+
+from contextlib import contextmanager
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import mlflow
+import numpy as np
+import pandas as pd
+import typer
+from loguru import logger
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split
+from threadpoolctl import threadpool_limits
+
+from data_master_eng_ml.config import PROCESSED_DATA_DIR
+from data_master_eng_ml.features import NON_FEATURE_COLUMNS
+from modeling.cross_validation import EARLY_STOPPING_SIZE, FoldCache
+from modeling.model import train_model
+from modeling.preprocessor import fit_preprocessor
+
+app = typer.Typer()
+
+# Parâmetros fixos de cada algoritmo
+BASE_PARAMS = {
+    "xgboost": {"objective": "binary:logistic", "eval_metric": "logloss", "seed": 42},
+    "lightgbm": {
+        "objective": "binary",
+        "metric": "binary_logloss",
+        "boosting_type": "gbdt",
+        "subsample_freq": 1,
+        "seed": 42,
+        "verbose": -1,
+    },
+    "random_forest": {"random_state": 42},
+}
+
+# Espaço de busca de cada algoritmo
+SEARCH_SPACES = {
+    "xgboost": {
+        "max_depth": [3, 4, 5, 6],
+        "learning_rate": [0.01, 0.015, 0.03, 0.05, 0.1],
+        "subsample": [0.6, 0.8, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "gamma": [0, 0.5, 1],
+        "reg_alpha": [0, 0.35, 1],
+        "reg_lambda": [0.45, 1, 2],
+    },
+    "lightgbm": {
+        "max_depth": [3, 5, 7, -1],
+        "num_leaves": [15, 31, 63],
+        "learning_rate": [0.01, 0.015, 0.03, 0.05, 0.1],
+        "subsample": [0.6, 0.8, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "reg_alpha": [0, 0.35, 1],
+        "reg_lambda": [0.45, 1, 2],
+    },
+    "random_forest": {
+        "max_depth": [5, 10, 20, None],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "max_features": ["sqrt", "log2", 0.5],
+    },
+}
+
+# Parâmetro que define o orçamento (número de árvores) de um trial
+BUDGET_PARAMS = {
+    "xgboost": "num_boost_round",
+    "lightgbm": "n_estimators",
+    "random_forest": "n_estimators",
+}
+
+# Variáveis lidas pelos runtimes de OpenMP e BLAS ao serem carregados
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Dados de treino (e folds) carregados uma vez por processo do pool
+_worker_data = {}
+_worker_cv = {}
+
+
+def split_features(features_path, test_size=0.2, random_state=42):
+    """
+    Lê as features e separa treino e teste, como nos notebooks de modelagem.
+
+    Parâmetros:
+    - features_path: Arquivo gerado por `features.py` (Parquet ou CSV).
+    - test_size: Fração do conjunto de teste.
+    - random_state: Semente da divisão.
+
+    Retorno:
+    - X_train, X_test, y_train, y_test: Divisão antes do pré-processamento.
+    - numerical_cols, categorical_cols: Colunas numéricas e categóricas.
+    """
+    features_path = Path(features_path)
+    if features_path.suffix == ".csv":
+        df = pd.read_csv(features_path)
+    else:
+        df = pd.read_parquet(features_path)
+
+    X = df.drop(columns=NON_FEATURE_COLUMNS)
+    y = df["target"].values.ravel()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    numerical_cols = X.select_dtypes(include=["int64", "float64"]).columns
+    categorical_cols = X.select_dtypes(include=["object"]).columns
+    return X_train, X_test, y_train, y_test, numerical_cols, categorical_cols
+
+
+def load_split(features_path, test_size=0.2, random_state=42, sparse=None):
+    """
+    Lê as features, separa treino e teste e aplica o `build_preprocessor`.
+
+    O pré-processador ajustado vem do cache de `fit_preprocessor` quando os dados de
+    treino e a configuração não mudaram. Uma parte estratificada do treino
+    (`EARLY_STOPPING_SIZE`) fica reservada ao early stopping (`X_es`), de modo que o
+    conjunto de teste, usado para comparar os trials, não influencia o treino.
+
+    Parâmetros:
+    - features_path: Arquivo gerado por `features.py` (Parquet ou CSV).
+    - test_size: Fração do conjunto de teste.
+    - random_state: Semente da divisão.
+    - sparse: Ver `build_preprocessor` (True mantém a matriz esparsa até o modelo).
+
+    Retorno:
+    - Dicionário com `X_train`, `y_train`, `X_es`, `y_es`, `X_test`, `y_test` e o
+      `preprocessor` ajustado (logado com o modelo, ver `train_model`).
+    """
+    X_train, X_test, y_train, y_test, numerical_cols, categorical_cols = split_features(
+        features_path, test_size, random_state
+    )
+    preprocessor = fit_preprocessor(X_train, numerical_cols, categorical_cols, sparse)
+    X_matrix = preprocessor.transform(X_train)
+    fit_rows, es_rows = train_test_split(
+        np.arange(len(y_train)),
+        test_size=EARLY_STOPPING_SIZE,
+        stratify=y_train,
+        random_state=random_state,
+    )
+    return {
+        "X_train": X_matrix[fit_rows],
+        "y_train": y_train[fit_rows],
+        "X_es": X_matrix[es_rows],
+        "y_es": y_train[es_rows],
+        "X_test": preprocessor.transform(X_test),
+        "y_test": y_test,
+        "preprocessor": preprocessor,
+    }
+
+
+def generate_candidates(algorithm, strategy="random", n_trials=20, random_state=42):
+    """Configurações candidatas (parâmetros fixos + amostra do espaço de busca)."""
+    space = SEARCH_SPACES[algorithm]
+    if strategy == "grid":
+        sampled = list(ParameterGrid(space))
+    elif strategy == "random":
+        sampled = list(ParameterSampler(space, n_iter=n_trials, random_state=random_state))
+    else:
+        raise ValueError(f"Estratégia {strategy} não suportada. Escolha entre 'random' ou 'grid'.")
+    return [{**BASE_PARAMS[algorithm], **params} for params in sampled]
+
+
+@contextmanager
+def worker_thread_limits(n_jobs):
+    """
+    Limita as threads dos processos criados dentro do bloco a `n_jobs`.
+
+    Os runtimes de OpenMP/BLAS leem as variáveis quando o NumPy, o XGBoost e o LightGBM
+    são importados, o que nos processos `spawn` acontece antes do `initializer`; por
+    isso elas são definidas no ambiente do processo pai (e restauradas ao sair).
+    """
+    previous = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update({variable: str(n_jobs) for variable in THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def _init_worker(data, tracking_uri, n_jobs, fold_cache=None):
+    """Inicializa um processo do pool: limita as threads e guarda os dados e os folds."""
+    # Garante o limite também nos pools de threads já inicializados no processo
+    threadpool_limits(limits=n_jobs)
+    mlflow.set_tracking_uri(tracking_uri)
+    _worker_data.update(data)
+    _worker_cv["fold_cache"] = fold_cache
+
+
+def _run_trial(trial):
+    """Treina um trial em um processo do pool e retorna suas métricas."""
+    train_model(
+        **_worker_data,
+        algorithm=trial["algorithm"],
+        params=trial["params"],
+        use_smote=trial["use_smote"],
+        n_jobs=trial["n_jobs"],
+        run_tags={
+            "mlflow.parentRunId": trial["parent_run_id"],
+            "search.trial": str(trial["trial"]),
+            "search.rung": str(trial["rung"]),
+        },
+        log_artifacts=False,
+        cv=_worker_cv.get("fold_cache"),
+    )
+    run = mlflow.last_active_run()
+    return {**trial, "run_id": run.info.run_id, **run.data.metrics}
+
+
+def successive_halving(run_rung, candidates, min_budget, max_budget, eta=3, metric="logloss_test"):
+    """
+    Executa successive halving sobre as configurações candidatas.
+
+    Parâmetros:
+    - run_rung: Função (candidatos, orçamento, rodada) -> lista de resultados com
+      `trial` e `metric`.
+    - candidates: Lista de (índice do trial, parâmetros).
+    - min_budget: Orçamento da primeira rodada.
+    - max_budget: Orçamento máximo (última rodada).
+    - eta: Fator de redução dos candidatos e de aumento do orçamento.
+    - metric: Métrica (menor é melhor) usada para descartar trials.
+
+    Retorno:
+    - results: Resultados de todas as rodadas.
+    - pruned: Resultados descartados em alguma rodada.
+    """
+    results, pruned = [], []
+    budget, rung = min_budget, 0
+    while True:
+        rung_results = run_rung(candidates, budget, rung)
+        results.extend(rung_results)
+        if budget >= max_budget or len(candidates) <= 1:
+            return results, pruned
+        ranked = sorted(rung_results, key=lambda result: result[metric])
+        n_keep = max(1, math.ceil(len(ranked) / eta))
+        kept_trials = {result["trial"] for result in ranked[:n_keep]}
+        pruned.extend(ranked[n_keep:])
+        candidates = [(trial, params) for trial, params in candidates if trial in kept_trials]
+        budget, rung = min(budget * eta, max_budget), rung + 1
+
+
+def run_search(
+    data,
+    algorithm="xgboost",
+    strategy="random",
+    n_trials=20,
+    workers=None,
+    min_budget=50,
+    max_budget=400,
+    eta=3,
+    halving=True,
+    use_smote=False,
+    random_state=42,
+    fold_cache=None,
+):
+    """
+    Executa a busca de hiperparâmetros e loga o melhor trial no run pai.
+
+    Parâmetros:
+    - data: Dicionário com `X_train`, `y_train`, `X_test`, `y_test` e, opcionalmente,
+      `X_es`, `y_es` e `preprocessor` (ver `load_split`).
+    - algorithm: Algoritmo ('xgboost', 'random_forest', 'lightgbm').
+    - strategy: 'random' ou 'grid'.
+    - n_trials: Número de configurações amostradas (estratégia 'random').
+    - workers: Processos simultâneos (None usa todos os núcleos).
+    - min_budget, max_budget, eta: Parâmetros do successive halving (número de árvores).
+    - halving: Se False, todos os trials usam `max_budget`.
+    - use_smote: Se True, aplica SMOTE em cada trial.
+    - random_state: Semente da amostragem.
+    - fold_cache: `FoldCache` para avaliar os trials por validação cruzada (opcional).
+
+    Retorno:
+    - best: Resultado do melhor trial na última rodada (parâmetros, run_id e métricas).
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    n_jobs = max(1, cpu_count // workers)
+    candidates = list(enumerate(generate_candidates(algorithm, strategy, n_trials, random_state)))
+    budget_param = BUDGET_PARAMS[algorithm]
+    metric = "logloss_cv_mean" if fold_cache is not None else "logloss_test"
+    experiment_name = f"{algorithm}_model{'_with_smote' if use_smote else ''}"
+    mlflow.set_experiment(experiment_name)
+
+    with mlflow.start_run(run_name=f"{experiment_name}_search") as parent_run:
+        mlflow.log_params(
+            {
+                "search.strategy": strategy,
+                "search.n_candidates": len(candidates),
+                "search.workers": workers,
+                "search.threads_per_trial": n_jobs,
+                "search.min_budget": min_budget if halving else max_budget,
+                "search.max_budget": max_budget,
+                "search.eta": eta,
+                "search.metric": metric,
+            }
+        )
+        logger.info(
+            f"{len(candidates)} trials de {algorithm} em {workers} processos "
+            f"({n_jobs} thread(s) por trial)."
+        )
+
+        with (
+            worker_thread_limits(n_jobs),
+            ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(data, mlflow.get_tracking_uri(), n_jobs, fold_cache),
+            ) as executor,
+        ):
+
+            def run_rung(rung_candidates, budget, rung):
+                logger.info(f"Rodada {rung}: {len(rung_candidates)} trials com {budget} árvores.")
+                trials = [
+                    {
+                        "trial": trial,
+                        "rung": rung,
+                        "algorithm": algorithm,
+                        "params": {**params, budget_param: budget},
+                        "use_smote": use_smote,
+                        "n_jobs": n_jobs,
+                        "parent_run_id": parent_run.info.run_id,
+                    }
+                    for trial, params in rung_candidates
+                ]
+                return list(executor.map(_run_trial, trials))
+
+            if halving:
+                results, pruned = successive_halving(
+                    run_rung, candidates, min_budget, max_budget, eta, metric
+                )
+            else:
+                results, pruned = run_rung(candidates, max_budget, 0), []
+
+        client = mlflow.MlflowClient()
+        for result in pruned:
+            client.set_tag(result["run_id"], "search.pruned", "true")
+
+        last_rung = max(result["rung"] for result in results)
+        best = min(
+            (result for result in results if result["rung"] == last_rung),
+            key=lambda result: result[metric],
+        )
+        mlflow.set_tag("search.best_run_id", best["run_id"])
+        mlflow.log_params({f"best.{key}": value for key, value in best["params"].items()})
+        mlflow.log_metrics(
+            {
+                key: best[key]
+                for key in (
+                    "logloss_test",
+                    "roc_auc_test",
+                    "roc_auc_train",
+                    "accuracy_test",
+                    "logloss_cv_mean",
+                    "roc_auc_cv_mean",
+                    "roc_auc_cv_std",
+                )
+                if key in best
+            }
+        )
+
+        # Tabela com todos os trials, para comparação no MLflow
+        trials_table = pd.DataFrame(
+            [
+                {
+                    "trial": result["trial"],
+                    "rung": result["rung"],
+                    "run_id": result["run_id"],
+                    "logloss_test": result.get("logloss_test"),
+                    "roc_auc_test": result.get("roc_auc_test"),
+                    "logloss_cv_mean": result.get("logloss_cv_mean"),
+                    "roc_auc_cv_mean": result.get("roc_auc_cv_mean"),
+                    **result["params"],
+                }
+                for result in results
+            ]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trials_path = os.path.join(tmp_dir, "search_trials.csv")
+            trials_table.to_csv(trials_path, index=False)
+            mlflow.log_artifact(trials_path)
+
+    logger.success(
+        f"Melhor trial: {best['trial']} (run {best['run_id']}), "
+        f"{metric}={best[metric]:.4f}, roc_auc_test={best.get('roc_auc_test')}."
+    )
+    return best
+
+
+@app.command()
+def main(
+    features_path: Path = PROCESSED_DATA_DIR / "features.parquet",
+    algorithm: str = typer.Option("xgboost", help="xgboost, lightgbm ou random_forest."),
+    strategy: str = typer.Option("random", help="random ou grid."),
+    n_trials: int = typer.Option(27, help="Configurações amostradas (estratégia random)."),
+    workers: int = typer.Option(0, help="Processos simultâneos (0 usa todos os núcleos)."),
+    min_budget: int = typer.Option(50, help="Árvores na primeira rodada do halving."),
+    max_budget: int = typer.Option(400, help="Árvores na última rodada."),
+    eta: int = typer.Option(3, help="Fator de redução do successive halving."),
+    halving: bool = typer.Option(True, help="Aplica successive halving."),
+    use_smote: bool = False,
+    cv_folds: int = typer.Option(0, help="Folds da validação cruzada (0 desativa)."),
+    sparse: bool = typer.Option(False, help="Mantém as features em matriz esparsa (CSR)."),
+    test_size: float = 0.2,
+    random_state: int = 42,
+):
+    data = load_split(features_path, test_size, random_state, sparse or None)
+    fold_cache = None
+    if cv_folds:
+        # Folds sobre o conjunto de treino, pré-processados uma única vez antes de
+        # iniciar o pool; os processos recebem as matrizes prontas
+        X_train, _, y_train, _, numerical_cols, categorical_cols = split_features(
+            features_path, test_size, random_state
+        )
+        fold_cache = FoldCache(
+            X_train,
+            y_train,
+            numerical_cols,
+            categorical_cols,
+            cv_folds,
+            random_state,
+            sparse=sparse or None,
+        ).prepare(use_smote)
+    run_search(
+        data,
+        algorithm=algorithm,
+        strategy=strategy,
+        n_trials=n_trials,
+        workers=workers or None,
+        min_budget=min_budget,
+        max_budget=max_budget,
+        eta=eta,
+        halving=halving,
+        use_smote=use_smote,
+        random_state=random_state,
+        fold_cache=fold_cache,
+    )
+
+
+if __name__ == "__main__":
+    app()
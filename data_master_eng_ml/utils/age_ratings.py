@@ -0,0 +1,99 @@
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from .mappings import URL_TWITCH_BASE, age_rating_mapping
+from .twitch_api import build_query, fetch_data_with_pagination
+
+# Ordem dos grupos etários, do menos para o mais restritivo
+age_order = pd.CategoricalDtype(
+    categories=[
+        "Rating Pending",
+        "All Ages",
+        "3+",
+        "6+",
+        "10+",
+        "12+",
+        "14+",
+        "15+",
+        "16+",
+        "18+",
+    ],
+    ordered=True,
+)
+
+# Valor atribuído aos jogos sem nenhuma classificação etária conhecida
+NO_RATING = "No Rating"
+
+# Quantidade de IDs por consulta `id = (...)`; a API retorna até 500 registros por página
+AGE_RATINGS_CHUNK_SIZE = 500
+
+
+def fetch_age_ratings(
+    age_rating_ids: Iterable[int],
+    chunk_size: int = AGE_RATINGS_CHUNK_SIZE,
+    concurrency: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Busca em lote as classificações etárias a partir de seus IDs.
+
+    Args:
+        age_rating_ids (Iterable[int]): IDs do endpoint `age_ratings`.
+        chunk_size (int): Número máximo de IDs por consulta.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas; None usa
+            o orçamento do limitador (`twitch_api.default_concurrency`).
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas `id` e `rating`.
+    """
+    ids = sorted({int(age_rating_id) for age_rating_id in age_rating_ids})
+    if not ids:
+        return pd.DataFrame(columns=["id", "rating"])
+    filters = {"id": f"= ({','.join(map(str, ids))})"}
+    return fetch_data_with_pagination(
+        f"{URL_TWITCH_BASE}/age_ratings",
+        build_query,
+        ["rating"],
+        filters,
+        max_filter_options=chunk_size,
+        concurrency=concurrency,
+    )
+
+
+def most_restrictive_age_rating(age_ratings: pd.Series, ratings: pd.DataFrame) -> pd.Series:
+    """
+    Calcula o grupo etário mais restritivo de cada jogo.
+
+    Args:
+        age_ratings (pd.Series): Lista de IDs de `age_ratings` de cada jogo.
+        ratings (pd.DataFrame): Resultado de `fetch_age_ratings` (colunas `id` e `rating`).
+
+    Returns:
+        pd.Series: Grupo etário de cada jogo, com o mesmo índice de `age_ratings`;
+        jogos sem classificação recebem `NO_RATING`.
+    """
+    exploded = age_ratings.explode().dropna().astype(int)
+    rating_by_id = ratings.set_index("id")["rating"]
+    groups = exploded.map(rating_by_id).map(age_rating_mapping).astype(age_order)
+    max_group = groups.groupby(level=0).max()
+    return max_group.reindex(age_ratings.index).astype(object).fillna(NO_RATING)
+
+
+def resolve_age_classif(age_ratings: pd.Series, concurrency: Optional[int] = None) -> pd.Series:
+    """
+    Resolve a coluna `age_classif` de todos os jogos com poucas requisições.
+
+    Substitui a chamada de `/age_ratings` por jogo: todos os IDs do DataFrame são
+    coletados, buscados em lote e agregados com um groupby vetorizado.
+
+    Args:
+        age_ratings (pd.Series): Coluna `age_ratings` do DataFrame de jogos.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas; None usa
+            o orçamento do limitador.
+
+    Returns:
+        pd.Series: Grupo etário mais restritivo de cada jogo.
+    """
+    ids = age_ratings.explode().dropna().unique()
+    ratings = fetch_age_ratings(ids, concurrency=concurrency)
+    return most_restrictive_age_rating(age_ratings, ratings)
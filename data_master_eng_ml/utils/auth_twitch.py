@@ -1,9 +1,17 @@
+import json
 import os
+import random
+import threading
 import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from typing import Dict, Optional
 
+from .rate_limiter import RateLimiter, RequestStats
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -12,55 +20,237 @@ TWITCH_ID = os.getenv("TWITCH_ID")
 TWITCH_SECRET = os.getenv("TWITCH_SECRET")
 URL_TOKEN = "https://id.twitch.tv/oauth2/token"
 
-# Variáveis globais para armazenar o token e seu tempo de expiração
-token_data: Optional[Dict] = None
-token_expiration_time: float = 0
+# Arquivo opcional para reaproveitar o token entre execuções curtas (ex.: CLI)
+TWITCH_TOKEN_CACHE = os.getenv("TWITCH_TOKEN_CACHE")
+# Antecedência (em segundos) com que o token é renovado antes de expirar
+TOKEN_REFRESH_MARGIN = float(os.getenv("TWITCH_TOKEN_REFRESH_MARGIN", 300))
+
+# Limites da API do IGDB: ~4 requisições por segundo e até 8 requisições abertas
+IGDB_REQUESTS_PER_SECOND = float(os.getenv("IGDB_REQUESTS_PER_SECOND", 4))
+IGDB_MAX_IN_FLIGHT = int(os.getenv("IGDB_MAX_IN_FLIGHT", 8))
+
+# Política de retentativa para throttling (429) e erros do servidor (5xx)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("IGDB_MAX_RETRIES", 5))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Limitador e contadores compartilhados por todos os chamadores do módulo
+request_stats = RequestStats()
+rate_limiter = RateLimiter(
+    rate=IGDB_REQUESTS_PER_SECOND,
+    capacity=max(1, int(IGDB_REQUESTS_PER_SECOND)),
+    max_in_flight=IGDB_MAX_IN_FLIGHT,
+    stats=request_stats,
+)
+
+
+def retry_delay(response: Optional[requests.Response], attempt: int) -> float:
+    """
+    Calcula o tempo de espera antes de uma nova tentativa.
+
+    Usa o header `Retry-After` quando presente; caso contrário aplica backoff
+    exponencial com jitter completo.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+class TwitchClient:
+    """
+    Cliente HTTP autenticado para a API do IGDB.
+
+    Mantém uma sessão com pool de conexões keep-alive dimensionado para uso
+    concorrente e um token compartilhado entre threads: a renovação acontece uma
+    única vez por vez (protegida por lock), com antecedência de `refresh_margin`
+    segundos antes da expiração, e pode ser persistida em `token_cache_path`.
+    """
+
+    def __init__(
+        self,
+        client_id: Optional[str] = TWITCH_ID,
+        client_secret: Optional[str] = TWITCH_SECRET,
+        token_cache_path: Optional[str] = TWITCH_TOKEN_CACHE,
+        pool_size: int = IGDB_MAX_IN_FLIGHT,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        limiter: RateLimiter = rate_limiter,
+    ) -> None:
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_cache_path = Path(token_cache_path) if token_cache_path else None
+        self.refresh_margin = refresh_margin
+        self.limiter = limiter
+        self.stats = limiter.stats
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.token_data: Optional[Dict] = None
+        self.token_expiration_time: float = 0
+        self._token_lock = threading.Lock()
+        self._load_cached_token()
+
+    def _load_cached_token(self) -> None:
+        """Carrega o token do cache em disco, se existir e ainda for válido."""
+        if self.token_cache_path is None or not self.token_cache_path.exists():
+            return
+        try:
+            cached = json.loads(self.token_cache_path.read_text())
+        except (OSError, ValueError):
+            return
+        if cached.get("client_id") == self.client_id and "access_token" in cached:
+            self.token_data = cached
+            self.token_expiration_time = float(cached.get("expires_at", 0))
+
+    def _save_cached_token(self) -> None:
+        """Grava o token atual no cache em disco com permissão restrita ao usuário."""
+        if self.token_cache_path is None:
+            return
+        cached = {
+            **self.token_data,
+            "client_id": self.client_id,
+            "expires_at": self.token_expiration_time,
+        }
+        try:
+            self.token_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.token_cache_path.with_suffix(".tmp")
+            # Criado já com 0600, para o token nunca ficar legível por outros usuários. Um
+            # .tmp antigo manteria o modo anterior, por isso é removido e recriado
+            tmp_path.unlink(missing_ok=True)
+            descriptor = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descriptor, "w") as file:
+                file.write(json.dumps(cached))
+            os.replace(tmp_path, self.token_cache_path)
+        except OSError as e:
+            print(f"Não foi possível gravar o cache do token: {e}")
+
+    def get_token(self) -> None:
+        """Obtém um novo token do Twitch e atualiza o tempo de expiração."""
+        try:
+            token_response = self.session.post(
+                url=URL_TOKEN,
+                params={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "grant_type": "client_credentials",
+                },
+            )
+
+            if token_response.status_code == 200:
+                self.token_data = token_response.json()
+                self.token_expiration_time = time.time() + self.token_data["expires_in"]
+                self._save_cached_token()
+                print("Novo token obtido com sucesso.")
+            else:
+                print(
+                    f"Erro ao obter o token: {token_response.status_code} - {token_response.text}"
+                )
+                token_response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Ocorreu um erro na requisição: {e}")
+
+    def is_token_expired(self) -> bool:
+        """Verifica se o token expirou ou está dentro da margem de renovação."""
+        return time.time() >= self.token_expiration_time - self.refresh_margin
+
+    def refresh_token(self, stale_token: Optional[str] = None) -> None:
+        """
+        Renova o token uma única vez, mesmo com várias threads pedindo ao mesmo tempo.
+
+        Se `stale_token` for informado, o token só é renovado caso ainda seja o atual,
+        ou seja, caso nenhuma outra thread já o tenha substituído.
+        """
+        with self._token_lock:
+            current = self.token_data["access_token"] if self.token_data else None
+            if stale_token is not None and current != stale_token:
+                return
+            if stale_token is None and current is not None and not self.is_token_expired():
+                return
+            print("Token expirado, inválido ou inexistente. Obtendo um novo...")
+            self.get_token()
+
+    def get_valid_token(self) -> str:
+        """Retorna um token válido, obtendo um novo se o atual estiver expirando."""
+        if self.token_data is None or self.is_token_expired():
+            self.refresh_token()
+        return self.token_data["access_token"]
+
+    def send_request(self, url: str, data: Dict, token: str) -> requests.Response:
+        """Envia uma requisição autenticada respeitando o limitador de taxa."""
+        headers = {"Authorization": f"Bearer {token}", "Client-Id": self.client_id}
+        with self.limiter:
+            return self.session.post(url, headers=headers, data=data)
+
+    def make_authenticated_request(self, url: str, data: Dict) -> requests.Response:
+        """
+        Faz uma requisição autenticada usando o token válido.
+
+        Respostas 429 e 5xx, assim como falhas de conexão, são repetidas até
+        `MAX_RETRIES` vezes com backoff exponencial. Se as tentativas se esgotarem, a
+        última resposta é retornada (ou a exceção é propagada).
+        """
+        attempt = 0
+        while True:
+            try:
+                token = self.get_valid_token()
+                response = self.send_request(url, data, token)
+                if (
+                    response.status_code == 401
+                ):  # Unauthorized, o token pode ter expirado ou ser inválido
+                    self.refresh_token(stale_token=token)
+                    response = self.send_request(url, data, self.get_valid_token())
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                response, error = None, e
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+                    return response
+                error = f"{response.status_code} - {response.text}"
+                if response.status_code == 429:
+                    self.stats.add(throttles=1)
+
+            delay = retry_delay(response, attempt)
+            self.stats.add(retries=1, backoff_wait=delay)
+            print(f"Erro na requisição ({error}), nova tentativa em {delay:.2f}s...")
+            time.sleep(delay)
+            attempt += 1
+
+
+# Cliente compartilhado usado pelas funções do módulo
+default_client = TwitchClient()
 
 
 def get_token() -> None:
     """Obtém um novo token do Twitch e atualiza o tempo de expiração."""
-    global token_data, token_expiration_time
-    try:
-        token_response = requests.post(
-            url=f"{URL_TOKEN}?client_id={TWITCH_ID}&client_secret={TWITCH_SECRET}&grant_type=client_credentials"
-        )
-
-        if token_response.status_code == 200:
-            token_data = token_response.json()
-            token_expiration_time = time.time() + token_data["expires_in"]
-            print("Novo token obtido com sucesso:", token_data)
-        else:
-            print(
-                f"Erro ao obter o token: {token_response.status_code} - {token_response.text}"
-            )
-            token_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Ocorreu um erro na requisição: {e}")
+    default_client.get_token()
 
 
 def is_token_expired() -> bool:
     """Verifica se o token expirou."""
-    return time.time() >= token_expiration_time
+    return default_client.is_token_expired()
 
 
 def get_valid_token() -> str:
     """Retorna um token válido, obtendo um novo se o atual tiver expirado."""
-    if token_data is None or is_token_expired():
-        print("Token expirado ou inexistente. Obtendo um novo...")
-        get_token()
-    return token_data["access_token"]
+    return default_client.get_valid_token()
+
+
+def get_request_stats() -> Dict[str, float]:
+    """Retorna os contadores de requisições, retentativas, throttling e tempo de espera."""
+    return request_stats.snapshot()
 
 
 def make_authenticated_request(url: str, data: Dict) -> requests.Response:
-    """Faz uma requisição autenticada usando o token válido."""
-    token = get_valid_token()
-    headers = {"Authorization": f"Bearer {token}", "Client-Id": TWITCH_ID}
-    response = requests.post(url, headers=headers, data=data)
-    if (
-        response.status_code == 401
-    ):  # Unauthorized, o token pode ter expirado ou ser inválido
-        print("Token inválido, obtendo um novo token...")
-        get_token()
-        headers["Authorization"] = f"Bearer {get_valid_token()}"
-        response = requests.post(url, headers=headers, data=data)
-    return response
+    """Faz uma requisição autenticada usando o cliente compartilhado."""
+    return default_client.make_authenticated_request(url, data)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+import pycountry
+import pycountry_convert as pc
+
+from data_master_eng_ml.config import EXTERNAL_DATA_DIR
+
+from .mappings import plataform_mapping
+
+# Versão do formato das tabelas; mudar força a reconstrução do cache
+LOOKUP_TABLES_VERSION = 1
+LOOKUP_TABLES_PATH = os.getenv("LOOKUP_TABLES_PATH", str(EXTERNAL_DATA_DIR / "lookup_tables.npz"))
+
+UNKNOWN_CONTINENT = "Unknown"
+UNKNOWN_PLATFORM = "unknown_platforms_name"
+
+# Códigos numéricos ISO 3166 vão de 000 a 999
+ISO_NUMERIC_SIZE = 1000
+
+# Índice 0 é sempre o valor desconhecido
+CONTINENT_NAMES = np.array(
+    [
+        UNKNOWN_CONTINENT,
+        "Africa",
+        "Antarctica",
+        "Asia",
+        "Europe",
+        "North America",
+        "Oceania",
+        "South America",
+    ],
+    dtype=object,
+)
+# Grupos de plataforma em ordem alfabética (a mesma das colunas multi-hot)
+PLATFORM_GROUPS = np.array(
+    sorted(set(plataform_mapping.values()) | {UNKNOWN_PLATFORM}), dtype=object
+)
+
+_tables: Dict[str, np.ndarray] = {}
+_tables_lock = threading.Lock()
+
+
+def _signature() -> str:
+    """Identifica o conteúdo das tabelas para invalidar o cache em disco."""
+    content = json.dumps(
+        {
+            "version": LOOKUP_TABLES_VERSION,
+            "platforms": sorted(plataform_mapping.items()),
+            "continents": CONTINENT_NAMES.tolist(),
+        }
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def build_country_continent_table() -> np.ndarray:
+    """
+    Monta a tabela código numérico ISO do país -> índice em `CONTINENT_NAMES`.
+
+    Returns:
+        np.ndarray: Vetor int8 de tamanho `ISO_NUMERIC_SIZE`; códigos desconhecidos
+        apontam para `Unknown` (0).
+    """
+    continent_index = {name: index for index, name in enumerate(CONTINENT_NAMES)}
+    table = np.zeros(ISO_NUMERIC_SIZE, dtype=np.int8)
+    for country in pycountry.countries:
+        try:
+            continent_code = pc.country_alpha2_to_continent_code(country.alpha_2)
+            continent = pc.convert_continent_code_to_continent_name(continent_code)
+        except KeyError:
+            continue
+        table[int(country.numeric)] = continent_index.get(continent, 0)
+    return table
+
+
+def build_platform_group_table() -> np.ndarray:
+    """
+    Monta a tabela ID da plataforma -> índice em `PLATFORM_GROUPS`.
+
+    Returns:
+        np.ndarray: Vetor int8 indexado pelo ID da plataforma; IDs sem grupo apontam
+        para `unknown_platforms_name`.
+    """
+    group_index = {name: index for index, name in enumerate(PLATFORM_GROUPS)}
+    table = np.full(max(plataform_mapping) + 1, group_index[UNKNOWN_PLATFORM], dtype=np.int8)
+    for platform_id, group in plataform_mapping.items():
+        table[platform_id] = group_index[group]
+    return table
+
+
+def load_lookup_tables(path: str = LOOKUP_TABLES_PATH) -> Dict[str, np.ndarray]:
+    """
+    Retorna as tabelas de consulta, montando-as apenas uma vez.
+
+    As tabelas ficam em memória e em um arquivo `.npz`, reconstruído quando o
+    mapeamento de plataformas ou a versão do formato mudam.
+
+    Args:
+        path (str): Caminho do arquivo de cache.
+
+    Returns:
+        Dict[str, np.ndarray]: Tabelas `country_continent` e `platform_group`.
+    """
+    with _tables_lock:
+        if _tables:
+            return _tables
+
+        signature = _signature()
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                if str(cached["signature"]) == signature:
+                    _tables.update(
+                        country_continent=cached["country_continent"],
+                        platform_group=cached["platform_group"],
+                    )
+                    return _tables
+
+        _tables.update(
+            country_continent=build_country_continent_table(),
+            platform_group=build_platform_group_table(),
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, signature=np.array(signature), **_tables)
+        os.replace(tmp_path, path)
+        return _tables
+
+
+def _lookup(table: np.ndarray, keys: np.ndarray, unknown: int) -> np.ndarray:
+    """Consulta `table` por chaves inteiras; ausentes ou fora do intervalo viram `unknown`."""
+    keys = np.asarray(keys, dtype=np.float64)
+    valid = (keys >= 0) & (keys < len(table))
+    indices = np.where(valid, keys, 0).astype(np.intp)
+    return np.where(valid, np.take(table, indices), unknown)
+
+
+def continent_codes(country_codes) -> np.ndarray:
+    """Índices em `CONTINENT_NAMES` para uma coluna de códigos numéricos de países."""
+    return _lookup(load_lookup_tables()["country_continent"], country_codes, 0)
+
+
+def continent_names(country_codes) -> np.ndarray:
+    """Nomes dos continentes para uma coluna de códigos numéricos de países."""
+    return np.take(CONTINENT_NAMES, continent_codes(country_codes))
+
+
+def platform_group_codes(platform_ids) -> np.ndarray:
+    """Índices em `PLATFORM_GROUPS` para uma coluna de IDs de plataforma."""
+    unknown = int(np.flatnonzero(PLATFORM_GROUPS == UNKNOWN_PLATFORM)[0])
+    return _lookup(load_lookup_tables()["platform_group"], platform_ids, unknown)
@@ -1,9 +1,33 @@
+import json
+import os
+import threading
+import time
+from typing import Dict
+
 import requests
-from .twitch_api import fetch_data_with_pagination, build_query
+from .twitch_api import build_query, default_concurrency, fetch_data_with_pagination
+
+from data_master_eng_ml.config import MODELS_DIR
 
 # Definindo a URL base da API
 URL_TWITCH_BASE = "https://api.igdb.com/v4"
 
+# Snapshot local dos mapeamentos obtidos via API, distribuído junto com o modelo
+MAPPINGS_SNAPSHOT_VERSION = 1
+MAPPINGS_SNAPSHOT_PATH = os.getenv(
+    "IGDB_MAPPINGS_SNAPSHOT", str(MODELS_DIR / "igdb_mappings.json")
+)
+
+# Nome do mapeamento -> endpoint da API de onde ele é obtido
+API_MAPPINGS = {
+    "player_perspectives_mapping": "player_perspectives",
+    "genres_mapping": "genres",
+    "game_modes_mapping": "game_modes",
+}
+
+_api_mappings: Dict[str, dict] = {}
+_api_mappings_lock = threading.Lock()
+
 
 # Função para obter mapeamentos de uma API com base em um endpoint e campos específicos
 def get_mapping_from_api(endpoint: str, fields: list) -> dict:
@@ -18,14 +42,97 @@ def get_mapping_from_api(endpoint: str, fields: list) -> dict:
         dict: Um dicionário com o mapeamento de IDs para nomes.
     """
     url = f"{URL_TWITCH_BASE}/{endpoint}"
-    data_frame = fetch_data_with_pagination(url, build_query, fields)
+    data_frame = fetch_data_with_pagination(
+        url, build_query, fields, concurrency=default_concurrency()
+    )
     return data_frame.set_index("id")["slug"].to_dict()
 
 
-# Mapeamentos obtidos via API
-player_perspectives_mapping = get_mapping_from_api("player_perspectives", ["slug"])
-genres_mapping = get_mapping_from_api("genres", ["slug"])
-game_modes_mapping = get_mapping_from_api("game_modes", ["slug"])
+def read_mappings_snapshot(path: str = MAPPINGS_SNAPSHOT_PATH) -> Dict[str, dict]:
+    """
+    Lê o snapshot local dos mapeamentos.
+
+    Args:
+        path (str): Caminho do arquivo de snapshot.
+
+    Returns:
+        Dict[str, dict]: Mapeamentos por nome, ou um dicionário vazio se o arquivo não
+        existir ou for de outra versão.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        snapshot = json.load(file)
+    if snapshot.get("version") != MAPPINGS_SNAPSHOT_VERSION:
+        return {}
+    # JSON só aceita chaves texto; os IDs da API são inteiros
+    return {
+        name: {int(key): value for key, value in mapping.items()}
+        for name, mapping in snapshot["mappings"].items()
+    }
+
+
+def write_mappings_snapshot(mappings: Dict[str, dict], path: str = MAPPINGS_SNAPSHOT_PATH) -> None:
+    """
+    Grava o snapshot local dos mapeamentos de forma atômica.
+
+    Args:
+        mappings (Dict[str, dict]): Mapeamentos por nome.
+        path (str): Caminho do arquivo de snapshot.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {
+        "version": MAPPINGS_SNAPSHOT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "mappings": mappings,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(snapshot, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_mappings(refresh: bool = False) -> Dict[str, dict]:
+    """
+    Retorna os mapeamentos obtidos via API, resolvendo-os apenas no primeiro acesso.
+
+    A ordem de busca é: memória do processo, snapshot local e, por fim, a API (que
+    também atualiza o snapshot).
+
+    Args:
+        refresh (bool): Se True, ignora memória e snapshot e consulta a API novamente.
+
+    Returns:
+        Dict[str, dict]: Mapeamentos por nome (ex.: `genres_mapping`).
+    """
+    with _api_mappings_lock:
+        if _api_mappings and not refresh:
+            return _api_mappings
+
+        mappings = {} if refresh else read_mappings_snapshot()
+        if set(mappings) != set(API_MAPPINGS):
+            mappings = {
+                name: get_mapping_from_api(endpoint, ["slug"])
+                for name, endpoint in API_MAPPINGS.items()
+            }
+            write_mappings_snapshot(mappings)
+
+        _api_mappings.clear()
+        _api_mappings.update(mappings)
+        return _api_mappings
+
+
+def refresh_mappings() -> Dict[str, dict]:
+    """Consulta a API novamente e atualiza a memória e o snapshot local."""
+    return load_mappings(refresh=True)
+
+
+def __getattr__(name: str) -> dict:
+    """Resolve os mapeamentos obtidos via API (ex.: `genres_mapping`) sob demanda."""
+    if name in API_MAPPINGS:
+        return load_mappings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 region_mapping_inverted = {
     1: "europe",
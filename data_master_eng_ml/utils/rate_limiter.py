@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RequestStats:
+    """Contadores de requisições compartilhados entre threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Zera todos os contadores."""
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.throttles = 0
+            self.rate_limit_wait = 0.0
+            self.backoff_wait = 0.0
+
+    def add(self, **increments: float) -> None:
+        """Incrementa os contadores informados (ex.: `add(retries=1, backoff_wait=0.5)`)."""
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Retorna uma cópia dos contadores atuais."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttles": self.throttles,
+                "rate_limit_wait": self.rate_limit_wait,
+                "backoff_wait": self.backoff_wait,
+            }
+
+
+class RateLimiter:
+    """
+    Token bucket com limite de requisições simultâneas.
+
+    Cada requisição consome um token; os tokens são repostos a `rate` por segundo até
+    `capacity`. Além disso, no máximo `max_in_flight` requisições ficam abertas ao mesmo
+    tempo. Pode ser usado como context manager em volta da chamada HTTP.
+    """
+
+    def __init__(
+        self, rate: float, capacity: int, max_in_flight: int, stats: Optional[RequestStats] = None
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.max_in_flight = max_in_flight
+        self.stats = stats or RequestStats()
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def _take_token(self) -> float:
+        """Consome um token e retorna quanto tempo é preciso esperar por ele."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # O token é reservado mesmo que ainda não exista; quem chega depois espera mais
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """Bloqueia até a requisição poder ser feita e retorna o tempo esperado."""
+        started_at = time.monotonic()
+        delay = self._take_token()
+        if delay > 0:
+            time.sleep(delay)
+        self._in_flight.acquire()
+        waited = time.monotonic() - started_at
+        self.stats.add(requests=1, rate_limit_wait=waited)
+        return waited
+
+    def release(self) -> None:
+        """Libera a vaga de requisição simultânea."""
+        self._in_flight.release()
+
+    def __enter__(self) -> "RateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
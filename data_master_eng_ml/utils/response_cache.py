@@ -0,0 +1,257 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from data_master_eng_ml.config import INTERIM_DATA_DIR
+
+# Configuração padrão do cache, sobrescrevível por variáveis de ambiente
+IGDB_CACHE_PATH = os.getenv("IGDB_CACHE_PATH", str(INTERIM_DATA_DIR / "igdb_cache.sqlite"))
+IGDB_CACHE_ENABLED = os.getenv("IGDB_CACHE_ENABLED", "1") == "1"
+IGDB_CACHE_MAX_BYTES = int(os.getenv("IGDB_CACHE_MAX_BYTES", 512 * 1024**2))
+IGDB_CACHE_MAX_ENTRIES = int(os.getenv("IGDB_CACHE_MAX_ENTRIES", 200_000))
+# Os limites são verificados a cada N gravações, e não a cada gravação
+IGDB_CACHE_EVICT_EVERY = int(os.getenv("IGDB_CACHE_EVICT_EVERY", 100))
+# Uma leitura só regrava `accessed_at` se o valor gravado tiver mais de N segundos
+IGDB_CACHE_ACCESS_RESOLUTION = float(os.getenv("IGDB_CACHE_ACCESS_RESOLUTION", 60))
+IGDB_OFFLINE = os.getenv("IGDB_OFFLINE", "0") == "1"
+
+# TTL (em segundos) por endpoint; tabelas de domínio mudam raramente
+DAY = 24 * 60 * 60
+DEFAULT_TTL = 1 * DAY
+ENDPOINT_TTLS = {
+    "genres": 30 * DAY,
+    "game_modes": 30 * DAY,
+    "player_perspectives": 30 * DAY,
+    "platforms": 30 * DAY,
+    "age_ratings": 30 * DAY,
+    "companies": 7 * DAY,
+    "involved_companies": 7 * DAY,
+    "multiplayer_modes": 7 * DAY,
+    "games": 1 * DAY,
+    "release_dates": 1 * DAY,
+}
+
+
+class CacheMissError(LookupError):
+    """Consulta não encontrada no cache enquanto o modo offline está ativo."""
+
+
+def endpoint_from_url(url: str) -> str:
+    """Extrai o nome do endpoint (ex.: `games`) da URL da API."""
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def cache_key(url: str, query: str) -> str:
+    """Chave do cache: hash do endpoint e da query gerada por `build_query`."""
+    return hashlib.sha256(f"{url}\n{query}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache persistente (SQLite) das páginas retornadas pela API do IGDB.
+
+    Cada página é indexada pelo hash de (URL, query) e expira de acordo com o TTL do
+    endpoint. O cache é limitado a `max_entries` páginas e `max_bytes` (LRU): a cada
+    `evict_every` gravações, as entradas expiradas são removidas e, se algum limite
+    ainda for excedido, as lidas há mais tempo também (consultas pelo índice de
+    `accessed_at`, sem percorrer a tabela a cada gravação). Cada leitura atualiza
+    `accessed_at`, no máximo uma vez a cada `access_resolution` segundos por página,
+    para não transformar toda leitura em escrita. No modo offline nenhuma
+    requisição deve ser feita: entradas expiradas continuam válidas e uma ausência gera
+    `CacheMissError`. No modo `refresh` as páginas em cache são ignoradas, mas as
+    respostas novas continuam sendo gravadas (ex.: extração completa).
+    """
+
+    def __init__(
+        self,
+        path: str = IGDB_CACHE_PATH,
+        enabled: bool = IGDB_CACHE_ENABLED,
+        max_bytes: int = IGDB_CACHE_MAX_BYTES,
+        offline: bool = IGDB_OFFLINE,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = IGDB_CACHE_MAX_ENTRIES,
+        evict_every: int = IGDB_CACHE_EVICT_EVERY,
+        refresh: bool = False,
+        access_resolution: float = IGDB_CACHE_ACCESS_RESOLUTION,
+    ) -> None:
+        self.path = Path(path)
+        self.enabled = enabled
+        self.refresh = refresh
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.access_resolution = access_resolution
+        self.offline = offline
+        self.ttls = {**ENDPOINT_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Abre o banco na primeira utilização."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    total_count INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            # A expiração usa (endpoint, created_at) e a remoção por limite `accessed_at`
+            connection.execute("DROP INDEX IF EXISTS responses_created_at")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_endpoint_created_at "
+                "ON responses (endpoint, created_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def ttl(self, endpoint: str) -> float:
+        """TTL em segundos para o endpoint."""
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def get(self, url: str, query: str) -> Optional[Tuple[List[Dict], int]]:
+        """
+        Retorna a página em cache (registros e `x-count`) ou None se não houver.
+
+        Raises:
+            CacheMissError: Se o modo offline estiver ativo e a página não estiver em cache.
+        """
+        if self.offline and self.refresh:
+            raise ValueError("Os modos offline e refresh do cache são incompatíveis.")
+        if (not self.enabled or self.refresh) and not self.offline:
+            return None
+        key = cache_key(url, query)
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT payload, total_count, created_at, accessed_at FROM responses "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None and (
+                self.offline or now - row[2] <= self.ttl(endpoint_from_url(url))
+            ):
+                if now - row[3] >= self.access_resolution:
+                    self.connection.execute(
+                        "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self.connection.commit()
+                return json.loads(zlib.decompress(row[0])), row[1]
+        if self.offline:
+            raise CacheMissError(f"Consulta não encontrada no cache (modo offline): {url} {query}")
+        return None
+
+    def set(self, url: str, query: str, data: List[Dict], total_count: int) -> None:
+        """Grava a página no cache; os limites são aplicados a cada `evict_every` gravações."""
+        if not self.enabled:
+            return
+        payload = zlib.compress(json.dumps(data).encode())
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    cache_key(url, query),
+                    endpoint_from_url(url),
+                    payload,
+                    total_count,
+                    len(payload),
+                    now,
+                    now,
+                ),
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.evict_every:
+                self._writes_since_evict = 0
+                self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Remove entradas expiradas e, acima dos limites, as lidas há mais tempo."""
+        now = time.time()
+        # Uma remoção por faixa do índice (endpoint, created_at) para cada TTL conhecido
+        for endpoint, ttl in self.ttls.items():
+            self.connection.execute(
+                "DELETE FROM responses WHERE endpoint = ? AND created_at < ?",
+                (endpoint, now - ttl),
+            )
+        placeholders = ",".join("?" * len(self.ttls))
+        self.connection.execute(
+            f"DELETE FROM responses WHERE created_at < ? AND endpoint NOT IN ({placeholders})",
+            (now - DEFAULT_TTL, *self.ttls),
+        )
+
+        rows, total = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        excess = rows - self.max_entries
+        if total > self.max_bytes:
+            # Páginas de tamanho médio necessárias para voltar ao limite de bytes
+            excess = max(excess, math.ceil((total - self.max_bytes) * rows / total))
+        if excess > 0:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self, endpoint: Optional[str] = None) -> None:
+        """Remove todas as entradas, ou apenas as de um endpoint."""
+        with self._lock:
+            if endpoint is None:
+                self.connection.execute("DELETE FROM responses")
+            else:
+                self.connection.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+            self.connection.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Número de páginas e bytes ocupados por endpoint."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT endpoint, COUNT(*), SUM(size) FROM responses GROUP BY endpoint"
+            ).fetchall()
+        return {endpoint: {"pages": pages, "bytes": size} for endpoint, pages, size in rows}
+
+
+# Cache compartilhado usado por `fetch_data_with_pagination`
+response_cache = ResponseCache()
+
+
+def configure_cache(
+    enabled: Optional[bool] = None,
+    offline: Optional[bool] = None,
+    max_bytes: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    refresh: Optional[bool] = None,
+) -> ResponseCache:
+    """Ajusta o cache compartilhado (ex.: `configure_cache(offline=True)` em testes ou CLI)."""
+    if enabled is not None:
+        response_cache.enabled = enabled
+    if refresh is not None:
+        response_cache.refresh = refresh
+    if offline is not None:
+        response_cache.offline = offline
+    if max_bytes is not None:
+        response_cache.max_bytes = max_bytes
+    if max_entries is not None:
+        response_cache.max_entries = max_entries
+    return response_cache
@@ -1,7 +1,10 @@
 import mlflow
+import pandas as pd
 
 
-def get_best_experiment(min_auc_difference=0.05, experiment_name="Model_Training"):
+def get_best_experiment(
+    min_auc_difference=0.05, experiment_name="Model_Training", metric="roc_auc_test"
+):
     """
     Recupera o ID do experimento com o maior AUC no conjunto de teste e com uma diferença
     baixa entre AUC de treino e teste.
@@ -9,6 +12,9 @@ def get_best_experiment(min_auc_difference=0.05, experiment_name="Model_Training
     Parâmetros:
     - min_auc_difference: Diferença máxima permitida entre AUC de treino e teste.
     - experiment_name: Nome do experimento no MLflow.
+    - metric: Métrica de AUC usada na seleção; `roc_auc_cv_mean` (validação cruzada)
+      é menos ruidosa que `roc_auc_test` em bases pequenas. Runs sem a métrica são
+      ignorados.
 
     Retorno:
     - best_run_id: ID do melhor experimento.
@@ -29,9 +35,17 @@ def get_best_experiment(min_auc_difference=0.05, experiment_name="Model_Training
     best_run_metrics = None
     best_test_auc = float("-inf")
 
+    metric_column = f"metrics.{metric}"
+    if metric_column not in runs.columns:
+        raise ValueError(
+            f"Nenhum run do experimento '{experiment_name}' possui a métrica {metric}."
+        )
+
     for _, run in runs.iterrows():
         train_auc = run["metrics.roc_auc_train"]
-        test_auc = run["metrics.roc_auc_test"]
+        test_auc = run[metric_column]
+        if pd.isna(train_auc) or pd.isna(test_auc):
+            continue
         auc_difference = abs(train_auc - test_auc)
 
         if test_auc > best_test_auc and auc_difference <= min_auc_difference:
@@ -52,18 +66,53 @@ def get_best_experiment(min_auc_difference=0.05, experiment_name="Model_Training
     return best_run_id, best_run_metrics
 
 
-def register_model(best_run_id, model_name="Best_Model"):
+def find_model_artifact_path(run_id):
+    """
+    Encontra o diretório do modelo logado no run (`train_model` usa `{algorithm}_model`).
+
+    Parâmetros:
+    - run_id: ID do run no MLflow.
+
+    Retorno:
+    - artifact_path: Caminho do artefato que contém o arquivo `MLmodel`.
+    """
+    client = mlflow.MlflowClient()
+    for artifact in client.list_artifacts(run_id):
+        if not artifact.is_dir:
+            continue
+        children = client.list_artifacts(run_id, artifact.path)
+        if any(child.path.endswith("MLmodel") for child in children):
+            return artifact.path
+    raise ValueError(f"Nenhum modelo encontrado nos artefatos do run {run_id}.")
+
+
+def register_model(best_run_id, model_name="Best_Model", artifact_path=None, alias="champion"):
     """
     Registra a versão do modelo a partir do melhor experimento.
 
+    A API carrega o modelo pelo alias (`MODEL_URI=models:/Best_Model@champion`), então
+    promover uma nova versão é apenas mover o alias.
+
     Parâmetros:
     - best_run_id: ID do experimento a ser registrado.
     - model_name: Nome do modelo a ser registrado.
+    - artifact_path: Caminho do modelo no run; se None, é encontrado automaticamente.
+    - alias: Alias apontado para a nova versão (None para não alterar).
+
+    Retorno:
+    - model_version: Versão registrada.
     """
 
-    model_uri = f"runs:/{best_run_id}/model"
-    mlflow.register_model(model_uri, model_name)
-    print(f"Modelo registrado com sucesso! Nome do Modelo: {model_name}")
+    artifact_path = artifact_path or find_model_artifact_path(best_run_id)
+    model_uri = f"runs:/{best_run_id}/{artifact_path}"
+    model_version = mlflow.register_model(model_uri, model_name)
+    if alias is not None:
+        mlflow.MlflowClient().set_registered_model_alias(model_name, alias, model_version.version)
+    print(
+        f"Modelo registrado com sucesso! Nome do Modelo: {model_name} "
+        f"(versão {model_version.version}, alias {alias})"
+    )
+    return model_version
 
 
 # Exemplo de uso:
@@ -1,14 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import re
 import requests
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
-from utils.auth_twitch import make_authenticated_request
+from .auth_twitch import make_authenticated_request, rate_limiter
+from .response_cache import response_cache
+
+
+def split_options(value: str, max_options: int) -> List[str]:
+    """
+    Divide o valor de um filtro em partes com no máximo `max_options` opções.
+
+    Listas no formato da API (ex.: `= (1,2,3)`) mantêm o operador e os parênteses em
+    cada parte (`= (1,2)`, `= (3)`).
+
+    Args:
+        value (str): Valor do filtro.
+        max_options (int): Número máximo de opções por parte.
+
+    Returns:
+        List[str]: Partes do valor do filtro.
+    """
+    match = re.fullmatch(r"\s*(.*?)\s*\((.*)\)\s*", value)
+    if match:
+        operator, inner = match.groups()
+        options = inner.split(",")
+        return [
+            f"{operator} ({','.join(options[i : i + max_options])})"
+            for i in range(0, len(options), max_options)
+        ]
+    options = value.split(",")
+    return [",".join(options[i : i + max_options]) for i in range(0, len(options), max_options)]
 
 
 def split_filters(filters: Dict[str, str], max_options: int) -> List[Dict[str, str]]:
     """
     Divide os filtros em várias partes, se necessário.
 
+    Cada parte mantém todos os filtros: as listas longas são divididas e combinadas
+    com os demais filtros da consulta.
+
     Args:
         filters (Dict[str, str]): Dicionário de filtros a serem aplicados na consulta.
         max_options (int): Número máximo de opções por filtro.
@@ -16,13 +49,11 @@ def split_filters(filters: Dict[str, str], max_options: int) -> List[Dict[str, s
     Returns:
         List[Dict[str, str]]: Lista de dicionários de filtros divididos.
     """
-    split_filters_list = []
-    for key, value in filters.items():
-        options = value.split(",")
-        for i in range(0, len(options), max_options):
-            sub_filter = {key: ",".join(options[i : i + max_options])}
-            split_filters_list.append(sub_filter)
-    return split_filters_list
+    options_per_key = [
+        [(key, option) for option in split_options(value, max_options)]
+        for key, value in filters.items()
+    ]
+    return [dict(combination) for combination in itertools.product(*options_per_key)]
 
 
 def build_query(
@@ -49,12 +80,93 @@ def build_query(
     return f"fields {fields_str}; {where_clause} limit {limit}; offset {offset};"
 
 
+def fetch_page(url: str, query: str) -> Tuple[List[Dict], int]:
+    """
+    Busca uma única página da API, consultando antes o cache local de respostas.
+
+    Args:
+        url (str): URL do endpoint da API.
+        query (str): Query já montada para a página.
+
+    Returns:
+        Tuple[List[Dict], int]: Registros da página e o total informado no header `x-count`.
+
+    Raises:
+        requests.HTTPError: Se a página não puder ser obtida mesmo após as retentativas,
+            para que o resultado nunca seja retornado truncado.
+        CacheMissError: Se o modo offline estiver ativo e a página não estiver em cache.
+    """
+    cached = response_cache.get(url, query)
+    if cached is not None:
+        return cached
+    response = make_authenticated_request(url, query)
+    if response.status_code != 200:
+        raise requests.HTTPError(
+            f"Erro ao obter dados: {response.status_code} - {response.text}", response=response
+        )
+    data, total_count = response.json(), int(response.headers.get("x-count", 0))
+    response_cache.set(url, query, data, total_count)
+    return data, total_count
+
+
+def default_concurrency() -> int:
+    """
+    Número de requisições simultâneas que cabe no orçamento do limitador compartilhado.
+
+    Acima de `max_in_flight` as threads extras apenas esperam por uma vaga do limitador.
+    """
+    return rate_limiter.max_in_flight
+
+
+def _fetch_concurrently(
+    url: str,
+    query_builder,
+    fields: List[str],
+    filter_combinations: List[Optional[Dict[str, str]]],
+    limit: int,
+    concurrency: int,
+) -> List[Dict]:
+    """
+    Busca todas as páginas de todas as combinações de filtros em paralelo.
+
+    A primeira página de cada combinação é buscada para descobrir o total de
+    registros (header `x-count`); em seguida todos os offsets restantes são
+    agendados de uma vez. As páginas são remontadas na mesma ordem da busca serial.
+    """
+    pages: Dict[Tuple[int, int], List[Dict]] = {}
+
+    def fetch(index: int, offset: int) -> Tuple[List[Dict], int]:
+        query = query_builder(fields, filter_combinations[index], limit, offset)
+        return fetch_page(url, query)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        first_pages = {
+            index: executor.submit(fetch, index, 0) for index in range(len(filter_combinations))
+        }
+        remaining = {}
+        for index, future in first_pages.items():
+            data, total_count = future.result()
+            pages[(index, 0)] = data
+            for offset in range(limit, total_count, limit):
+                remaining[(index, offset)] = executor.submit(fetch, index, offset)
+
+        for key, future in remaining.items():
+            pages[key] = future.result()[0]
+
+    all_data = []
+    for key in sorted(pages):
+        all_data.extend(pages[key])
+    return all_data
+
+
 def fetch_data_with_pagination(
     url: str,
     query_builder,
     fields: List[str],
     filters: Optional[Dict[str, str]] = None,
     max_filter_options: int = 1,
+    concurrency: Optional[int] = None,
+    limit: int = 500,
 ) -> pd.DataFrame:
     """
     Busca dados com paginação e retorna um DataFrame consolidado.
@@ -65,11 +177,18 @@ def fetch_data_with_pagination(
         fields (List[str]): Lista de campos a serem selecionados.
         filters (Optional[Dict[str, str]]): Dicionário de filtros a serem aplicados na consulta.
         max_filter_options (int): Número máximo de opções por filtro antes de dividir a consulta.
+        concurrency (Optional[int]): Número máximo de requisições simultâneas. Com 1 as
+            páginas são buscadas em série; acima disso as páginas restantes e as
+            combinações de filtros são buscadas em paralelo. None (padrão) usa
+            `default_concurrency()`.
+        limit (int): Número de registros por página.
 
     Returns:
         pd.DataFrame: DataFrame contendo todos os registros obtidos pela consulta com paginação.
     """
     all_data = []
+    if concurrency is None:
+        concurrency = default_concurrency()
 
     # Dividindo filtros se necessário
     if filters:
@@ -77,17 +196,18 @@ def fetch_data_with_pagination(
     else:
         filter_combinations = [filters]
 
+    if concurrency > 1:
+        all_data = _fetch_concurrently(
+            url, query_builder, fields, filter_combinations, limit, concurrency
+        )
+        return pd.DataFrame(all_data)
+
     for sub_filters in filter_combinations:
-        offset, limit = 0, 500
+        offset = 0
         while True:
             query = query_builder(fields, sub_filters, limit, offset)
-            response = make_authenticated_request(url, query)
-            if response.status_code != 200:
-                print(f"Erro ao obter dados: {response.status_code} - {response.text}")
-                break
-            data = response.json()
+            data, total_count = fetch_page(url, query)
             all_data.extend(data)
-            total_count = int(response.headers.get("x-count", 0))
             if offset + limit >= total_count:
                 break
             offset += limit
@@ -0,0 +1,85 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+import xgboost as xgb
+
+from data_master_eng_ml.config import RAW_DATA_DIR
+from data_master_eng_ml.features import NON_FEATURE_COLUMNS
+from data_master_eng_ml.utils import mappings
+from modeling.preprocessor import build_preprocessor
+
+# Mapeamentos fixos da API do IGDB (nomes no formato do `features.py`)
+IGDB_MAPPINGS = {
+    "genres_mapping": {5: "shooter", 12: "role-playing-rpg"},
+    "game_modes_mapping": {1: "single-player", 2: "multiplayer"},
+    "player_perspectives_mapping": {1: "first-person", 2: "third-person"},
+}
+
+
+@pytest.fixture
+def igdb_mappings(monkeypatch):
+    monkeypatch.setattr(mappings, "_api_mappings", dict(IGDB_MAPPINGS))
+    return IGDB_MAPPINGS
+
+
+@pytest.fixture(scope="session")
+def training_data():
+    """Features e target dos arquivos `data/raw/twitch_api_data_*.csv`."""
+    data = pd.concat(
+        [pd.read_csv(path) for path in sorted(RAW_DATA_DIR.glob("twitch_api_data_*.csv"))],
+        ignore_index=True,
+    )
+    return data.drop(columns=NON_FEATURE_COLUMNS), data["target"]
+
+
+@pytest.fixture(scope="session")
+def trained_pipeline(training_data):
+    """Pipeline (pré-processador + XGBoost) treinado como em `modeling.train_model`."""
+    X, y = training_data
+    categorical_cols = list(X.select_dtypes("object").columns)
+    numerical_cols = [column for column in X.columns if column not in categorical_cols]
+    pipeline = Pipeline(
+        steps=[
+            ("preprocessor", build_preprocessor(numerical_cols, categorical_cols)),
+            ("model", xgb.XGBClassifier(n_estimators=20, max_depth=3, n_jobs=1)),
+        ]
+    )
+    return pipeline.fit(X, y)
+
+
+@pytest.fixture(scope="session")
+def api():
+    """Módulo `app` da API, com stand-ins dos módulos de deploy (`config`, `src.utils`).
+
+    Esses módulos são montados no container da API e não fazem parte do repositório.
+    """
+    stand_ins = {
+        "config": types.ModuleType("config"),
+        "config.config": types.ModuleType("config.config"),
+        "src": types.ModuleType("src"),
+        "src.utils": types.ModuleType("src.utils"),
+        "src.utils.data": types.ModuleType("src.utils.data"),
+        "src.utils.predictions": types.ModuleType("src.utils.predictions"),
+        "src.utils.reports": types.ModuleType("src.utils.reports"),
+    }
+    stand_ins["config.config"].DATA_COLUMNS = {"columns": []}
+    stand_ins["src.utils.data"].load_reference_data = lambda columns: pd.DataFrame()
+    stand_ins["src.utils.predictions"].get_predictions = (
+        lambda features, model: model.predict_proba(features)[:, 1]
+    )
+    for name in (
+        "get_column_mapping",
+        "build_model_performance_report",
+        "build_target_drift_report",
+    ):
+        setattr(stand_ins["src.utils.reports"], name, None)
+
+    with pytest.MonkeyPatch.context() as patch:
+        for name, module in stand_ins.items():
+            patch.setitem(sys.modules, name, module)
+        import app
+
+        yield app
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from data_master_eng_ml.utils import age_ratings
+from data_master_eng_ml.utils.age_ratings import NO_RATING, most_restrictive_age_rating
+
+
+def test_most_restrictive_age_rating_per_game():
+    games = pd.Series([[10, 11], [12], None, [], [99]], index=[7, 8, 9, 10, 11])
+    # 1 -> 3+, 4 -> 16+, 5 -> 18+ (ver `mappings.age_rating_mapping`)
+    ratings = pd.DataFrame({"id": [10, 11, 12], "rating": [1, 4, 5]})
+
+    result = most_restrictive_age_rating(games, ratings)
+
+    assert result.index.tolist() == [7, 8, 9, 10, 11]
+    assert result.tolist() == ["16+", "18+", NO_RATING, NO_RATING, NO_RATING]
+
+
+def test_resolve_age_classif_fetches_all_ids_in_one_batch(monkeypatch):
+    calls = []
+
+    def fetch_age_ratings(ids, concurrency=None):
+        calls.append(sorted(ids))
+        return pd.DataFrame({"id": [1, 2, 3], "rating": [2, 3, 7]})
+
+    monkeypatch.setattr(age_ratings, "fetch_age_ratings", fetch_age_ratings)
+
+    result = age_ratings.resolve_age_classif(pd.Series([[1, 2], [2, 3], None]))
+
+    assert calls == [[1, 2, 3]]
+    assert result.tolist() == ["12+", "12+", NO_RATING]
+
+
+def test_fetch_age_ratings_chunks_ids_into_id_filters(monkeypatch):
+    calls = []
+
+    def fetch_data_with_pagination(url, query_builder, fields, filters, **kwargs):
+        calls.append((filters, kwargs))
+        return pd.DataFrame({"id": [], "rating": []})
+
+    monkeypatch.setattr(age_ratings, "fetch_data_with_pagination", fetch_data_with_pagination)
+
+    age_ratings.fetch_age_ratings([3, 1, 2, 3], chunk_size=2)
+
+    filters, kwargs = calls[0]
+    assert filters == {"id": "= (1,2,3)"}
+    assert kwargs["max_filter_options"] == 2
+    assert age_ratings.fetch_age_ratings([]).empty
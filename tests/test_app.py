@@ -0,0 +1,90 @@
+import json
+
+import joblib
+import pytest
+from fastapi.testclient import TestClient
+from test_dataset import raw_frames
+
+from data_master_eng_ml import dataset
+from modeling.predict import predict_games
+
+
+@pytest.fixture
+def client(api, trained_pipeline, tmp_path):
+    model_path = tmp_path / "model.joblib"
+    joblib.dump(trained_pipeline, model_path)
+    api.model_loader.load(str(model_path))
+    # Sem o context manager, os eventos de startup (batcher, flusher, modelo) não rodam
+    return TestClient(api.app)
+
+
+def test_predict_games_matches_batch_prediction(client, igdb_mappings, trained_pipeline):
+    games = dataset.build_games_dataset(raw_frames())
+
+    response = client.post("/predict-games", json={"games": games.to_json()})
+
+    assert response.status_code == 200
+    served = json.loads(response.json()["predictions"])
+    batch = predict_games(games, trained_pipeline)
+    assert list(served["id"].values()) == batch["id"].tolist()
+    assert list(served["predictions"].values()) == pytest.approx(batch["predictions"].tolist())
+
+
+def test_predict_games_rejects_games_without_dataset_columns(client, igdb_mappings):
+    games = dataset.build_games_dataset(raw_frames()).drop(columns=["platforms"])
+
+    response = client.post("/predict-games", json={"games": games.to_json()})
+
+    assert response.status_code == 422
+    assert "platforms" in response.json()["error_msg"]
+
+
+def batch_payload(training_data, n_rows=5):
+    X, _ = training_data
+    rows = X.head(n_rows).astype(object).where(X.head(n_rows).notna(), None)
+    return {"ids": list(range(n_rows)), "columns": rows.to_dict("list")}
+
+
+def test_predict_batch_scores_like_the_pipeline(client, training_data, trained_pipeline):
+    response = client.post("/predict-batch", json=batch_payload(training_data))
+
+    assert response.status_code == 200
+    expected = trained_pipeline.predict_proba(training_data[0].head(5))[:, 1]
+    assert response.json()["scores"] == pytest.approx(expected.tolist(), rel=1e-6)
+
+
+def test_predict_batch_rejects_missing_columns_with_422(client, training_data):
+    payload = batch_payload(training_data)
+    del payload["columns"]["pc"]
+
+    response = client.post("/predict-batch", json=payload)
+
+    assert response.status_code == 422
+    assert "pc" in response.json()["error_msg"]
+
+
+def test_predict_batch_rejects_models_without_feature_names_with_422(
+    client, api, training_data, monkeypatch
+):
+    class Unnamed:
+        def predict_proba(self, X):
+            raise AssertionError("must not be called")
+
+    monkeypatch.setattr(api.model_loader, "model", Unnamed())
+
+    response = client.post("/predict-batch", json=batch_payload(training_data))
+
+    assert response.status_code == 422
+    assert "feature names" in response.json()["error_msg"]
+
+
+def test_predict_failures_are_500(client, api, monkeypatch):
+    def fail(features):
+        raise RuntimeError("model exploded")
+
+    monkeypatch.setattr(api, "predict_features", fail)
+
+    response = client.post("/predict", json={"features": '{"pc": {"0": 1}}'})
+
+    assert response.status_code == 500
+    assert response.json() == {"error_msg": "model exploded"}
@@ -0,0 +1,40 @@
+import os
+import stat
+import time
+
+from data_master_eng_ml.utils import auth_twitch
+
+
+def make_client(token_cache_path):
+    return auth_twitch.TwitchClient(
+        client_id="id", client_secret="secret", token_cache_path=str(token_cache_path)
+    )
+
+
+def test_token_cache_is_created_private_and_reloaded(tmp_path, monkeypatch):
+    cache_path = tmp_path / "token.json"
+    created_modes = []
+    real_open = os.open
+
+    def spy_open(path, flags, mode=0o777, *args, **kwargs):
+        created_modes.append(mode)
+        return real_open(path, flags, mode, *args, **kwargs)
+
+    monkeypatch.setattr(auth_twitch.os, "open", spy_open)
+    # Um .tmp antigo legível por todos não pode ser reaproveitado com o modo antigo
+    stale_tmp = cache_path.with_suffix(".tmp")
+    stale_tmp.write_text("{}")
+    stale_tmp.chmod(0o644)
+
+    client = make_client(cache_path)
+    client.token_data = {"access_token": "secret-token", "expires_in": 3600}
+    client.token_expiration_time = time.time() + 3600
+    client._save_cached_token()
+
+    assert created_modes == [0o600]
+    assert stat.S_IMODE(cache_path.stat().st_mode) == 0o600
+    assert not stale_tmp.exists()
+
+    reloaded = make_client(cache_path)
+    assert reloaded.token_data["access_token"] == "secret-token"
+    assert not reloaded.is_token_expired()
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batching import MicroBatcher
+
+
+def row_sums(features: pd.DataFrame) -> np.ndarray:
+    return features.sum(axis=1).to_numpy()
+
+
+def test_concurrent_requests_share_one_call_and_get_their_own_scores():
+    calls = []
+
+    def predict_fn(features):
+        calls.append(len(features))
+        return row_sums(features)
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=64, max_wait_ms=50)
+        batcher.start()
+        frames = [pd.DataFrame({"a": [i, i], "b": [1, 2]}) for i in range(3)]
+        results = await asyncio.gather(*(batcher.predict(frame) for frame in frames))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert calls == [6]
+    assert [result.tolist() for result in results] == [[1, 2], [2, 3], [3, 4]]
+
+
+def test_requests_with_other_columns_are_scored_separately():
+    calls = []
+
+    def predict_fn(features):
+        calls.append(sorted(features.columns))
+        assert not features.isna().any().any()
+        return row_sums(features)
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=64, max_wait_ms=50)
+        batcher.start()
+        results = await asyncio.gather(
+            batcher.predict(pd.DataFrame({"a": [1], "b": [2]})),
+            batcher.predict(pd.DataFrame({"a": [10]})),
+            batcher.predict(pd.DataFrame({"b": [3], "a": [4]})),
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert calls == [["a", "b"], ["a"]]
+    assert [result.tolist() for result in results] == [[3], [10], [7]]
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    release = threading.Event()
+
+    def predict_fn(features):
+        release.wait(5)
+        return row_sums(features)
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=1, max_wait_ms=0)
+        batcher.start()
+        requests = [
+            asyncio.ensure_future(batcher.predict(pd.DataFrame({"a": [i]}))) for i in range(3)
+        ]
+        # O primeiro pedido fica preso no modelo, os outros na fila
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1)
+        with pytest.raises(RuntimeError, match="not running"):
+            await batcher.predict(pd.DataFrame({"a": [0]}))
+        return results
+
+    results = asyncio.run(run())
+
+    assert [type(result) for result in results] == [RuntimeError] * 3
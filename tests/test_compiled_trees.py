@@ -0,0 +1,95 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+import xgboost as xgb
+
+from data_master_eng_ml.modeling import compiled_trees as served_trees
+import utils
+from modeling.compiled_trees import (
+    CompiledEnsemble,
+    compile_model,
+    export_compiled_model,
+    validate_compiled_model,
+)
+
+
+@pytest.fixture(scope="module")
+def matrices(training_data, trained_pipeline):
+    """Features pré-processadas (densas, com NaN em parte das linhas) e target."""
+    X, y = training_data
+    matrix = trained_pipeline[:-1].transform(X)
+    matrix = matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+    matrix = matrix.astype(np.float32)
+    # Ausentes só chegam ao modelo quando o pré-processador não os imputa
+    matrix[::7, 0] = np.nan
+    return matrix, y.to_numpy()
+
+
+def train(algorithm, X, y):
+    if algorithm == "xgboost":
+        params = {"objective": "binary:logistic", "max_depth": 3, "nthread": 1}
+        return xgb.train(params, xgb.DMatrix(X, label=y), num_boost_round=20)
+    if algorithm == "lightgbm":
+        return lgb.LGBMClassifier(n_estimators=20, n_jobs=1, verbose=-1).fit(X, y)
+    return RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize("algorithm", ["xgboost", "lightgbm", "random_forest"])
+def test_compiled_scores_match_the_original_model(matrices, algorithm):
+    X, y = matrices
+    model = train(algorithm, X, y)
+
+    compiled = compile_model(model)
+
+    assert validate_compiled_model(compiled, model, X, algorithm) <= 1e-5
+
+
+def test_compiled_xgboost_treats_sparse_absent_entries_as_missing(matrices):
+    X, y = matrices
+    booster = train("xgboost", np.nan_to_num(X), y)
+    X_sparse = sparse.csr_matrix(np.nan_to_num(X))
+
+    compiled = compile_model(booster)
+
+    np.testing.assert_allclose(
+        compiled.predict_proba(X_sparse)[:, 1], booster.inplace_predict(X_sparse), atol=1e-6
+    )
+
+
+def test_exported_ensemble_round_trips_through_npz(matrices, tmp_path):
+    X, y = matrices
+    booster = train("xgboost", X, y)
+    path = tmp_path / "xgboost_compiled.npz"
+    export_compiled_model(booster, "xgboost", path, X)
+
+    loaded = CompiledEnsemble.load(path)
+
+    np.testing.assert_allclose(
+        loaded.predict_proba(X)[:, 1], booster.inplace_predict(X), atol=1e-6
+    )
+
+
+def test_compile_for_serving_keeps_the_preprocessor(training_data, trained_pipeline):
+    X, _ = training_data
+
+    served = utils.compile_for_serving(trained_pipeline)
+
+    assert isinstance(served, Pipeline)
+    assert isinstance(served.steps[-1][1], served_trees.CompiledEnsemble)
+    assert utils.get_feature_names(served) == list(X.columns)
+    np.testing.assert_allclose(
+        utils.predict_scores(served, X), trained_pipeline.predict_proba(X)[:, 1], atol=1e-5
+    )
+
+
+def test_compile_for_serving_keeps_models_whose_scores_differ(matrices, monkeypatch):
+    X, y = matrices
+    booster = train("xgboost", X, y)
+    wrong = compile_model(booster)
+    wrong.base_margin += 1.0
+    monkeypatch.setattr(utils, "compile_model", lambda model: wrong)
+
+    assert utils.compile_for_serving(booster) is booster
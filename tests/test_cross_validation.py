@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from modeling import cross_validation
+from modeling.cross_validation import FoldCache, cross_validate
+from modeling.model import train_lightgbm, train_lightgbm_datasets
+
+
+@pytest.fixture(scope="module")
+def fold_cache(training_data):
+    X, y = training_data
+    categorical_cols = list(X.select_dtypes("object").columns)
+    numerical_cols = [column for column in X.columns if column not in categorical_cols]
+    return FoldCache(X, y, numerical_cols, categorical_cols, n_splits=3, cache_dir=None)
+
+
+def test_early_stopping_rows_come_from_the_training_fold(fold_cache):
+    train_index, val_index = fold_cache.folds()[0]
+    matrices = fold_cache.matrices(0)
+
+    assert len(matrices["y_fit"]) + len(matrices["y_es"]) == len(train_index)
+    assert len(matrices["y_val"]) == len(val_index)
+    # Estratificado: a proporção do target se mantém na parte do early stopping
+    assert matrices["y_es"].mean() == pytest.approx(fold_cache.y[train_index].mean(), abs=0.02)
+
+
+def test_xgboost_never_early_stops_on_the_scored_fold(fold_cache, monkeypatch):
+    eval_rows = []
+    train_xgboost = cross_validation.train_xgboost
+
+    def spy(dtrain, dval, params, n_jobs=None):
+        eval_rows.append(dval.get_label())
+        return train_xgboost(dtrain, dval, params, n_jobs)
+
+    monkeypatch.setattr(cross_validation, "train_xgboost", spy)
+
+    metrics = cross_validate(fold_cache, "xgboost", n_jobs=1)
+
+    # Com n_jobs=1 os folds rodam em ordem
+    assert len(eval_rows) == fold_cache.n_splits
+    for fold, labels in enumerate(eval_rows):
+        assert np.array_equal(labels, fold_cache.matrices(fold)["y_es"])
+    assert 0.5 < metrics["roc_auc_cv_mean"] <= 1
+
+
+def test_lightgbm_is_trained_with_the_train_model_defaults(fold_cache, monkeypatch):
+    calls = []
+    train_lightgbm_datasets = cross_validation.train_lightgbm_datasets
+
+    def spy(train_set, val_set, params, n_jobs=None):
+        model, model_params = train_lightgbm_datasets(train_set, val_set, params, n_jobs)
+        calls.append((train_set, val_set, model_params))
+        return model, model_params
+
+    monkeypatch.setattr(cross_validation, "train_lightgbm_datasets", spy)
+
+    metrics = cross_validate(fold_cache, "lightgbm", n_jobs=1)
+
+    assert len(calls) == fold_cache.n_splits
+    assert all(params["learning_rate"] == 0.015 for _, _, params in calls)
+    for fold, (train_set, val_set, _) in enumerate(calls):
+        assert np.array_equal(val_set.get_label(), fold_cache.matrices(fold)["y_es"])
+    assert 0.5 < metrics["roc_auc_cv_mean"] <= 1
+
+
+def test_lightgbm_datasets_are_built_once_and_match_train_lightgbm(fold_cache):
+    matrices = fold_cache.matrices(0)
+    params = {"objective": "binary", "n_estimators": 20, "verbose": -1}
+
+    train_set, val_set = fold_cache.lgb_datasets(0)
+    booster, _ = train_lightgbm_datasets(train_set, val_set, params, n_jobs=1)
+    classifier, _ = train_lightgbm(
+        matrices["X_fit"], matrices["y_fit"], matrices["X_es"], matrices["y_es"], params, 1
+    )
+
+    assert fold_cache.lgb_datasets(0) == (train_set, val_set)
+    np.testing.assert_allclose(
+        booster.predict(matrices["X_val"]),
+        classifier.predict_proba(matrices["X_val"])[:, 1],
+        atol=1e-12,
+    )
@@ -0,0 +1,173 @@
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from data_master_eng_ml import dataset
+from data_master_eng_ml.dataset import GAME_COLUMNS
+from data_master_eng_ml.utils.response_cache import ResponseCache, response_cache
+
+
+def raw_frames():
+    return {
+        "release_dates": pd.DataFrame(
+            {"game": [1, 1, 2], "region": [8, 2, 1], "updated_at": [10, 11, 12]}
+        ),
+        "games": pd.DataFrame(
+            {
+                "id": [1, 2],
+                "name": ["a", "b"],
+                "genres": [[5], None],
+                "game_modes": [[1], [2]],
+                "player_perspectives": [None, [1]],
+                "platforms": [[6], [48]],
+                "rating": [80.0, None],
+                "remasters": [None, [3]],
+                "age_classif": ["18+", "No Rating"],
+                "updated_at": [20, 21],
+            }
+        ),
+        "involved_companies": pd.DataFrame(
+            {"game": [1, 1], "company": [100, 101], "updated_at": [30, 31]}
+        ),
+        "companies": pd.DataFrame(
+            {
+                "id": [100, 101],
+                "developed": [[1, 2], None],
+                "published": [None, [1]],
+                "country": [76, 840],
+                "parent": [None, 100],
+                "updated_at": [40, 41],
+            }
+        ),
+        "multiplayer_modes": pd.DataFrame(
+            {
+                "game": [2],
+                "onlinecoop": [True],
+                "onlinecoopmax": [4],
+                "onlinemax": [8],
+                "splitscreen": [False],
+                "updated_at": [50],
+            }
+        ),
+    }
+
+
+def test_build_games_dataset_joins_first_related_rows():
+    games = dataset.build_games_dataset(raw_frames())
+
+    assert list(games.columns) == list(GAME_COLUMNS)
+    assert games["id"].tolist() == [1, 2]
+    # Primeiro lançamento e primeira empresa de cada jogo
+    assert games["region"].tolist() == [8, 1]
+    assert games["company"].tolist()[0] == 100
+    assert pd.isna(games["company"].iloc[1])
+    assert games["country"].tolist()[0] == 76
+    assert games["onlinemax"].isna().tolist() == [True, False]
+
+
+def test_partitions_round_trip(tmp_path):
+    games = dataset.build_games_dataset(raw_frames())
+    path = dataset.write_partition(games, tmp_path, 2021)
+
+    assert path == tmp_path / "year=2021" / "part-0.parquet"
+    assert dataset.read_partition(tmp_path, 2022) is None
+    stored = dataset.read_partition(tmp_path, 2021)
+    scalar_columns = [name for name, dtype in GAME_COLUMNS.items() if dtype != "object"]
+    pd.testing.assert_frame_equal(stored[scalar_columns], games[scalar_columns])
+    assert stored["developed"].iloc[0].tolist() == [1, 2]
+
+
+def test_fetch_changes_filters_known_ids_by_watermark(monkeypatch):
+    calls = []
+
+    def fetch_endpoint(endpoint, filters, concurrency):
+        calls.append(filters)
+        return pd.DataFrame(
+            {"id": [], **{field: [] for field in dataset.ENDPOINT_FIELDS[endpoint]}}
+        )
+
+    monkeypatch.setattr(dataset, "fetch_endpoint", fetch_endpoint)
+
+    dataset.fetch_changes("games", "id", [1, 2, 3], known_ids=[1, 2], watermark=99, concurrency=1)
+
+    assert calls == [{"id": "= (3)"}, {"id": "= (1,2)", "updated_at": "> 99"}]
+
+
+def test_upsert_keeps_latest_version_of_each_id():
+    stored = pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+    changes = pd.DataFrame({"id": [2, 3], "name": ["b2", "c"]})
+
+    assert dataset.upsert(stored, changes).to_dict("list") == {
+        "id": [1, 2, 3],
+        "name": ["a", "b2", "c"],
+    }
+
+
+@pytest.fixture
+def fake_extract(monkeypatch):
+    calls = []
+
+    def extract_year(year, concurrency, stored, watermarks):
+        calls.append(
+            {
+                "stored": sorted(stored),
+                "watermarks": watermarks,
+                "cache_refresh": response_cache.refresh,
+            }
+        )
+        return raw_frames()
+
+    monkeypatch.setattr(dataset, "extract_year", extract_year)
+    monkeypatch.setattr(response_cache, "refresh", False)
+    return calls
+
+
+def run_main(tmp_path, *args):
+    result = CliRunner().invoke(
+        dataset.app,
+        [
+            "--year",
+            "2021",
+            "--raw-dir",
+            str(tmp_path / "raw"),
+            "--interim-dir",
+            str(tmp_path / "interim"),
+            *args,
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_incremental_run_reuses_partitions_and_watermarks(tmp_path, fake_extract):
+    run_main(tmp_path)
+    assert dataset.read_watermarks(tmp_path / "raw")["games"] == {"2021": 21}
+
+    run_main(tmp_path)
+
+    first, second = fake_extract
+    assert first["stored"] == [] and first["watermarks"] == {}
+    assert second["stored"] == sorted(dataset.ENDPOINT_FIELDS)
+    assert second["watermarks"]["release_dates"] == 12
+    assert not second["cache_refresh"]
+
+
+def test_full_refresh_bypasses_watermarks_and_response_cache(tmp_path, fake_extract):
+    run_main(tmp_path)
+    run_main(tmp_path, "--full-refresh")
+
+    refresh = fake_extract[-1]
+    assert refresh["stored"] == [] and refresh["watermarks"] == {}
+    assert refresh["cache_refresh"]
+
+
+def test_full_refresh_reads_no_cached_page_but_stores_new_ones(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite")
+    cache.set("https://api/games", "q", [{"id": 1, "updated_at": 1}], total_count=1)
+    cache.refresh = True
+
+    assert cache.get("https://api/games", "q") is None
+    cache.set("https://api/games", "q", [{"id": 1, "updated_at": 2}], total_count=1)
+
+    cache.refresh = False
+    assert cache.get("https://api/games", "q") == ([{"id": 1, "updated_at": 2}], 1)
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drift import DriftMonitor, DriftSketch
+from monitoring import ReferenceProfile
+from prediction_store import PredictionStore
+
+DATA_COLUMNS = {"num_features": ["x"], "cat_features": ["c"]}
+
+
+@pytest.fixture(scope="module")
+def profile():
+    reference = pd.DataFrame({"x": np.arange(100.0), "c": ["a", "b"] * 50})
+    return ReferenceProfile(reference, DATA_COLUMNS)
+
+
+def rows(start, n_rows):
+    values = np.arange(start, start + n_rows)
+    return pd.DataFrame({"x": values * 7 % 100.0, "c": np.where(values % 3, "a", "z")})
+
+
+def assert_sketch_is(sketch, profile, expected):
+    assert sketch.n_rows == len(expected)
+    for name, histogram in profile.histograms(expected).items():
+        np.testing.assert_array_equal(sketch.histogram(name), histogram)
+
+
+def test_sketch_counts_only_the_last_window_size_rows(profile, tmp_path):
+    store = PredictionStore(tmp_path)
+    sketch = DriftSketch(profile, 6)
+    store.subscribe(sketch.update)
+
+    for start, n_rows in ((0, 2), (2, 3), (5, 4), (9, 1), (10, 13)):
+        store.append(rows(start, n_rows))
+        assert_sketch_is(sketch, profile, store.last(6))
+    assert sketch.last_id == store.last_id
+
+
+def test_sketch_skips_rows_it_already_has(profile):
+    sketch = DriftSketch(profile, 6)
+    frame = rows(0, 4).assign(prediction_id=range(4))
+    sketch.update(frame)
+    sketch.update(frame.iloc[2:])
+
+    assert_sketch_is(sketch, profile, frame)
+
+
+def test_monitor_matches_the_log_under_concurrent_appends(profile, tmp_path):
+    store = PredictionStore(tmp_path)
+    monitor = DriftMonitor(store, lambda: profile, window_size=40)
+    store.append(rows(0, 10))
+    sketch = monitor.sketch()
+
+    def append_many(worker):
+        for index in range(40):
+            store.append(rows(worker * 1000 + index, 1 + index % 3))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(append_many, range(8)))
+
+    assert_sketch_is(sketch, profile, store.last(40))
+    assert monitor.scores()["last_prediction_id"] == store.last_id
+
+
+def test_empty_profile_scores_no_features(tmp_path):
+    store = PredictionStore(tmp_path)
+    profile = ReferenceProfile(pd.DataFrame(), {"columns": []})
+    monitor = DriftMonitor(store, lambda: profile, window_size=10)
+    store.append(rows(0, 3))
+
+    scores = monitor.scores()
+    store.append(rows(3, 2))
+
+    assert scores["features"] == {}
+    assert scores["drift_share"] == 0.0
+    assert monitor.scores()["rows"] == 5
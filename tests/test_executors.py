@@ -0,0 +1,36 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import pytest
+
+import executors
+from executors import run_in_executor
+
+
+def test_run_in_executor_passes_keyword_arguments_off_the_event_loop():
+    def work(a, b=0):
+        return a + b, threading.current_thread().name
+
+    async def run():
+        with ThreadPoolExecutor(thread_name_prefix="test") as pool:
+            return await run_in_executor(pool, work, 1, b=2)
+
+    result, thread_name = asyncio.run(run())
+
+    assert result == 3
+    assert thread_name.startswith("test")
+
+
+@pytest.mark.skipif(not hasattr(os, "getpriority"), reason="niceness por thread só no Linux")
+def test_report_threads_run_with_lower_priority(monkeypatch):
+    monkeypatch.setattr(executors, "REPORT_NICENESS", 1)
+
+    def niceness():
+        return os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+
+    base = niceness()
+    with ThreadPoolExecutor(1, initializer=executors._lower_thread_priority) as pool:
+        assert pool.submit(niceness).result() == base + 1
+    assert niceness() == base
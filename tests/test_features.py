@@ -0,0 +1,54 @@
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+from test_dataset import raw_frames
+
+from data_master_eng_ml import dataset
+from data_master_eng_ml.features import FEATURE_COLUMNS, build_features, list_lengths
+from modeling.predict import predict_games
+
+
+def test_build_features_matches_raw_feature_columns(igdb_mappings):
+    features = build_features(dataset.build_games_dataset(raw_frames()))
+
+    assert list(features.columns) == FEATURE_COLUMNS
+    assert features["genres_first"].tolist() == ["shooter", "unknown_genres_name"]
+    assert features["target"].tolist() == [1, 0]
+    assert features["single_player"].tolist() == [1, 0]
+    assert features["first_person"].tolist() == [0, 1]
+    assert features["unknown_player_perspectives"].tolist() == [1, 0]
+    assert features["has_global_launch"].tolist() == [1, 0]
+    # Empresa 100: `developed` com 2 jogos e `published` ausente (-1)
+    assert features["games_developed"].iloc[0] == 2
+    assert features["games_published"].iloc[0] == -1
+    assert features["games_developed"].isna().tolist() == [False, True]
+
+
+def test_build_features_accepts_games_read_back_from_json(igdb_mappings):
+    games = dataset.build_games_dataset(raw_frames())
+    games["published"] = None
+
+    from_json = build_features(pd.read_json(StringIO(games.to_json())))
+
+    pd.testing.assert_frame_equal(
+        from_json.drop(columns=["name", "age_classif"]),
+        build_features(games).drop(columns=["name", "age_classif"]),
+        check_dtype=False,
+    )
+
+
+def test_list_lengths_handles_columns_without_lists():
+    lengths = list_lengths(pd.Series([[1, 2], None, []]))
+    assert lengths.iloc[0] == 2 and np.isnan(lengths.iloc[1]) and lengths.iloc[2] == 0
+    assert list_lengths(pd.Series([np.nan, np.nan])).isna().all()
+
+
+def test_predict_games_scores_build_features_output(igdb_mappings, trained_pipeline):
+    games = dataset.build_games_dataset(raw_frames())
+
+    predictions = predict_games(games, trained_pipeline)
+
+    assert predictions.columns.tolist() == ["id", "name", "predictions"]
+    assert predictions["id"].tolist() == [1, 2]
+    assert predictions["predictions"].between(0, 1).all()
@@ -0,0 +1,42 @@
+import numpy as np
+
+from data_master_eng_ml.utils import lookups
+from data_master_eng_ml.utils.lookups import UNKNOWN_CONTINENT, UNKNOWN_PLATFORM
+from data_master_eng_ml.utils.mappings import plataform_mapping
+
+
+def test_continent_names_handles_missing_and_out_of_range_codes():
+    # 76: Brasil, 840: Estados Unidos, 392: Japão
+    names = lookups.continent_names([76, 840, 392, np.nan, -1, 5000])
+
+    assert names.tolist() == [
+        "South America",
+        "North America",
+        "Asia",
+        *[UNKNOWN_CONTINENT] * 3,
+    ]
+
+
+def test_platform_group_codes_match_the_mapping():
+    platform_id = next(iter(plataform_mapping))
+    codes = lookups.platform_group_codes([platform_id, np.nan, max(plataform_mapping) + 1])
+
+    assert lookups.PLATFORM_GROUPS[codes].tolist() == [
+        plataform_mapping[platform_id],
+        UNKNOWN_PLATFORM,
+        UNKNOWN_PLATFORM,
+    ]
+
+
+def test_tables_are_rebuilt_when_the_signature_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "lookup_tables.npz")
+    monkeypatch.setattr(lookups, "_tables", {})
+    first = lookups.load_lookup_tables(path)["platform_group"]
+
+    lookups._tables.clear()
+    monkeypatch.setattr(lookups, "_signature", lambda: "outra versão")
+    monkeypatch.setattr(lookups, "build_platform_group_table", lambda: first[:1])
+
+    assert len(lookups.load_lookup_tables(path)["platform_group"]) == 1
+    with np.load(path) as cached:
+        assert str(cached["signature"]) == "outra versão"
@@ -0,0 +1,57 @@
+import functools
+
+import pytest
+
+from data_master_eng_ml.utils import mappings
+
+API_RESPONSES = {
+    "player_perspectives": {1: "first-person"},
+    "genres": {5: "shooter"},
+    "game_modes": {2: "multiplayer"},
+}
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path):
+    calls = []
+
+    def get_mapping_from_api(endpoint, fields):
+        calls.append(endpoint)
+        return dict(API_RESPONSES[endpoint])
+
+    snapshot_path = str(tmp_path / "igdb_mappings.json")
+    monkeypatch.setattr(mappings, "get_mapping_from_api", get_mapping_from_api)
+    monkeypatch.setattr(
+        mappings,
+        "read_mappings_snapshot",
+        functools.partial(mappings.read_mappings_snapshot, path=snapshot_path),
+    )
+    monkeypatch.setattr(
+        mappings,
+        "write_mappings_snapshot",
+        functools.partial(mappings.write_mappings_snapshot, path=snapshot_path),
+    )
+    monkeypatch.setattr(mappings, "_api_mappings", {})
+    return calls
+
+
+def test_first_access_fetches_once_and_writes_snapshot(fake_api):
+    assert mappings.genres_mapping == {5: "shooter"}
+    assert mappings.game_modes_mapping == {2: "multiplayer"}
+    assert sorted(fake_api) == sorted(API_RESPONSES)
+
+    # Um novo processo lê o snapshot (com IDs inteiros) sem chamar a API
+    mappings._api_mappings.clear()
+    assert mappings.player_perspectives_mapping == {1: "first-person"}
+    assert len(fake_api) == len(API_RESPONSES)
+
+
+def test_refresh_ignores_snapshot(fake_api):
+    mappings.load_mappings()
+    mappings.refresh_mappings()
+    assert len(fake_api) == 2 * len(API_RESPONSES)
+
+
+def test_unknown_attribute_raises():
+    with pytest.raises(AttributeError):
+        mappings.unknown_mapping
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from metrics import CallbackMetric, Histogram, Registry
+
+
+def samples(lines):
+    return dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 0.5, 1.0))
+    child = histogram.labels("/predict")
+    for value in (0.05, 0.1, 0.3, 2.0):
+        child.observe(value)
+
+    exposed = samples(histogram.collect())
+
+    assert exposed['latency_seconds_bucket{route="/predict",le="0.1"}'] == "2"
+    assert exposed['latency_seconds_bucket{route="/predict",le="0.5"}'] == "3"
+    assert exposed['latency_seconds_bucket{route="/predict",le="1"}'] == "3"
+    assert exposed['latency_seconds_bucket{route="/predict",le="+Inf"}'] == "4"
+    assert exposed['latency_seconds_count{route="/predict"}'] == "4"
+    assert float(exposed['latency_seconds_sum{route="/predict"}']) == 2.45
+
+
+def test_callback_metrics_are_read_at_scrape_time_and_skipped_without_a_value():
+    values = {"rows": None}
+    registry = Registry()
+    registry.register(CallbackMetric("buffered_rows", "Rows.", lambda: values["rows"]))
+
+    assert registry.exposition() == "\n"
+    values["rows"] = 3
+    assert samples(registry.exposition().splitlines()) == {"buffered_rows": "3"}
+
+
+def test_metrics_endpoint_records_request_latency_by_route(api):
+    client = TestClient(api.app)
+    client.get("/metrics")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'route="/metrics",status="200"' in response.text
+    assert "prediction_writer_dropped_rows_total" in response.text
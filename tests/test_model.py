@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+import xgboost as xgb
+
+from modeling.model import get_n_jobs, predict_model, to_inplace_input
+
+
+def data(n_rows=200):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((n_rows, 4))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    return X, y
+
+
+def test_to_inplace_input_avoids_copies_of_ready_arrays():
+    X = np.ascontiguousarray(np.ones((3, 2), dtype=np.float32))
+
+    assert to_inplace_input(X) is X
+    assert to_inplace_input(pd.DataFrame(X.astype(np.float64))).dtype == np.float32
+    assert sparse.isspmatrix_csr(to_inplace_input(sparse.csc_matrix(X)))
+
+
+def test_predict_model_xgboost_matches_dmatrix_predictions():
+    X, y = data()
+    booster = xgb.train({"objective": "binary:logistic"}, xgb.DMatrix(X, label=y), 10)
+
+    classes, probabilities = predict_model(booster, pd.DataFrame(X), "xgboost", n_jobs=1)
+
+    np.testing.assert_allclose(probabilities, booster.predict(xgb.DMatrix(X)), rtol=1e-6)
+    assert classes.tolist() == (probabilities > 0.5).astype(int).tolist()
+
+
+def test_predict_model_derives_classes_from_a_single_predict_proba():
+    X, y = data()
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+    classes, probabilities = predict_model(model, X, "random_forest", n_jobs=1)
+
+    np.testing.assert_allclose(probabilities, model.predict_proba(X)[:, 1])
+    # Empates em 0.5 são a única diferença possível para `predict` (argmax)
+    untied = probabilities != 0.5
+    assert (classes == model.predict(X))[untied].all()
+
+
+def test_predict_model_restores_the_threads_of_the_model():
+    X, y = data()
+    booster = xgb.train({"objective": "binary:logistic", "nthread": 3}, xgb.DMatrix(X, label=y), 5)
+    forest = RandomForestClassifier(n_estimators=5, n_jobs=2, random_state=0).fit(X, y)
+
+    predict_model(booster, X, "xgboost", n_jobs=1)
+    predict_model(forest, X, "random_forest", n_jobs=1)
+
+    assert get_n_jobs(booster, "xgboost") == "3"
+    assert get_n_jobs(forest, "random_forest") == 2
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import subprocess
+import sys
+import threading
+import warnings
+
+from fastapi.testclient import TestClient
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import utils
+
+
+@pytest.fixture
+def loader(monkeypatch, tmp_path):
+    loader = utils.ModelLoader()
+    monkeypatch.setattr(utils, "MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(loader, "model_uri", None)
+    return loader
+
+
+@pytest.mark.parametrize(
+    "version", ["../model.joblib", "/etc/passwd", "models:/Best_Model/1", ".hidden", ""]
+)
+def test_version_source_rejects_paths_and_uris(loader, version):
+    with pytest.raises(ValueError):
+        loader.version_source(version)
+
+
+def test_version_source_resolves_files_under_models_dir(loader, tmp_path):
+    (tmp_path / "model-v2.joblib").write_bytes(b"")
+
+    assert loader.version_source("model-v2.joblib") == str(tmp_path / "model-v2.joblib")
+    with pytest.raises(ValueError, match="No model file"):
+        loader.version_source("model-v3.joblib")
+
+
+def test_version_source_maps_versions_and_aliases_of_the_registry_model(loader, monkeypatch):
+    monkeypatch.setattr(loader, "model_uri", "models:/Best_Model@champion")
+
+    assert loader.version_source("3") == "models:/Best_Model/3"
+    assert loader.version_source("challenger") == "models:/Best_Model@challenger"
+
+
+def test_only_one_reload_starts_at_a_time(loader, monkeypatch):
+    release = threading.Event()
+    loads = []
+
+    def load(model_path=None):
+        loads.append(model_path)
+        release.wait(5)
+
+    monkeypatch.setattr(loader, "load", load)
+    monkeypatch.setattr(loader, "resolve_model_path", lambda source=None: "model.joblib")
+
+    with ThreadPoolExecutor(8) as pool:
+        started = list(pool.map(lambda _: loader.reload_in_background(), range(8)))
+    release.set()
+    loader._reload_thread.join(5)
+
+    assert started.count(True) == 1
+    assert loads == ["model.joblib"]
+
+
+def test_reload_endpoint_rejects_arbitrary_paths_with_400(api, loader):
+    response = TestClient(api.app).post("/model/reload", params={"version": "../../x.pkl"})
+
+    assert response.status_code == 400
+    assert loader._reload_thread is None or not loader._reload_thread.is_alive()
+
+
+def test_load_serves_pipelines_through_the_frozen_preprocessor(
+    loader, tmp_path, training_data, trained_pipeline
+):
+    X, _ = training_data
+    path = tmp_path / "model.joblib"
+    joblib.dump(trained_pipeline, path)
+
+    model = loader.load(str(path))
+
+    assert isinstance(model, utils.FrozenPipeline)
+    np.testing.assert_allclose(
+        utils.predict_scores(model, X), trained_pipeline.predict_proba(X)[:, 1], atol=1e-6
+    )
+    # Interface de classificador usada por `get_predictions` (fora do repositório)
+    np.testing.assert_array_equal(model.classes_, trained_pipeline.classes_)
+    np.testing.assert_array_equal(model.predict(X), trained_pipeline.predict(X))
+
+
+def test_load_rejects_compiled_ensembles_without_their_preprocessing(loader, tmp_path):
+    path = tmp_path / "xgboost_compiled.npz"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError, match="MODEL_COMPILED"):
+        loader.load(str(path))
+
+
+def test_freeze_preprocessor_keeps_models_it_cannot_freeze(training_data, trained_pipeline):
+    X, y = training_data
+    numeric = X.select_dtypes("number").fillna(0)
+    scaled = Pipeline([("scaler", StandardScaler()), ("model", LogisticRegression())])
+    scaled.fit(numeric, y)
+    estimator = trained_pipeline.steps[-1][1]
+
+    assert utils.freeze_preprocessor(estimator) is estimator
+    assert utils.freeze_preprocessor(scaled) is scaled
+
+
+def test_importing_utils_does_not_silence_feature_name_warnings():
+    # Em um processo novo: o pytest restaura os filtros de warnings entre as fases
+    check = (
+        "import warnings, utils; "
+        "print(any('valid feature names' in str(getattr(f[1], 'pattern', '')) "
+        "for f in warnings.filters))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stdout
+
+    assert output.strip().splitlines()[-1] == "False"
+
+
+def test_predict_scores_does_not_warn_about_matrices_without_names(training_data):
+    X, y = training_data
+    numeric = X.select_dtypes("number").fillna(0)
+    model = LogisticRegression(max_iter=50).fit(numeric, y)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        utils.predict_scores(model, numeric.to_numpy(dtype=np.float32))
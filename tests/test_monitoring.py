@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring import CurrentWindow, ReferenceProfile, ReportCache
+from prediction_store import PREDICTION_ID, PredictionStore
+
+DATA_COLUMNS = {"num_features": ["x"], "cat_features": ["c"]}
+
+
+@pytest.fixture(scope="module")
+def profile():
+    reference = pd.DataFrame({"x": np.arange(100.0), "c": ["a", "b"] * 50})
+    return ReferenceProfile(reference, DATA_COLUMNS)
+
+
+def rows(start, n_rows):
+    values = np.arange(start, start + n_rows)
+    return pd.DataFrame({"x": values * 7 % 100.0, "c": np.where(values % 3, "a", "z")})
+
+
+def assert_window_is(window, profile, expected):
+    last_id, data = window.data()
+    _, n_rows, counts = window.snapshot()
+    pd.testing.assert_frame_equal(data, expected.drop(columns=PREDICTION_ID))
+    assert n_rows == len(expected)
+    assert last_id == expected[PREDICTION_ID].iloc[-1]
+    for name, histogram in profile.histograms(expected).items():
+        np.testing.assert_array_equal(counts[name], histogram)
+
+
+def test_window_evicts_the_oldest_rows_and_their_counts(profile, tmp_path):
+    store = PredictionStore(tmp_path)
+    window = CurrentWindow(5, profile)
+    store.subscribe(window.append)
+
+    for start, n_rows in ((0, 2), (2, 2), (4, 3), (7, 1), (8, 9)):
+        store.append(rows(start, n_rows))
+        assert_window_is(window, profile, store.last(5))
+
+
+def test_window_reset_keeps_rows_appended_during_the_fill(profile, tmp_path):
+    store = PredictionStore(tmp_path)
+    store.append(rows(0, 4))
+    window = CurrentWindow(5, profile)
+    store.subscribe(window.append)
+    data = store.last(5)
+    # Chegam durante a leitura do log: uma parte já lida, outra nova
+    window.append(data.tail(2))
+    store.append(rows(4, 2))
+
+    window.reset(data)
+
+    assert_window_is(window, profile, store.last(5))
+
+
+def test_window_matches_the_log_under_concurrent_appends(profile, tmp_path):
+    store = PredictionStore(tmp_path)
+    window = CurrentWindow(50, profile)
+    store.subscribe(window.append)
+
+    def append_many(worker):
+        for index in range(40):
+            store.append(rows(worker * 1000 + index, 1 + index % 3))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(append_many, range(8)))
+
+    assert_window_is(window, profile, store.last(50))
+
+
+def test_report_cache_answers_while_the_reference_loads(tmp_path):
+    store = PredictionStore(tmp_path)
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load_reference():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return pd.DataFrame({"x": np.arange(100.0), "c": ["a", "b"] * 50})
+
+    cache = ReportCache(store, load_reference, DATA_COLUMNS)
+    with ThreadPoolExecutor(2) as pool:
+        loading = [pool.submit(cache.reference) for _ in range(2)]
+        started.wait(5)
+        # `cached` roda no event loop e o hook em cada append: nenhum espera a carga
+        assert cache.cached("data_drift", 10) is None
+        store.append(rows(0, 3))
+        assert not any(future.done() for future in loading)
+        release.set()
+        (_, first), (_, second) = [future.result(5) for future in loading]
+
+    assert loads == [1]
+    assert first is second
@@ -0,0 +1,192 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from prediction_store import PREDICTION_ID, PredictionStore
+
+
+def frame(n_rows, start=0):
+    return pd.DataFrame({"score": [float(value) for value in range(start, start + n_rows)]})
+
+
+def failing_writes(store, n_failures):
+    """Faz as `n_failures` primeiras escritas do store falharem."""
+    write, calls = store._write, []
+
+    def flaky(frames):
+        if not frames:
+            return None
+        calls.append(sum(len(f) for f in frames))
+        if len(calls) <= n_failures:
+            raise OSError("disk full")
+        return write(frames)
+
+    store._write = flaky
+    return calls
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PredictionStore(tmp_path, flush_rows=4, flush_interval=0.01, max_buffer_rows=100)
+    store.retry_backoff = 0.01
+    yield store
+    store.close(5)
+
+
+def test_failed_write_is_retried_without_losing_or_reordering_rows(store):
+    calls = failing_writes(store, 2)
+    store.start()
+    store.append(frame(4))
+    wait_until(lambda: store.stats["flushed_rows"] == 4)
+    store.append(frame(4, start=4))
+    wait_until(lambda: store.stats["flushed_rows"] == 8)
+
+    assert calls[:3] == [4, 4, 4]
+    assert store.stats["dropped_rows"] == 0
+    rows = store.last(8)
+    assert rows[PREDICTION_ID].tolist() == list(range(8))
+    assert rows["score"].tolist() == [float(value) for value in range(8)]
+
+
+def test_rows_are_visible_to_readers_while_the_write_is_retried(store):
+    failing_writes(store, 1000)
+    store.start()
+    store.append(frame(6))
+    wait_until(lambda: store.snapshot()["buffered_rows"] == 6)
+
+    assert store.last(10)[PREDICTION_ID].tolist() == list(range(6))
+
+
+def test_requeued_rows_stay_within_max_buffer_rows(store):
+    store.max_buffer_rows = 8
+    release = threading.Event()
+    write = store._write
+
+    def blocked(frames):
+        release.wait(5)
+        raise OSError("disk full")
+
+    store._write = blocked
+    store.start()
+    store.append(frame(4))
+    wait_until(lambda: store._flushing)
+    store.append(frame(4, start=4))
+    store.append(frame(4, start=8))
+    store._write = write
+    release.set()
+    wait_until(lambda: store.stats["flushed_rows"] == 8)
+
+    # O frame mais antigo (ids 0-3) sai quando o lote que falhou volta ao buffer
+    assert store.stats["dropped_rows"] == 4
+    assert store.last(20)[PREDICTION_ID].tolist() == list(range(4, 12))
+
+
+def test_close_gives_up_on_a_failing_disk(store):
+    store.retry_backoff = 60
+    failing_writes(store, 1000)
+    store.start()
+    store.append(frame(4))
+    wait_until(lambda: store.snapshot()["buffered_rows"] == 4)
+
+    store.close(5)
+
+    assert store._thread is None
+    assert store.stats["dropped_rows"] == 4
+
+
+def test_listeners_get_frames_in_id_order(store):
+    first_delivered, release = threading.Event(), threading.Event()
+    received = []
+
+    def slow(frame):
+        if frame[PREDICTION_ID].iloc[0] == 0:
+            first_delivered.set()
+            release.wait(5)
+
+    store.subscribe(slow)
+    store.subscribe(lambda frame: received.append(frame[PREDICTION_ID].tolist()))
+    first = threading.Thread(target=store.append, args=(frame(2),))
+    first.start()
+    first_delivered.wait(5)
+    # Os ids 2-3 já estão atribuídos, mas a entrega espera a dos ids 0-1
+    second = threading.Thread(target=store.append, args=(frame(2),))
+    second.start()
+    second.join(0.1)
+    assert second.is_alive() and received == []
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert received == [[0, 1], [2, 3]]
+
+
+def test_concurrent_appends_are_delivered_in_order(store):
+    received = []
+    store.subscribe(lambda frame: received.extend(frame[PREDICTION_ID]))
+
+    def append_many(_):
+        for _ in range(50):
+            store.append(frame(3))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(append_many, range(8)))
+
+    assert received == list(range(8 * 50 * 3))
+
+
+def test_stores_sharing_a_directory_never_reuse_ids_or_parts(tmp_path):
+    # Dois workers do uvicorn iniciados juntos sobre o mesmo diretório
+    workers = [PredictionStore(tmp_path), PredictionStore(tmp_path)]
+    for worker in workers:
+        worker.append(frame(3))
+        worker.close()
+    restarted = PredictionStore(tmp_path)
+    restarted.append(frame(2))
+
+    ids = [part.first_id for part in restarted._parts]
+    assert len(ids) == 2 and len(set(ids)) == 2
+    assert len(list(tmp_path.glob("date=*/hour=*/part-*.parquet"))) == 2
+    assert restarted.last(8)[PREDICTION_ID].is_unique
+    assert restarted.last_id > max(part.last_id for part in restarted._parts)
+
+
+def test_readers_never_see_rows_twice_while_a_part_is_published(store):
+    write = store._write
+
+    def slow_return(frames):
+        # Alarga o intervalo entre a escrita da parte e a limpeza de `_flushing`
+        part = write(frames)
+        time.sleep(0.01)
+        return part
+
+    store._write = slow_return
+    store.flush_rows = 2
+    store.start()
+    duplicated, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            rows = store.last(40)
+            if not rows.empty and not rows[PREDICTION_ID].is_unique:
+                duplicated.append(rows)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for start in range(0, 40, 2):
+        store.append(frame(2, start=start))
+        time.sleep(0.005)
+    wait_until(lambda: store.stats["flushed_rows"] == 40)
+    done.set()
+    reader.join(5)
+
+    assert duplicated == []
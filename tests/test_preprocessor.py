@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from modeling.preprocessor import (
+    FrozenPreprocessor,
+    build_preprocessor,
+    check_frozen_preprocessor,
+)
+
+
+def columns(X):
+    categorical_cols = list(X.select_dtypes("object").columns)
+    return [column for column in X.columns if column not in categorical_cols], categorical_cols
+
+
+@pytest.fixture(scope="module")
+def training_with_gaps(training_data):
+    """Treino com ausentes extras (NaN e None) e uma coluna de cada tipo sem valores."""
+    X = training_data[0].copy()
+    numerical_cols, categorical_cols = columns(X)
+    rng = np.random.default_rng(0)
+    for column in numerical_cols[:5] + categorical_cols:
+        X.loc[rng.random(len(X)) < 0.1, column] = np.nan
+    X["sem_valor_num"] = np.nan
+    X["sem_valor_cat"] = pd.Series([np.nan] * len(X), dtype=object)
+    return X
+
+
+@pytest.mark.parametrize("sparse_output", [None, True, False])
+def test_frozen_matches_column_transformer_on_training_data(training_with_gaps, sparse_output):
+    X = training_with_gaps
+    preprocessor = build_preprocessor(*columns(X), sparse_output)
+    with pytest.warns(UserWarning, match="Skipping features without any observed values"):
+        preprocessor.fit(X)
+    frozen = FrozenPreprocessor(preprocessor)
+
+    assert "sem_valor_num" not in frozen.numerical_cols
+    assert "sem_valor_cat" not in frozen.categorical_cols
+    assert check_frozen_preprocessor(preprocessor, X, frozen) == pytest.approx(0.0, abs=1e-12)
+    assert check_frozen_preprocessor(preprocessor, frozen.parity_sample(), frozen) < 1e-9
+    assert sparse.issparse(frozen.transform(X)) == sparse.issparse(preprocessor.transform(X))
+
+
+def test_none_in_numeric_and_categorical_columns_matches_scikit_learn():
+    X = pd.DataFrame({"a": [1.0, 2.0, np.nan], "c": ["x", "y", "x"]})
+    preprocessor = build_preprocessor(["a"], ["c"], sparse=False).fit(X)
+    new = pd.DataFrame({"a": [None, 3.0, 1.0], "c": [None, np.nan, "y"]}, dtype=object)
+
+    check_frozen_preprocessor(preprocessor, new)
+    # None numérico vira a mediana; None categórico é desconhecido (linha zerada) e NaN
+    # recebe a moda
+    np.testing.assert_array_equal(
+        FrozenPreprocessor(preprocessor).transform(new)[:, 1:], [[0, 0], [1, 0], [0, 1]]
+    )
+
+
+def test_pd_na_is_imputed_like_nan():
+    X = pd.DataFrame({"a": [1.0, 2.0, 4.0], "c": ["x", "y", "x"]})
+    preprocessor = build_preprocessor(["a"], ["c"], sparse=False).fit(X)
+    frozen = FrozenPreprocessor(preprocessor)
+
+    with_na = frozen.transform(pd.DataFrame({"a": pd.Series([pd.NA], dtype=object), "c": [pd.NA]}))
+    with_nan = preprocessor.transform(pd.DataFrame({"a": [np.nan], "c": [np.nan]}))
+
+    np.testing.assert_allclose(with_na, with_nan)
+    np.testing.assert_allclose(frozen.transform_row({"a": pd.NA, "c": pd.NA}), with_nan[0])
+
+
+def test_check_frozen_preprocessor_reports_differences():
+    X = pd.DataFrame({"a": [1.0, 2.0, 4.0], "c": ["x", "y", "x"]})
+    preprocessor = build_preprocessor(["a"], ["c"], sparse=False).fit(X)
+    frozen = FrozenPreprocessor(preprocessor)
+    frozen.medians = frozen.medians + 1
+
+    with pytest.raises(AssertionError, match="Diferença"):
+        check_frozen_preprocessor(preprocessor, pd.DataFrame({"a": [np.nan], "c": ["x"]}), frozen)
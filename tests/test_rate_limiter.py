@@ -0,0 +1,76 @@
+import threading
+import time
+
+from data_master_eng_ml.utils import auth_twitch
+from data_master_eng_ml.utils.rate_limiter import RateLimiter, RequestStats
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+
+def test_burst_up_to_capacity_then_waits_for_tokens():
+    limiter = RateLimiter(rate=20, capacity=2, max_in_flight=8)
+
+    assert limiter._take_token() == 0.0
+    assert limiter._take_token() == 0.0
+    # Terceiro token ainda não existe: espera ~1/rate
+    assert 0.04 <= limiter._take_token() <= 0.05
+
+
+def test_max_in_flight_bounds_open_requests():
+    limiter = RateLimiter(rate=1000, capacity=1000, max_in_flight=2)
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def request():
+        nonlocal in_flight, peak
+        with limiter:
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert limiter.stats.snapshot()["requests"] == 8
+
+
+def test_retry_delay_prefers_retry_after_header():
+    assert auth_twitch.retry_delay(FakeResponse(429, {"Retry-After": "3"}), attempt=0) == 3.0
+    assert 0 <= auth_twitch.retry_delay(FakeResponse(503), attempt=2) <= 2.0
+
+
+def test_throttled_request_is_retried_with_backoff(monkeypatch):
+    stats = RequestStats()
+    client = auth_twitch.TwitchClient(
+        client_id="id",
+        client_secret="secret",
+        token_cache_path=None,
+        limiter=RateLimiter(rate=1000, capacity=1000, max_in_flight=4, stats=stats),
+    )
+    client.token_data = {"access_token": "token"}
+    client.token_expiration_time = time.time() + 3600
+    responses = iter(
+        [FakeResponse(429, {"Retry-After": "0"}), FakeResponse(502), FakeResponse(200)]
+    )
+    monkeypatch.setattr(client.session, "post", lambda *args, **kwargs: next(responses))
+    monkeypatch.setattr(auth_twitch.time, "sleep", lambda seconds: None)
+
+    response = client.make_authenticated_request("https://api/games", "fields name;")
+
+    assert response.status_code == 200
+    snapshot = stats.snapshot()
+    assert snapshot["retries"] == 2
+    assert snapshot["throttles"] == 1
+    assert snapshot["requests"] == 3
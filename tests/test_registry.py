@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import mlflow
+import numpy as np
+import pytest
+
+from data_master_eng_ml.utils.retrieve_best_experiment import register_model
+from modeling.model import train_model
+from modeling.preprocessor import fit_preprocessor
+import registry
+import utils
+
+
+def model_version(version):
+    return SimpleNamespace(
+        name="Best_Model", version=version, run_id=f"run-{version}", source="mlruns/x"
+    )
+
+
+@pytest.fixture
+def fake_registry(monkeypatch, trained_pipeline):
+    state = {"version": "1", "downloads": 0, "online": True}
+
+    def resolve_model_version(model_uri):
+        if not state["online"]:
+            raise ConnectionError("registry unreachable")
+        return model_version(state["version"])
+
+    def load_model(model_uri):
+        state["downloads"] += 1
+        return trained_pipeline
+
+    monkeypatch.setattr(registry, "resolve_model_version", resolve_model_version)
+    monkeypatch.setattr(registry.mlflow.sklearn, "load_model", load_model)
+    monkeypatch.setattr(registry.mlflow, "set_tracking_uri", lambda uri: None)
+    return state
+
+
+def test_parse_model_uri():
+    assert registry.parse_model_uri("models:/Best_Model@champion") == (
+        "Best_Model",
+        "champion",
+        None,
+    )
+    assert registry.parse_model_uri("models:/Best_Model/3") == ("Best_Model", None, "3")
+    with pytest.raises(ValueError):
+        registry.parse_model_uri("runs:/abc/model")
+
+
+def test_fetch_model_downloads_each_version_once(fake_registry, tmp_path):
+    uri = "models:/Best_Model@champion"
+
+    path = registry.fetch_model(uri, cache_dir=str(tmp_path))
+    assert registry.fetch_model(uri, cache_dir=str(tmp_path)) == path
+    assert fake_registry["downloads"] == 1
+    assert registry.read_manifest(registry.Path(path).parent)["run_id"] == "run-1"
+
+    fake_registry["version"] = "2"
+    assert registry.fetch_model(uri, cache_dir=str(tmp_path)).endswith("/2/model.joblib")
+    assert fake_registry["downloads"] == 2
+
+
+def test_corrupted_cache_is_downloaded_again(fake_registry, tmp_path):
+    path = registry.fetch_model("models:/Best_Model/1", cache_dir=str(tmp_path))
+    with open(path, "ab") as file:
+        file.write(b"corrupted")
+
+    registry.fetch_model("models:/Best_Model/1", cache_dir=str(tmp_path))
+
+    assert fake_registry["downloads"] == 2
+
+
+def test_unreachable_registry_falls_back_to_the_version_of_the_same_ref(fake_registry, tmp_path):
+    cache_dir = str(tmp_path)
+    fake_registry["version"] = "1"
+    registry.fetch_model("models:/Best_Model@champion", cache_dir=cache_dir)
+    fake_registry["version"] = "2"
+    registry.fetch_model("models:/Best_Model@challenger", cache_dir=cache_dir)
+    registry.fetch_model("models:/Best_Model/2", cache_dir=cache_dir)
+    fake_registry["online"] = False
+
+    path = registry.fetch_model("models:/Best_Model@champion", cache_dir=cache_dir)
+
+    assert path.endswith("/1/model.joblib")
+    assert registry.fetch_model("models:/Best_Model/2", cache_dir=cache_dir).endswith(
+        "/2/model.joblib"
+    )
+    for model_uri in (
+        "models:/Best_Model/3",
+        "models:/Best_Model@staging",
+        "models:/Best_Model/Production",
+        "models:/Other@champion",
+    ):
+        with pytest.raises(ConnectionError):
+            registry.fetch_model(model_uri, cache_dir=cache_dir)
+
+
+@pytest.fixture
+def tracking_uri(tmp_path, monkeypatch):
+    """Tracking store e registro do MLflow em arquivos, no diretório do teste."""
+    previous = mlflow.get_tracking_uri()
+    tracking_uri = f"file:{tmp_path / 'mlruns'}"
+    monkeypatch.setattr(registry, "MLFLOW_TRACKING_URI", tracking_uri)
+    # O cache padrão (`models/registry`) fica no diretório do teste
+    monkeypatch.chdir(tmp_path)
+    mlflow.set_tracking_uri(tracking_uri)
+    yield tracking_uri
+    mlflow.set_tracking_uri(previous)
+
+
+def test_registered_model_is_served_from_raw_features(training_data, tracking_uri, monkeypatch):
+    """Treino -> registro -> cache -> `ModelLoader`, com as features brutas da API."""
+    X, y = training_data
+    categorical_cols = X.select_dtypes("object").columns
+    numerical_cols = X.columns.drop(categorical_cols)
+    preprocessor = fit_preprocessor(X, numerical_cols, categorical_cols, cache_dir=None)
+    matrix = preprocessor.transform(X)
+    params = {"objective": "binary:logistic", "max_depth": 3, "num_boost_round": 20}
+    booster = train_model(
+        matrix, y, matrix, y, params=params, log_artifacts=False, preprocessor=preprocessor
+    )
+    register_model(mlflow.last_active_run().info.run_id, model_name="Best_Model")
+    loader = utils.ModelLoader()
+    monkeypatch.setattr(loader, "model", None)
+    monkeypatch.setattr(loader, "model_path", loader.model_path)
+    monkeypatch.setattr(loader, "model_uri", "models:/Best_Model@champion")
+
+    model = loader.load()
+    features = utils.get_feature_names(model)
+    model_input = utils.to_model_input(
+        {name: X[name].tolist() for name in features}, features, len(X), model
+    )
+
+    assert isinstance(model, utils.FrozenPipeline)
+    assert features == list(X.columns)
+    np.testing.assert_allclose(
+        utils.predict_scores(model, model_input),
+        booster.inplace_predict(matrix.astype(np.float32)),
+        rtol=1e-5,
+        atol=1e-6,
+    )
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from data_master_eng_ml.utils.response_cache import CacheMissError, ResponseCache
+
+URL = "https://api.igdb.com/v4/games"
+
+
+def query(index):
+    return f"fields name; limit 500; offset {index * 500};"
+
+
+def test_round_trip(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite")
+    cache.set(URL, query(0), [{"id": 1, "name": "a"}], total_count=1)
+
+    assert cache.get(URL, query(0)) == ([{"id": 1, "name": "a"}], 1)
+    assert cache.get(URL, query(1)) is None
+
+
+def test_limits_are_checked_every_n_writes_and_drop_the_oldest(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", max_entries=25, evict_every=10)
+    for index in range(100):
+        cache.set(URL, query(index), [{"id": index}], total_count=100)
+        if index == 35:
+            # Entre duas verificações o limite pode ser excedido em até `evict_every`
+            assert cache.stats()["games"]["pages"] == 31
+
+    assert cache.stats()["games"]["pages"] == 25
+    assert cache.get(URL, query(74)) is None
+    assert cache.get(URL, query(75)) is not None
+    assert cache.get(URL, query(99)) is not None
+
+
+def test_byte_limit_evicts_oldest_pages(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", evict_every=1)
+    cache.set(URL, query(0), [{"id": 0}], total_count=1)
+    page_size = cache.stats()["games"]["bytes"]
+    cache.max_bytes = 3 * page_size
+    for index in range(1, 10):
+        cache.set(URL, query(index), [{"id": index}], total_count=1)
+
+    assert cache.stats()["games"]["bytes"] <= 3 * page_size
+    assert cache.get(URL, query(9)) is not None
+    assert cache.get(URL, query(0)) is None
+
+
+def test_recently_read_pages_are_kept_over_newer_unread_ones(tmp_path):
+    cache = ResponseCache(
+        path=tmp_path / "cache.sqlite", max_entries=3, evict_every=1, access_resolution=0
+    )
+    for index in range(3):
+        cache.set(URL, query(index), [{"id": index}], total_count=1)
+    # Lida por último, a página mais antiga passa a ser a mais recente para o LRU
+    assert cache.get(URL, query(0)) is not None
+    cache.set(URL, query(3), [{"id": 3}], total_count=1)
+
+    assert cache.get(URL, query(0)) is not None
+    assert cache.get(URL, query(1)) is None
+    assert cache.get(URL, query(2)) is not None
+
+
+def test_reads_within_the_resolution_do_not_rewrite_accessed_at(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", access_resolution=60)
+    cache.set(URL, query(0), [{"id": 0}], total_count=1)
+    (written,) = cache.connection.execute("SELECT accessed_at FROM responses").fetchone()
+
+    cache.get(URL, query(0))
+
+    assert cache.connection.execute("SELECT accessed_at FROM responses").fetchone() == (written,)
+
+
+def test_expired_pages_are_ignored_and_removed(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", ttls={"games": 0.05}, evict_every=2)
+    cache.set(URL, query(0), [{"id": 0}], total_count=1)
+    time.sleep(0.1)
+
+    assert cache.get(URL, query(0)) is None
+    cache.set(URL, query(1), [{"id": 1}], total_count=1)
+    assert cache.stats()["games"]["pages"] == 1
+
+
+def test_offline_serves_expired_pages_and_raises_on_miss(tmp_path):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", ttls={"games": 0.05})
+    cache.set(URL, query(0), [{"id": 0}], total_count=1)
+    time.sleep(0.1)
+    cache.offline = True
+
+    assert cache.get(URL, query(0)) == ([{"id": 0}], 1)
+    with pytest.raises(CacheMissError):
+        cache.get(URL, query(1))
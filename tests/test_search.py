@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from modeling import model, search
+from modeling.preprocessor import fit_preprocessor
+from modeling.search import THREAD_VARIABLES, worker_thread_limits
+
+
+def test_spawned_workers_inherit_the_thread_limits(monkeypatch):
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    monkeypatch.delenv("MKL_NUM_THREADS", raising=False)
+
+    with (
+        worker_thread_limits(2),
+        ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor,
+    ):
+        seen = list(executor.map(os.getenv, THREAD_VARIABLES))
+
+    assert seen == ["2"] * len(THREAD_VARIABLES)
+    assert os.environ["OMP_NUM_THREADS"] == "8"
+    assert "MKL_NUM_THREADS" not in os.environ
+
+
+def test_init_worker_limits_loaded_thread_pools(monkeypatch):
+    applied = []
+    monkeypatch.setattr(search, "threadpool_limits", lambda limits: applied.append(limits))
+    monkeypatch.setattr(search, "_worker_data", {})
+    monkeypatch.setattr(search.mlflow, "set_tracking_uri", lambda uri: None)
+
+    search._init_worker({"X_train": None}, "file:mlruns", 3)
+
+    assert applied == [3]
+    assert search._worker_data == {"X_train": None}
+
+
+@pytest.fixture
+def split(training_data, tmp_path, monkeypatch):
+    X, y = training_data
+    features_path = tmp_path / "features.csv"
+    X.assign(id=range(len(X)), name="game", target=y).to_csv(features_path, index=False)
+    monkeypatch.setattr(search, "fit_preprocessor", partial(fit_preprocessor, cache_dir=None))
+    return search.load_split(features_path)
+
+
+def test_early_stopping_rows_are_held_out_of_training_and_test(split, training_data):
+    _, y = training_data
+
+    assert len(split["y_train"]) + len(split["y_es"]) + len(split["y_test"]) == len(y)
+    assert split["X_es"].shape[0] == len(split["y_es"])
+    assert split["y_es"].mean() == pytest.approx(split["y_train"].mean(), abs=0.02)
+
+
+def test_trials_never_early_stop_on_the_ranked_test_set(split, tmp_path, monkeypatch):
+    eval_labels = []
+    train_xgboost = model.train_xgboost
+
+    def spy(dtrain, dval, params, n_jobs=None):
+        eval_labels.append(dval.get_label())
+        return train_xgboost(dtrain, dval, params, n_jobs)
+
+    monkeypatch.setattr(model, "train_xgboost", spy)
+    monkeypatch.setattr(model.mlflow.sklearn, "log_model", lambda *args, **kwargs: None)
+    params = {"objective": "binary:logistic", "num_boost_round": 5}
+    previous = model.mlflow.get_tracking_uri()
+    model.mlflow.set_tracking_uri(f"file:{tmp_path / 'mlruns'}")
+    try:
+        model.train_model(**split, params=params, log_artifacts=False)
+    finally:
+        model.mlflow.set_tracking_uri(previous)
+
+    assert len(eval_labels) == 1
+    assert np.array_equal(eval_labels[0], split["y_es"])
@@ -0,0 +1,78 @@
+import re
+import threading
+
+import pytest
+
+from data_master_eng_ml.utils import twitch_api
+from data_master_eng_ml.utils.response_cache import ResponseCache
+
+
+class FakeResponse:
+    def __init__(self, data, total_count):
+        self.status_code = 200
+        self.text = ""
+        self.headers = {"x-count": str(total_count)}
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeApi:
+    """Endpoint paginado com `total_count` registros por combinação de filtros."""
+
+    def __init__(self, total_count):
+        self.total_count = total_count
+        self.queries = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, url, query):
+        with self._lock:
+            self.queries.append(query)
+            self.threads.add(threading.get_ident())
+        limit = int(re.search(r"limit (\d+);", query).group(1))
+        offset = int(re.search(r"offset (\d+);", query).group(1))
+        where = re.search(r"where (.*?);", query)
+        key = where.group(1) if where else ""
+        ids = range(offset, min(offset + limit, self.total_count))
+        return FakeResponse([{"id": i, "filter": key} for i in ids], self.total_count)
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    api = FakeApi(total_count=1234)
+    monkeypatch.setattr(twitch_api, "make_authenticated_request", api)
+    monkeypatch.setattr(twitch_api, "response_cache", ResponseCache(enabled=False))
+    return api
+
+
+def test_split_options_keeps_operator_in_each_part():
+    assert twitch_api.split_options("= (1,2,3)", 2) == ["= (1,2)", "= (3)"]
+
+
+def test_concurrent_pagination_matches_serial_order(fake_api):
+    filters = {"id": "= (1,2,3)"}
+    serial = twitch_api.fetch_data_with_pagination(
+        "https://api/games", twitch_api.build_query, ["name"], filters, concurrency=1, limit=100
+    )
+    concurrent = twitch_api.fetch_data_with_pagination(
+        "https://api/games", twitch_api.build_query, ["name"], filters, concurrency=8, limit=100
+    )
+
+    # 3 combinações de filtros x 13 páginas, sem páginas repetidas nem faltando
+    assert len(serial) == 3 * 1234
+    assert concurrent.equals(serial)
+
+
+def test_default_concurrency_uses_limiter_budget(fake_api, monkeypatch):
+    monkeypatch.setattr(twitch_api.rate_limiter, "max_in_flight", 4)
+    assert twitch_api.default_concurrency() == 4
+
+    data = twitch_api.fetch_data_with_pagination(
+        "https://api/genres", twitch_api.build_query, ["slug"], limit=50
+    )
+
+    assert data["id"].tolist() == list(range(1234))
+    # As páginas restantes foram buscadas pelo pool, não pela thread do chamador
+    assert threading.get_ident() not in fake_api.threads